@@ -0,0 +1,296 @@
+import os
+import abc
+import csv
+import json
+import hashlib
+import threading
+import urllib.request
+import pandas as pd
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Dict, Iterator, Optional
+
+SECTIONS_HEADER = "Section ID,Course ID,Teacher Assigned,# of Seats Available,Department"
+SECTIONS_COLUMNS = SECTIONS_HEADER.split(',')
+
+
+class AdviceRejected(Exception):
+    """The advisor's answer failed validation; raised as soon as the offending row arrives"""
+
+
+class SectionsCSVParser:
+    """Validate Sections_Information.csv rows as streamed text arrives
+
+    The header is checked on the first line and every row's department against the course's
+    original department, so a bad answer is rejected after its first bad line instead of after
+    the whole completion.
+    """
+
+    def __init__(self, sections: pd.DataFrame):
+        self.departments = sections.groupby('Course ID')['Department'].first().to_dict()
+        self.buffer = ''
+        self.header_seen = False
+        self.rows = []
+
+    def feed(self, text: str):
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split('\n')
+        for line in lines:
+            self._line(line)
+
+    def _line(self, line: str):
+        line = line.strip()
+        if not line or line.startswith('```'):
+            return
+        fields = next(csv.reader([line]))
+        if not self.header_seen:
+            self.header_seen = True
+            if line == SECTIONS_HEADER:
+                return
+            if len(fields) != len(SECTIONS_COLUMNS):
+                raise AdviceRejected(f"Incorrect header format: {line[:120]}")
+            # A data row where the header belongs: the header was left out
+            print("Warning: Advice is missing the header row; assuming the standard columns")
+        if len(fields) != len(SECTIONS_COLUMNS):
+            raise AdviceRejected(f"Row has {len(fields)} fields instead of {len(SECTIONS_COLUMNS)}: {line[:120]}")
+        course_id, department = fields[1], fields[4]
+        if course_id in self.departments and department != self.departments[course_id]:
+            raise AdviceRejected(f"Department assignment changed for course {course_id}: {department}")
+        self.rows.append(fields)
+
+    def finish(self) -> pd.DataFrame:
+        if self.buffer:
+            self._line(self.buffer)
+            self.buffer = ''
+        if not self.rows:
+            raise AdviceRejected("CSV content too short")
+        df = pd.DataFrame(self.rows, columns=SECTIONS_COLUMNS)
+        try:
+            df['# of Seats Available'] = df['# of Seats Available'].astype(int)
+        except ValueError as e:
+            raise AdviceRejected(f"Seat counts are not integers: {str(e)}")
+        return df
+
+
+def data_hash(data: Dict[str, pd.DataFrame]) -> str:
+    """Content hash of every table in a data dict"""
+    digest = hashlib.sha256()
+    for name in sorted(data):
+        value = data[name]
+        digest.update(name.encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(json.dumps(list(map(str, value.columns))).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+class Advisor(abc.ABC):
+    """Something that answers an optimization prompt with Sections_Information.csv content"""
+
+    name = 'advisor'
+
+    @abc.abstractmethod
+    def advise(self, prompt: str, data: Dict[str, pd.DataFrame]) -> str:
+        """The whole answer as text"""
+
+    def stream(self, prompt: str, data: Dict[str, pd.DataFrame]) -> Iterator[str]:
+        """The answer as text chunks; providers that cannot stream yield it in one piece"""
+        yield self.advise(prompt, data)
+
+    def advise_sections(self, prompt: str, data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Stream the answer through the sections parser, stopping at the first invalid row"""
+        parser = SectionsCSVParser(data['sections'])
+        chunks = self.stream(prompt, data)
+        try:
+            for chunk in chunks:
+                parser.feed(chunk)
+        finally:
+            # Closing the generator ends a remote stream early when a row was rejected
+            chunks.close()
+        return parser.finish()
+
+
+class AnthropicAdvisor(Advisor):
+    """Remote advice from the Anthropic messages API"""
+
+    name = 'anthropic'
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-opus-20240229",
+                 max_tokens: int = 2000, timeout: float = 60):
+        self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
+        self.model = model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+
+    def _client(self):
+        # Imported here so the local providers work without the SDK installed
+        import anthropic
+        return anthropic.Anthropic(api_key=self.api_key, timeout=self.timeout)
+
+    def advise(self, prompt: str, data: Dict[str, pd.DataFrame]) -> str:
+        return ''.join(self.stream(prompt, data)).strip()
+
+    def stream(self, prompt: str, data: Dict[str, pd.DataFrame]) -> Iterator[str]:
+        with self._client().messages.stream(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=[{
+                "role": "user",
+                "content": prompt
+            }]
+        ) as response:
+            for text in response.text_stream:
+                yield text
+
+
+class LocalAdvisor(Advisor):
+    """Deterministic advice without a network: the sections the consolidation model keeps open
+
+    Set `plan` to a consolidation plan the caller already solved and it is turned into CSV
+    without solving the model again (or solving it on another thread next to the caller's).
+    """
+
+    name = 'local'
+
+    def __init__(self, max_teacher_sections: int = 6, plan: Optional[Dict] = None):
+        self.max_teacher_sections = max_teacher_sections
+        self.plan = plan
+
+    def advise(self, prompt: str, data: Dict[str, pd.DataFrame]) -> str:
+        from consolidation import SectionConsolidator
+        consolidator = SectionConsolidator(data, max_teacher_sections=self.max_teacher_sections)
+        sections = consolidator.apply(self.plan if self.plan is not None else consolidator.solve())
+        return sections[SECTIONS_COLUMNS].to_csv(index=False).strip()
+
+
+class HTTPAdvisor(Advisor):
+    """Advice from an HTTP endpoint that takes {"prompt": ...} and returns {"text": ...}"""
+
+    name = 'http'
+
+    def __init__(self, url: str, timeout: float = 60):
+        self.url = url
+        self.timeout = timeout
+
+    def advise(self, prompt: str, data: Dict[str, pd.DataFrame]) -> str:
+        request = urllib.request.Request(self.url, data=json.dumps({'prompt': prompt}).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode())['text']
+
+
+class CachedAdvisor(Advisor):
+    """Reuse earlier answers keyed by provider, prompt and input data"""
+
+    def __init__(self, inner: Advisor, cache_dir: Optional[Path] = None):
+        self.inner = inner
+        self.name = f"cached-{inner.name}"
+        self.cache_dir = Path(cache_dir or os.getenv('SCHEDULER_ADVISOR_CACHE',
+                                                     Path(__file__).parent / 'cache' / 'advisor'))
+        self.hits = 0
+
+    def key(self, prompt: str, data: Dict[str, pd.DataFrame]) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.inner.name.encode())
+        digest.update(prompt.encode())
+        digest.update(data_hash(data).encode())
+        return digest.hexdigest()[:32]
+
+    def advise(self, prompt: str, data: Dict[str, pd.DataFrame]) -> str:
+        return ''.join(self.stream(prompt, data))
+
+    def stream(self, prompt: str, data: Dict[str, pd.DataFrame]) -> Iterator[str]:
+        path = self.cache_dir / f"{self.key(prompt, data)}.txt"
+        if path.exists():
+            self.hits += 1
+            yield path.read_text()
+            return
+        chunks = []
+        for chunk in self.inner.stream(prompt, data):
+            chunks.append(chunk)
+            yield chunk
+        # Only answers that were read to the end are cached
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(''.join(chunks))
+        os.replace(tmp_path, path)
+
+
+class AdvisorRunner:
+    """Run an advisor in the background so the caller can keep working, with a hard timeout"""
+
+    def __init__(self, advisor: Advisor, timeout: float = 120):
+        self.advisor = advisor
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='advisor')
+
+    def submit(self, prompt: str, data: Dict[str, pd.DataFrame]) -> Future:
+        return self.pool.submit(self.advisor.advise_sections, prompt, data)
+
+    def result(self, future: Future) -> Optional[pd.DataFrame]:
+        """The advised sections, or None if the provider failed or ran out of time
+
+        AdviceRejected is passed on so callers can tell a bad answer from no answer.
+        """
+        try:
+            return future.result(timeout=self.timeout)
+        except AdviceRejected:
+            raise
+        except TimeoutError:
+            print(f"Advisor {self.advisor.name} timed out after {self.timeout}s")
+        except Exception as e:
+            print(f"Advisor {self.advisor.name} failed: {str(e)}")
+        return None
+
+
+def make_advisor(provider: Optional[str] = None, api_key: Optional[str] = None) -> Advisor:
+    """Build the advisor named by SCHEDULER_ADVISOR: 'local' (default), 'anthropic' or an http(s) URL"""
+    provider = provider or os.getenv('SCHEDULER_ADVISOR', 'local')
+    if provider == 'local':
+        return LocalAdvisor()
+    if provider == 'anthropic':
+        return CachedAdvisor(AnthropicAdvisor(api_key=api_key))
+    if provider.startswith(('http://', 'https://')):
+        return CachedAdvisor(HTTPAdvisor(provider))
+    raise ValueError(f"Unknown advisor provider: {provider}")
+
+
+class StubAdvisorServer:
+    """Local HTTP server that answers advisor requests, for tests and offline runs
+
+    Every request is answered by the given function of the prompt (by default the unchanged
+    sections header, i.e. no suggested edits); point HTTPAdvisor at `url`.
+    """
+
+    def __init__(self, respond=None, host: str = '127.0.0.1', port: int = 0):
+        respond = respond or (lambda prompt: SECTIONS_HEADER)
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                prompt = json.loads(self.rfile.read(length).decode()).get('prompt', '')
+                server.requests.append(prompt)
+                body = json.dumps({'text': respond(prompt)}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,14 +1,17 @@
 import gradio as gr
 import os
-import subprocess
 import shutil
 import time
+import uuid
 import pandas as pd
 
+from jobs import JobManager, FINISHED, DONE, QUEUED
+
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 INPUT_DIR = os.path.join(BASE_DIR, "input")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+UPLOADS_DIR = os.path.join(BASE_DIR, "jobs", "uploads")
 
 # Define input file mappings - these are the files the user will upload
 INPUT_FILES = {
@@ -28,7 +31,17 @@ OUTPUT_FILES = {
     "Constraint Violations": "Constraint_Violations.csv"
 }
 
-def save_file_from_upload(file_obj, file_type):
+# Started on first use so importing app.py has no side effects
+job_manager = None
+
+def get_job_manager():
+    """The shared job queue (workers and runner set by SCHEDULER_JOB_WORKERS / SCHEDULER_JOB_RUNNER)"""
+    global job_manager
+    if job_manager is None:
+        job_manager = JobManager()
+    return job_manager
+
+def save_file_from_upload(file_obj, file_type, target_dir=INPUT_DIR):
     """Save a file from a Gradio upload and return status message"""
     if file_obj is None:
         return f"No {file_type} file uploaded"
@@ -38,7 +51,7 @@ def save_file_from_upload(file_obj, file_type):
     if not target_filename:
         return f"Unknown file type: {file_type}"
     
-    target_path = os.path.join(INPUT_DIR, target_filename)
+    target_path = os.path.join(target_dir, target_filename)
     
     try:
         # Make backup of existing file
@@ -85,8 +98,19 @@ def save_file_from_upload(file_obj, file_type):
     except Exception as e:
         return f"❌ Error processing {file_type}: {str(e)}"
 
-def upload_files(section_info, student_info, student_prefs, teacher_info, teacher_unavail, period_file):
-    """Process uploaded files and save them to the input directory"""
+def new_session():
+    """Token identifying one browser session; it owns the session's uploads and jobs"""
+    return uuid.uuid4().hex
+
+def session_upload_dir(session):
+    return os.path.join(UPLOADS_DIR, session)
+
+def upload_files(section_info, student_info, student_prefs, teacher_info, teacher_unavail, period_file, session):
+    """Save uploaded files to this browser session's upload directory
+
+    Each session uploads into its own directory, so schools using the UI at the same time never
+    overwrite each other's files. Files not uploaded fall back to the server's input directory.
+    """
     file_map = {
         "Sections Information": section_info,
         "Student Info": student_info,
@@ -96,95 +120,107 @@ def upload_files(section_info, student_info, student_prefs, teacher_info, teache
         "Period": period_file
     }
     
+    upload_dir = session_upload_dir(session)
+    os.makedirs(upload_dir, exist_ok=True)
+    
     results = []
     for file_type, file_obj in file_map.items():
-        result = save_file_from_upload(file_obj, file_type)
+        result = save_file_from_upload(file_obj, file_type, upload_dir)
         results.append(result)
     
     return "\n".join(results)
 
-def run_optimization():
-    """Run the optimization process using the Docker container"""
-    # Check if all required input files exist (excluding Period which is optional)
-    required_files = dict(INPUT_FILES)
-    optional_files = ["Period"]  # Period.csv is optional
-    
-    for opt_file in optional_files:
-        if opt_file in required_files:
-            del required_files[opt_file]
-    
-    missing_files = []
-    for file_type, filename in required_files.items():
-        file_path = os.path.join(INPUT_DIR, filename)
-        if not os.path.exists(file_path):
-            missing_files.append(f"{file_type} ({filename})")
+def job_inputs(upload_dir=None):
+    """Input files for a new job: this session's uploads, else the server's input directory"""
+    inputs = {}
+    for filename in INPUT_FILES.values():
+        for directory in [upload_dir, INPUT_DIR]:
+            if directory and os.path.exists(os.path.join(directory, filename)):
+                inputs[filename] = os.path.join(directory, filename)
+                break
+    return inputs
+
+def format_job_status(job, tail=40):
+    """Status text for a job: state, key figures and its latest output lines"""
+    metrics = job.metrics
+    results = [f"🆔 Job {job.job_id}: {job.state}" + (f" after {job.elapsed():.0f}s" if job.elapsed() else "")]
+    if job.state == QUEUED:
+        position = next((j['position'] for j in get_job_manager().list() if j['job_id'] == job.job_id), None)
+        results.append(f"⏳ Waiting in the queue (position {position})")
+    if 'sections_kept' in metrics:
+        results.append(f"📋 Consolidation kept {metrics['sections_kept']} of {metrics['sections_before']} sections")
+    if 'gap_percent' in metrics and job.state not in FINISHED:
+        results.append(f"⚙️ Solving: incumbent {metrics.get('incumbent', '-')}, bound {metrics.get('best_bound', '-')}, "
+                       f"gap {metrics['gap_percent']}% at {metrics.get('solver_seconds', 0)}s")
+    if job.state == DONE:
+        results.append("✅ Optimization completed successfully!")
+        if metrics.get('requests'):
+            rate = metrics['satisfied'] / metrics['requests'] * 100
+            results.append(f"📊 Satisfaction Rate: {rate:.2f}% ({metrics.get('status', 'N/A')})")
+            results.append(f"📊 Satisfied {metrics['satisfied']} out of {metrics['requests']} course requests")
+        for metric, count in metrics.get('violations', {}).items():
+            results.append(f"❌ {metric}: {count}")
+        results.append("\n✨ Open the Results tab and click 'Refresh Output Files' to download this job's files.")
+    elif job.state in FINISHED:
+        results.append(f"❌ Job {job.state}" + (f": {job.error}" if job.error else ""))
+    if job.lines:
+        results.append("\n--- Latest output ---")
+        results.extend(list(job.lines)[-tail:])
+    return "\n".join(results)
+
+def run_optimization(session):
+    """Queue an optimization job and stream its progress until it finishes"""
+    inputs = job_inputs(session_upload_dir(session))
+    missing_files = [f"{file_type} ({filename})" for file_type, filename in INPUT_FILES.items()
+                     if file_type != "Period" and filename not in inputs]  # Period.csv is optional
     
     if missing_files:
-        return f"❌ Cannot start optimization: Missing required input files:\n" + "\n".join(missing_files)
+        yield "", "❌ Cannot start optimization: Missing required input files:\n" + "\n".join(missing_files), {}
+        return
     
-    # Start the optimization process
     try:
-        results = ["🚀 Starting optimization process...", "⏳ This may take several minutes. Please wait..."]
-        
-        # Run the Docker optimization script
-        cmd = ["sudo", "./run_docker.sh"]
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=BASE_DIR)
-        
-        # Wait for process to complete
-        stdout, stderr = process.communicate()
-        
-        if process.returncode == 0:
-            results.append("✅ Optimization completed successfully!")
-            
-            # Check output files and show stats
-            all_found = True
-            for output_type, filename in OUTPUT_FILES.items():
-                file_path = os.path.join(OUTPUT_DIR, filename)
-                if os.path.exists(file_path):
-                    # For specific outputs, show some statistics
-                    if output_type == "Constraint Violations":
-                        try:
-                            df = pd.read_csv(file_path)
-                            for _, row in df.iterrows():
-                                if 'Metric' in row and row['Metric'] == 'Overall Satisfaction':
-                                    results.append(f"📊 Satisfaction Rate: {row['Percentage']} ({row.get('Status', 'N/A')})")
-                                    results.append(f"📊 Satisfied {int(row['Count'])} out of {int(row['Total'])} course requests")
-                        except:
-                            pass
-                    else:
-                        try:
-                            df = pd.read_csv(file_path)
-                            results.append(f"📋 {output_type}: {len(df)} records generated")
-                        except:
-                            results.append(f"📋 {output_type} file created")
-                else:
-                    results.append(f"❌ Warning: {output_type} file not found")
-                    all_found = False
-            
-            if all_found:
-                results.append("\n✨ All output files were generated successfully. Click 'Refresh Output Files' to download them.")
-        else:
-            results.append(f"❌ Error running optimization. Check system logs for details.")
-            if stderr:
-                results.append(f"Error details: {stderr[:500]}...")
-        
-        return "\n".join(results)
-        
+        job = get_job_manager().submit(inputs, owner=session)
     except Exception as e:
-        return f"❌ Error: {str(e)}"
-
-def get_output_files():
-    """Get the output files for download"""
-    output_paths = []
+        yield "", f"❌ Error: {str(e)}", {}
+        return
     
-    for filename in OUTPUT_FILES.values():
-        file_path = os.path.join(OUTPUT_DIR, filename)
-        if os.path.exists(file_path):
-            output_paths.append(file_path)
-        else:
-            output_paths.append(None)
-    
-    return output_paths
+    for update in follow_job(job.job_id, session):
+        yield (job.job_id,) + update
+
+def follow_job(job_id, session):
+    """Stream a job's status and metrics (also used to reattach to one of this session's jobs)"""
+    try:
+        for job in get_job_manager().follow(job_id, owner=session):
+            yield format_job_status(job), dict(job.metrics, state=job.state)
+    except KeyError as e:
+        yield f"❌ {str(e)}", {}
+
+def cancel_job(job_id, session):
+    """Cancel one of this session's queued or running jobs"""
+    try:
+        job = get_job_manager().cancel(job_id, owner=session)
+        return f"🛑 Cancellation requested for job {job.job_id} ({job.state})"
+    except KeyError as e:
+        return f"❌ {str(e)}"
+
+def list_jobs(session):
+    """This session's jobs, newest first"""
+    rows = [{
+        'Job ID': job['job_id'],
+        'State': job['state'],
+        'Queue Position': job['position'] or '',
+        'Started': time.strftime('%Y-%m-%d %H:%M', time.localtime(job['started'])) if job['started'] else '',
+        'Seconds': job['seconds'] or '',
+        'Satisfied': f"{job['metrics']['satisfied']}/{job['metrics']['requests']}" if job['metrics'].get('requests') else ''
+    } for job in get_job_manager().list(owner=session)]
+    return pd.DataFrame(rows, columns=['Job ID', 'State', 'Queue Position', 'Started', 'Seconds', 'Satisfied'])
+
+def get_output_files(job_id, session):
+    """Get the output files of one of this session's jobs for download"""
+    try:
+        return get_job_manager().get(job_id, owner=session).output_files(list(OUTPUT_FILES.values()))
+    except KeyError:
+        return [None] * len(OUTPUT_FILES)
 
 def create_ui():
     """Create the Gradio interface"""
@@ -192,6 +228,9 @@ def create_ui():
         gr.Markdown("# 🏫 School Schedule Optimizer")
         gr.Markdown("Upload your input files, then click 'Optimize' to generate an optimized schedule.")
         
+        # This browser session's token (a fresh one per page load); it owns the uploads and jobs
+        session = gr.State(new_session)
+        
         with gr.Tab("Input Files"):
             with gr.Column():
                 # Input file uploads
@@ -219,7 +258,8 @@ def create_ui():
                         student_prefs_file,
                         teacher_info_file,
                         teacher_unavail_file,
-                        period_file
+                        period_file,
+                        session
                     ],
                     outputs=upload_status
                 )
@@ -227,22 +267,42 @@ def create_ui():
         with gr.Tab("Optimization"):
             with gr.Column():
                 gr.Markdown("### ⚙️ Run Optimization")
-                gr.Markdown("Click the button below to start the schedule optimization process. This will run the Docker container to generate an optimal schedule.")
+                gr.Markdown("Click the button below to queue a schedule optimization job. Jobs run in the Docker container, a few at a time; progress streams below and you can leave and reattach with the job ID.")
                 
                 optimize_btn = gr.Button("Start Optimization", variant="primary")
+                with gr.Row():
+                    job_id = gr.Textbox(label="Job ID", interactive=True)
+                    follow_btn = gr.Button("Follow Job")
+                    cancel_btn = gr.Button("Cancel Job", variant="stop")
                 optimization_status = gr.Textbox(label="Optimization Status", lines=15, interactive=False)
+                job_metrics = gr.JSON(label="Solver Metrics")
                 
                 # Connect optimize button
                 optimize_btn.click(
                     fn=run_optimization,
-                    inputs=[],
+                    inputs=[session],
+                    outputs=[job_id, optimization_status, job_metrics]
+                )
+                follow_btn.click(
+                    fn=follow_job,
+                    inputs=[job_id, session],
+                    outputs=[optimization_status, job_metrics]
+                )
+                cancel_btn.click(
+                    fn=cancel_job,
+                    inputs=[job_id, session],
                     outputs=optimization_status
                 )
+                
+                gr.Markdown("### 🗂️ Jobs")
+                jobs_table = gr.Dataframe(interactive=False)
+                jobs_btn = gr.Button("Refresh Jobs")
+                jobs_btn.click(fn=list_jobs, inputs=[session], outputs=jobs_table)
         
         with gr.Tab("Results"):
             with gr.Column():
                 gr.Markdown("### 📊 Download Results")
-                gr.Markdown("Click 'Refresh' to see the latest output files, then download them.")
+                gr.Markdown("Click 'Refresh' to see the output files of the job above, then download them. Only jobs started in this browser session are available.")
                 
                 # Output file downloads
                 master_schedule = gr.File(label="Master Schedule", interactive=False)
@@ -255,7 +315,7 @@ def create_ui():
                 # Connect refresh button
                 refresh_btn.click(
                     fn=get_output_files,
-                    inputs=[],
+                    inputs=[job_id, session],
                     outputs=[
                         master_schedule,
                         student_assignments,
@@ -275,8 +335,9 @@ if __name__ == "__main__":
     parser.add_argument('--share', action='store_true', help='Create a public share link')
     args = parser.parse_args()
     
-    # Create and launch the UI
+    # Create and launch the UI; progress generators must not hold up each other's requests
     app = create_ui()
+    app.queue(default_concurrency_limit=None)
     app.launch(
         server_name="0.0.0.0",  # Listen on all network interfaces
         server_port=args.port,
@@ -0,0 +1,171 @@
+import math
+import json
+import time
+import argparse
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import gurobipy as gp
+from gurobipy import GRB
+
+# Courses whose sections are never closed
+PRESERVED_COURSES = ['Medical Career', 'Heroes Teach', 'AP Biology']
+
+
+class SectionConsolidator:
+    """Decide how many sections each course keeps open, and which ones, with a small set-selection MILP
+
+    Every course keeps enough seats for its requests plus a headroom, and enough sections for
+    its SPED students under the per-section SPED limit. Teacher loads above the section limit
+    are penalized, preserved courses stay untouched, and among the feasible choices the model
+    keeps the fewest sections and then the fewest empty seats. It has one binary per section
+    and solves in well under a second for a whole district.
+    """
+
+    def __init__(self, data: Dict[str, pd.DataFrame], seat_headroom: float = 0.10,
+                 max_teacher_sections: int = 6, max_sped_per_section: int = 12,
+                 preserved_courses: Optional[List[str]] = None, time_limit: float = 30):
+        self.sections = data['sections']
+        self.student_info = data['student_info']
+        self.student_preferences = data['student_preferences']
+        self.seat_headroom = seat_headroom
+        self.max_teacher_sections = max_teacher_sections
+        self.max_sped_per_section = max_sped_per_section
+        self.preserved_courses = PRESERVED_COURSES if preserved_courses is None else preserved_courses
+        self.time_limit = time_limit
+
+    def course_demand(self) -> pd.DataFrame:
+        """Requests and SPED requests per course, one row per course with sections"""
+        prefs = self.student_preferences.drop_duplicates('Student ID')
+        requested = prefs.assign(**{'Course ID': prefs['Preferred Sections'].astype(str).str.split(';')})
+        requested = requested.explode('Course ID').drop_duplicates(['Student ID', 'Course ID'])
+        # Count both encodings of the SPED flag so the plan never undercuts the MILP's limit
+        sped_ids = self.student_info.loc[self.student_info['SPED'].isin([1, '1', 'Yes']), 'Student ID']
+        requested['sped'] = requested['Student ID'].isin(sped_ids)
+
+        demand = requested.groupby('Course ID').agg(requests=('Student ID', 'size'), sped_requests=('sped', 'sum'))
+        seats = self.sections.groupby('Course ID').agg(
+            sections=('Section ID', 'size'), seats=('# of Seats Available', 'sum'))
+        return seats.join(demand).fillna(0).astype(int)
+
+    def solve(self) -> Dict:
+        """Solve the consolidation model and return the plan"""
+        started = time.time()
+        demand = self.course_demand()
+        sections = self.sections
+        capacity = dict(zip(sections['Section ID'], sections['# of Seats Available']))
+
+        model = gp.Model("Section_Consolidation")
+        model.setParam('OutputFlag', 0)
+        model.setParam('TimeLimit', self.time_limit)
+
+        keep = {}
+        for section_id, course_id in zip(sections['Section ID'], sections['Course ID']):
+            fixed = course_id in self.preserved_courses
+            keep[section_id] = model.addVar(vtype=GRB.BINARY, lb=1 if fixed else 0, name=f'keep_{section_id}')
+
+        by_course = sections.groupby('Course ID')['Section ID'].apply(list)
+        for course_id, section_ids in by_course.items():
+            row = demand.loc[course_id]
+            # Seats for every request plus headroom, or every seat the course has if that is less
+            needed = min(math.ceil(row['requests'] * (1 + self.seat_headroom)), row['seats'])
+            if needed > 0:
+                model.addConstr(gp.quicksum(capacity[s] * keep[s] for s in section_ids) >= needed,
+                                name=f'seats_{course_id}')
+            sped_sections = min(math.ceil(row['sped_requests'] / self.max_sped_per_section), len(section_ids))
+            if sped_sections > 0:
+                model.addConstr(gp.quicksum(keep[s] for s in section_ids) >= sped_sections,
+                                name=f'sped_{course_id}')
+
+        overload = {}
+        for teacher_id, section_ids in sections.groupby('Teacher Assigned')['Section ID'].apply(list).items():
+            if len(section_ids) > self.max_teacher_sections:
+                overload[teacher_id] = model.addVar(vtype=GRB.INTEGER, lb=0, name=f'overload_{teacher_id}')
+                model.addConstr(gp.quicksum(keep[s] for s in section_ids)
+                                <= self.max_teacher_sections + overload[teacher_id],
+                                name=f'teacher_load_{teacher_id}')
+
+        # Fewest open sections first, then fewest seats; a section over a teacher's limit costs most
+        section_weight = int(sections['# of Seats Available'].sum()) + 1
+        model.setObjective(
+            gp.quicksum((section_weight + capacity[s]) * keep[s] for s in keep)
+            + 10 * section_weight * gp.quicksum(overload.values()),
+            GRB.MINIMIZE)
+        model.optimize()
+
+        if model.SolCount == 0:
+            status = model.Status
+            model.dispose()
+            raise RuntimeError(f"Consolidation model found no plan (status {status})")
+
+        open_ids = [s for s in sections['Section ID'] if keep[s].X > 0.5]
+        close_ids = [s for s in sections['Section ID'] if keep[s].X <= 0.5]
+        kept = sections[sections['Section ID'].isin(open_ids)]
+        seats_after = kept.groupby('Course ID')['# of Seats Available'].sum()
+        courses = {}
+        for course_id, row in demand.iterrows():
+            after = int(seats_after.get(course_id, 0))
+            courses[course_id] = {
+                'requests': int(row['requests']),
+                'sections_before': int(row['sections']),
+                'sections_after': int((kept['Course ID'] == course_id).sum()),
+                'seats_before': int(row['seats']),
+                'seats_after': after,
+                'utilization_after': round(float(row['requests'] / after), 3) if after else None
+            }
+        plan = {
+            'status': 'optimal' if model.Status == GRB.OPTIMAL else 'time_limit',
+            'open': open_ids,
+            'close': close_ids,
+            'courses': courses,
+            'teacher_overload': {t: int(round(v.X)) for t, v in overload.items() if v.X > 0.5},
+            'seat_headroom': self.seat_headroom,
+            'runtime_seconds': round(time.time() - started, 3)
+        }
+        model.dispose()
+        return plan
+
+    def apply(self, plan: Dict) -> pd.DataFrame:
+        """Sections table with the closed sections removed"""
+        return self.sections[~self.sections['Section ID'].isin(plan['close'])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Close surplus sections before the final schedule solve')
+    parser.add_argument('--headroom', type=float, default=0.10,
+                        help='Extra seats kept per course as a fraction of its requests')
+    parser.add_argument('--max-teacher-sections', type=int, default=6)
+    parser.add_argument('--dry-run', action='store_true', help='Write the plan without changing the sections file')
+    args = parser.parse_args()
+
+    base_path = Path(__file__).parent
+    input_path = base_path / 'input'
+    output_path = base_path / 'output'
+    data = {
+        'sections': pd.read_csv(input_path / 'Sections_Information.csv'),
+        'student_info': pd.read_csv(input_path / 'Student_Info.csv'),
+        'student_preferences': pd.read_csv(input_path / 'Student_Preference_Info.csv')
+    }
+
+    consolidator = SectionConsolidator(data, seat_headroom=args.headroom,
+                                       max_teacher_sections=args.max_teacher_sections)
+    plan = consolidator.solve()
+    print(f"Consolidation ({plan['status']}, {plan['runtime_seconds']}s): keeping {len(plan['open'])} of "
+          f"{len(data['sections'])} sections, closing {len(plan['close'])}")
+
+    output_path.mkdir(parents=True, exist_ok=True)
+    plan_file = output_path / 'consolidation_plan.json'
+    with open(plan_file, 'w') as f:
+        json.dump(plan, f, indent=2)
+    print(f"Plan saved to {plan_file}")
+
+    if plan['close'] and not args.dry_run:
+        sections_file = input_path / 'Sections_Information.csv'
+        data['sections'].to_csv(input_path / 'Sections_Information.backup.csv', index=False)
+        consolidator.apply(plan).to_csv(sections_file, index=False)
+        print(f"Wrote {len(plan['open'])} sections to {sections_file}")
+
+
+if __name__ == "__main__":
+    main()
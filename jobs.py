@@ -0,0 +1,365 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import shutil
+import signal
+import threading
+import subprocess
+import multiprocessing
+import pandas as pd
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Input files a job needs; Period.csv is optional
+REQUIRED_INPUTS = ['Sections_Information.csv', 'Student_Info.csv', 'Student_Preference_Info.csv',
+                   'Teacher_Info.csv', 'Teacher_unavailability.csv']
+OPTIONAL_INPUTS = ['Period.csv']
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, INTERRUPTED = 'queued', 'running', 'done', 'failed', 'cancelled', 'interrupted'
+FINISHED = (DONE, FAILED, CANCELLED, INTERRUPTED)
+
+# pipeline.py exits 0 even when a stage fails, so its closing line decides
+FAILURE_MARKER = 'Pipeline execution failed.'
+
+# Progress lines -> metrics; each pattern's groups are (name, converter) in order
+PROGRESS_PATTERNS = [
+    (re.compile(r'Consolidation \((\w+), ([\d.]+)s\): keeping (\d+) of (\d+) sections'),
+     [('consolidation_status', str), ('consolidation_seconds', float), ('sections_kept', int),
+      ('sections_before', int)]),
+    (re.compile(r'Using (\d+) threads'), [('solver_threads', int)]),
+    # Gurobi's node log: ... incumbent, best bound, gap, work per node, elapsed
+    (re.compile(r'^\s*[H*]?\s*\d+\+?\s+\d+\s.*?\s(-|[-\d.e+]+)\s+([-\d.e+]+)\s+([\d.]+)%\s+\S+\s+(\d+)s\s*$'),
+     [('incumbent', float), ('best_bound', float), ('gap_percent', float), ('solver_seconds', int)]),
+    (re.compile(r'Best objective ([-\d.e+]+), best bound ([-\d.e+]+), gap ([\d.]+)%'),
+     [('incumbent', float), ('best_bound', float), ('gap_percent', float)]),
+    (re.compile(r'Final satisfaction rate: ([\d.]+)% \((.+)\)'), [('satisfaction_percent', float), ('status', str)]),
+    (re.compile(r'Satisfied (\d+) out of (\d+) course requests'), [('satisfied', int), ('requests', int)]),
+    (re.compile(r'Warning: (\d+) sections are over capacity'), [('sections_over_capacity', int)]),
+    (re.compile(r'Pipeline finished in ([\d.]+)s'), [('pipeline_seconds', float)])
+]
+
+# Lines that start a pipeline stage
+STAGE_PATTERNS = [
+    (re.compile(r'Starting Optimization Pipeline'), 'consolidation'),
+    (re.compile(r'Optimize a model with'), 'solve'),
+    (re.compile(r'Created output/Master_Schedule\.csv'), 'write'),
+    (re.compile(r'Pipeline finished'), 'summary')
+]
+
+
+def parse_progress(line: str, metrics: Dict) -> bool:
+    """Update metrics from one output line; True if anything changed"""
+    changed = False
+    for pattern, stage in STAGE_PATTERNS:
+        if pattern.search(line) and metrics.get('stage') != stage:
+            metrics['stage'] = stage
+            changed = True
+    for pattern, fields in PROGRESS_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            for (name, convert), value in zip(fields, match.groups()):
+                if value != '-':
+                    metrics[name] = convert(value)
+            changed = True
+    return changed
+
+
+class Job:
+    """One optimization run: its workspace, state, recent output and metrics"""
+
+    def __init__(self, job_id: str, workspace: str, label: str = '', created: Optional[float] = None,
+                 owner: Optional[str] = None):
+        self.job_id = job_id
+        self.workspace = workspace
+        # Token of the session that submitted the job; only it may see, follow or cancel the job
+        self.owner = owner
+        self.input_dir = os.path.join(workspace, 'input')
+        self.output_dir = os.path.join(workspace, 'output')
+        self.log_path = os.path.join(workspace, 'job.log')
+        self.label = label
+        self.state = QUEUED
+        self.created = created or time.time()
+        self.started = None
+        self.finished = None
+        self.returncode = None
+        self.error = None
+        self.metrics = {}
+        self.lines = deque(maxlen=400)
+        self.process = None
+        self.service_id = None
+        self.cancel_requested = False
+        # Bumped on every new line or state change; followers wait on it
+        self.version = 0
+        self.changed = threading.Condition()
+
+    @property
+    def container_name(self) -> str:
+        return f"scheduler-job-{self.job_id}"
+
+    def touch(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def elapsed(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return round((self.finished or time.time()) - self.started, 1)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'label': self.label,
+            'owner': self.owner,
+            'state': self.state,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': self.elapsed(),
+            'returncode': self.returncode,
+            'error': self.error,
+            'metrics': self.metrics
+        }
+
+    def save(self):
+        with open(os.path.join(self.workspace, 'job.json'), 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def output_files(self, names: List[str]) -> List[Optional[str]]:
+        """Paths of the named output files, None for the ones not written"""
+        paths = [os.path.join(self.output_dir, name) for name in names]
+        return [path if os.path.exists(path) else None for path in paths]
+
+
+class JobManager:
+    """Queue optimization jobs and run a fixed number of them at a time
+
+    Each job gets its own workspace under jobs/<id>/ with a copy of its inputs, so concurrent
+    schools never share input/ or output/. Worker threads start the pipeline as a child
+    process (in the Docker image, or with the local Python) or hand it to a warm solver
+    service, stream its output into the job's log and parse progress metrics from it. Without
+    SCHEDULER_JOB_RUNNER the service is used when one is running, else Docker. Cores are split
+    evenly between workers through SCHEDULER_SOLVER_THREADS. Jobs are cancelled by stopping
+    their process or container, or through the service.
+    """
+
+    def __init__(self, jobs_dir: Optional[str] = None, workers: Optional[int] = None,
+                 runner: Optional[str] = None, core_budget: Optional[int] = None):
+        self.jobs_dir = jobs_dir or os.environ.get('SCHEDULER_JOBS_DIR', os.path.join(BASE_DIR, 'jobs'))
+        self.workers = int(workers or os.environ.get('SCHEDULER_JOB_WORKERS', 2))
+        self.runner = runner or os.environ.get('SCHEDULER_JOB_RUNNER') or self._default_runner()
+        if self.runner not in ('docker', 'local', 'service'):
+            raise ValueError(f"Unknown job runner {self.runner!r} (expected 'docker', 'local' or 'service')")
+        self.core_budget = core_budget or max(1, multiprocessing.cpu_count() - 1)
+        self.threads = max(1, self.core_budget // self.workers)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self._load_history()
+        for index in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True).start()
+
+    @staticmethod
+    def _default_runner() -> str:
+        from solver_service import SolverClient
+        return 'service' if SolverClient().available() else 'docker'
+
+    def _load_history(self):
+        """List jobs from earlier server runs; ones that never finished are marked interrupted"""
+        for name in sorted(os.listdir(self.jobs_dir)):
+            path = os.path.join(self.jobs_dir, name, 'job.json')
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            job = Job(record['job_id'], os.path.join(self.jobs_dir, name), record.get('label', ''),
+                      record.get('created'), record.get('owner'))
+            job.started, job.finished = record.get('started'), record.get('finished')
+            job.returncode, job.error = record.get('returncode'), record.get('error')
+            job.metrics = record.get('metrics', {})
+            job.state = record['state'] if record['state'] in FINISHED else INTERRUPTED
+            self.jobs[job.job_id] = job
+
+    def submit(self, inputs: Dict[str, str], label: str = '', owner: Optional[str] = None) -> Job:
+        """Queue a job; `inputs` maps input file names to the files to copy into its workspace"""
+        missing = [name for name in REQUIRED_INPUTS if not inputs.get(name)]
+        if missing:
+            raise ValueError(f"Missing required input files: {', '.join(missing)}")
+        job_id = datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        job = Job(job_id, os.path.join(self.jobs_dir, job_id), label, owner=owner)
+        os.makedirs(job.input_dir)
+        os.makedirs(job.output_dir)
+        for name in REQUIRED_INPUTS + OPTIONAL_INPUTS:
+            if inputs.get(name):
+                shutil.copy2(inputs[name], os.path.join(job.input_dir, name))
+        job.save()
+        with self.lock:
+            self.jobs[job_id] = job
+        self.queue.put(job_id)
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Job:
+        """The job with this ID; with an owner, only if that owner submitted it"""
+        job = self.jobs.get((job_id or '').strip())
+        # Someone else's job looks the same as a missing one
+        if job is None or (owner is not None and job.owner != owner):
+            raise KeyError(f"Unknown job {job_id!r}")
+        return job
+
+    def list(self, owner: Optional[str] = None) -> List[Dict]:
+        """Jobs (of one owner, if given), newest first, with their place in the whole queue"""
+        with self.lock:
+            jobs = sorted(self.jobs.values(), key=lambda j: j.created, reverse=True)
+        queued = sorted((j for j in jobs if j.state == QUEUED), key=lambda j: j.created)
+        position = {j.job_id: index + 1 for index, j in enumerate(queued)}
+        return [dict(j.to_dict(), position=position.get(j.job_id)) for j in jobs
+                if owner is None or j.owner == owner]
+
+    def cancel(self, job_id: str, owner: Optional[str] = None) -> Job:
+        """Cancel a queued job, or stop a running one"""
+        job = self.get(job_id, owner)
+        job.cancel_requested = True
+        if job.state == QUEUED:
+            self._finish(job, CANCELLED)
+        elif job.state == RUNNING:
+            self._stop(job)
+        return job
+
+    def follow(self, job_id: str, owner: Optional[str] = None, timeout: float = 5.0) -> Iterator[Job]:
+        """Yield the job whenever it prints or changes state, until it has finished"""
+        job = self.get(job_id, owner)
+        seen = -1
+        while True:
+            with job.changed:
+                if job.version == seen:
+                    job.changed.wait(timeout)
+                seen = job.version
+            yield job
+            if job.state in FINISHED:
+                return
+
+    def command(self, job: Job) -> Tuple[List[str], Dict[str, str], str]:
+        """Command line, environment and working directory of a job's pipeline run"""
+        env = dict(os.environ, PYTHONUNBUFFERED='1', SCHEDULER_SOLVER_THREADS=str(self.threads))
+        if self.runner == 'local':
+            # Outputs are written relative to the working directory; caches stay shared
+            env.setdefault('SCHEDULER_STAGE_CACHE', os.path.join(BASE_DIR, 'cache', 'stages'))
+            env.setdefault('SCHEDULER_MODEL_CACHE', os.path.join(BASE_DIR, 'cache', 'models'))
+            return [sys.executable, os.path.join(BASE_DIR, 'pipeline.py')], env, job.workspace
+        # sudo resets the environment, so the job's settings go through env(1)
+        cmd = ['sudo', 'env', f'SCHEDULER_INPUT_DIR={job.input_dir}', f'SCHEDULER_OUTPUT_DIR={job.output_dir}',
+               f'SCHEDULER_CONTAINER_NAME={job.container_name}', f'SCHEDULER_SOLVER_THREADS={self.threads}',
+               './run_docker.sh']
+        return cmd, env, BASE_DIR
+
+    def _work(self):
+        while True:
+            job = self.get(self.queue.get())
+            if job.state == QUEUED:
+                try:
+                    self._run(job)
+                except Exception as e:
+                    job.error = str(e)
+                    self._finish(job, FAILED)
+
+    def _run(self, job: Job):
+        job.state = RUNNING
+        job.started = time.time()
+        job.save()
+        job.touch()
+        if self.runner == 'service':
+            self._run_on_service(job)
+            return
+        cmd, env, cwd = self.command(job)
+        failed = False
+        with open(job.log_path, 'a') as log:
+            job.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                           bufsize=1, cwd=cwd, env=env, start_new_session=True)
+            if job.cancel_requested:
+                self._stop(job)
+            for line in job.process.stdout:
+                log.write(line)
+                line = line.rstrip()
+                failed = failed or FAILURE_MARKER in line
+                job.lines.append(line)
+                parse_progress(line, job.metrics)
+                job.touch()
+            job.returncode = job.process.wait()
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+        elif job.returncode != 0 or failed:
+            job.error = job.error or (FAILURE_MARKER if failed else f"exit code {job.returncode}")
+            self._finish(job, FAILED)
+        else:
+            job.metrics.update(self._summary(job))
+            self._finish(job, DONE)
+
+    def _run_on_service(self, job: Job):
+        from solver_service import SolverClient
+        client = SolverClient()
+        # The service's worker runs in the job's workspace, so outputs land where they always do;
+        # the service allows workspaces under this jobs directory (SCHEDULER_JOBS_DIR on both sides)
+        job.service_id = client.submit(workspace=job.workspace)
+        if job.cancel_requested:
+            client.cancel(job.service_id)
+        with open(job.log_path, 'a') as log:
+            for status in client.follow(job.service_id):
+                for line in status['lines']:
+                    log.write(line + '\n')
+                    job.lines.append(line)
+                    parse_progress(line, job.metrics)
+                job.touch()
+        if status['state'] == CANCELLED or job.cancel_requested:
+            self._finish(job, CANCELLED)
+        elif status['state'] != DONE:
+            job.error = status['error']
+            self._finish(job, FAILED)
+        else:
+            job.metrics.update(self._summary(job))
+            self._finish(job, DONE)
+
+    def _stop(self, job: Job):
+        if self.runner == 'service':
+            if job.service_id is not None:
+                from solver_service import SolverClient
+                SolverClient().cancel(job.service_id)
+            return
+        if self.runner == 'docker':
+            subprocess.run(['sudo', 'docker', 'stop', job.container_name], capture_output=True)
+        if job.process is not None and job.process.poll() is None:
+            try:
+                os.killpg(job.process.pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                job.process.terminate()
+
+    def _summary(self, job: Job) -> Dict:
+        """Final figures from the job's verified Constraint_Violations.csv"""
+        path = os.path.join(job.output_dir, 'Constraint_Violations.csv')
+        if not os.path.exists(path):
+            return {}
+        summary = {}
+        for _, row in pd.read_csv(path).iterrows():
+            if row['Metric'] == 'Overall Satisfaction':
+                summary.update(satisfied=int(row['Count']), requests=int(row['Total']), status=row['Status'])
+            elif row['Metric'] == 'Sections Over Capacity':
+                summary['sections_over_capacity'] = int(row['Count'])
+            elif row.get('Status') == 'Violated':
+                summary.setdefault('violations', {})[row['Metric']] = int(row['Count'])
+        return summary
+
+    def _finish(self, job: Job, state: str):
+        job.state = state
+        job.finished = time.time()
+        job.save()
+        job.touch()
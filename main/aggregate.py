@@ -0,0 +1,129 @@
+# Standard library imports
+import logging
+
+# Third-party imports
+import gurobipy as gp
+from gurobipy import GRB
+
+logger = logging.getLogger(__name__)
+
+
+def request_patterns(data, course_to_sections):
+    """Group students by the set of (schedulable) courses they request"""
+    prefs = data['student_preferences'].drop_duplicates('Student ID')
+    prefs = prefs[prefs['Student ID'].isin(data['students']['Student ID'])]
+    patterns = {}
+    for student_id, courses in zip(prefs['Student ID'], prefs['Preferred Sections']):
+        key = tuple(sorted({c for c in str(courses).split(';') if c in course_to_sections}))
+        if key:
+            patterns.setdefault(key, []).append(student_id)
+    return patterns
+
+
+class AggregateModel:
+    """Master-schedule model over section periods and per-pattern course/period counts
+
+    Students with the same request pattern are interchangeable, so instead of one y
+    variable per student, section and period the model counts how many students of
+    each pattern take each course in each period. Seats are pooled per course and
+    period, which makes its optimum a lower bound on the section-level overage.
+    """
+
+    def __init__(self, optimizer, integer=False):
+        self.optimizer = optimizer
+        self.integer = integer
+        self.sections = optimizer.sections
+        self.periods = optimizer.periods
+        self.patterns = request_patterns(optimizer.data, optimizer.course_to_sections)
+        self.model = None
+
+    def build(self):
+        """Create the variables and constraints of the aggregated model"""
+        optimizer = self.optimizer
+        model = gp.Model('Aggregate_Schedule')
+        binary = GRB.BINARY if self.integer else GRB.CONTINUOUS
+        count = GRB.INTEGER if self.integer else GRB.CONTINUOUS
+
+        # z[j,p]: section j meets in period p
+        self.z = {}
+        for section_id, course_id in zip(self.sections['Section ID'], self.sections['Course ID']):
+            for period in optimizer.get_allowed_periods(course_id):
+                self.z[section_id, period] = model.addVar(vtype=binary, ub=1, name=f'z_{section_id}_{period}')
+
+        # a[k,c,p]: students of pattern k taking course c in period p
+        self.a = {}
+        for k, (courses, students) in enumerate(self.patterns.items()):
+            for course_id in courses:
+                for period in self._course_periods(course_id):
+                    self.a[k, course_id, period] = model.addVar(vtype=count, lb=0, ub=len(students),
+                                                                name=f'a_{k}_{course_id}_{period}')
+
+        # over[c,p]: students beyond the pooled seats of course c in period p
+        self.over = {}
+        for course_id in optimizer.course_to_sections:
+            for period in self._course_periods(course_id):
+                self.over[course_id, period] = model.addVar(lb=0, obj=1.0, name=f'over_{course_id}_{period}')
+
+        for section_id in self.sections['Section ID']:
+            model.addConstr(gp.quicksum(self.z[section_id, p] for p in self.periods if (section_id, p) in self.z) == 1,
+                            name=f'one_period_{section_id}')
+
+        for teacher_id, teacher_sections in self.sections.groupby('Teacher Assigned')['Section ID']:
+            for period in self.periods:
+                terms = [self.z[s, period] for s in teacher_sections if (s, period) in self.z]
+                if len(terms) > 1:
+                    model.addConstr(gp.quicksum(terms) <= 1, name=f'teacher_conflict_{teacher_id}_{period}')
+
+        for k, (courses, students) in enumerate(self.patterns.items()):
+            size = len(students)
+            for course_id in courses:
+                model.addConstr(gp.quicksum(self.a[k, course_id, p] for p in self._course_periods(course_id)) == size,
+                                name=f'pattern_course_{k}_{course_id}')
+            for period in self.periods:
+                terms = [self.a[k, c, period] for c in courses if (k, c, period) in self.a]
+                if len(terms) > 1:
+                    model.addConstr(gp.quicksum(terms) <= size, name=f'pattern_period_{k}_{period}')
+
+        capacity = self.sections.set_index('Section ID')['# of Seats Available']
+        for course_id, section_ids in optimizer.course_to_sections.items():
+            for period in self._course_periods(course_id):
+                offered = [s for s in section_ids if (s, period) in self.z]
+                demand = [var for (k, c, p), var in self._course_period_vars(course_id, period)]
+                model.addConstr(gp.quicksum(demand)
+                                <= gp.quicksum(capacity[s] * self.z[s, period] for s in offered)
+                                + self.over[course_id, period],
+                                name=f'pooled_capacity_{course_id}_{period}')
+                # Nobody can take a course in a period where no section of it meets
+                for (k, c, p), var in self._course_period_vars(course_id, period):
+                    model.addConstr(var <= len(self.pattern_students(k)) * gp.quicksum(self.z[s, period] for s in offered),
+                                    name=f'offered_{k}_{course_id}_{period}')
+
+        model.ModelSense = GRB.MINIMIZE
+        model.update()
+        self.model = model
+        logger.info(f"Aggregate model: {len(self.patterns)} request patterns, {model.NumVars:,} variables, "
+                    f"{model.NumConstrs:,} constraints")
+        return model
+
+    def _course_periods(self, course_id):
+        """Periods in which any section of a course may meet"""
+        return self.optimizer.get_allowed_periods(course_id)
+
+    def _course_period_vars(self, course_id, period):
+        """Pattern count variables for one course and period"""
+        if not hasattr(self, '_by_course_period'):
+            self._by_course_period = {}
+            for key, var in self.a.items():
+                self._by_course_period.setdefault((key[1], key[2]), []).append((key, var))
+        return self._by_course_period.get((course_id, period), [])
+
+    def pattern_students(self, k):
+        """Student IDs that share request pattern k"""
+        if not hasattr(self, '_pattern_list'):
+            self._pattern_list = list(self.patterns.values())
+        return self._pattern_list[k]
+
+    def z_values(self):
+        """Section/period values of the last solve as a dict"""
+        values = self.model.getAttr('X', list(self.z.values()))
+        return dict(zip(self.z.keys(), values))
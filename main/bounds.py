@@ -0,0 +1,154 @@
+# Standard library imports
+import logging
+from collections import defaultdict
+from itertools import combinations
+
+# Third-party imports
+import gurobipy as gp
+
+# Local imports
+from aggregate import request_patterns
+
+logger = logging.getLogger(__name__)
+
+
+class BoundAnalyzer:
+    """Analytic lower bounds on total overage and valid inequalities for the scheduling MILP"""
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+        self.sections = optimizer.sections
+        self.periods = optimizer.periods
+        self.patterns = request_patterns(optimizer.data, optimizer.course_to_sections)
+        self.capacity = dict(zip(self.sections['Section ID'], self.sections['# of Seats Available']))
+        self.cut_counts = {}
+
+    def course_bounds(self):
+        """Per course: requests minus total seats, the overage no schedule can avoid"""
+        demand = defaultdict(int)
+        for courses, students in self.patterns.items():
+            for course_id in courses:
+                demand[course_id] += len(students)
+        seats = self.sections.groupby('Course ID')['# of Seats Available'].sum()
+        return {course_id: int(demand[course_id] - seats[course_id])
+                for course_id in self.optimizer.course_to_sections if demand[course_id] > seats[course_id]}
+
+    def period_covers(self):
+        """Students who take a class every period, and the sections that can hold them"""
+        full_load = [(courses, students) for courses, students in self.patterns.items()
+                     if len(courses) == len(self.periods)]
+        if not full_load:
+            return []
+        required = sum(len(students) for _, students in full_load)
+        courses = set().union(*(set(c) for c, _ in full_load))
+        covers = []
+        for period in self.periods:
+            sections = [s for c in courses for s in self.optimizer.course_to_sections[c]
+                        if period in self.optimizer.get_allowed_periods(c)]
+            covers.append({'period': period, 'students': required, 'sections': sections,
+                           'max_seats': int(sum(self.capacity[s] for s in sections))})
+        return covers
+
+    def conflict_cliques(self):
+        """Sections that must all meet in different periods, grown from teacher loads
+
+        Two sections conflict when they share a teacher, or when both are the only section
+        of their course and some student requests both courses.
+        """
+        teacher_groups = defaultdict(list)
+        teachers = set(self.optimizer.teachers['Teacher ID'])
+        for section_id, teacher_id in zip(self.sections['Section ID'], self.sections['Teacher Assigned']):
+            if teacher_id in teachers:
+                teacher_groups[teacher_id].append(section_id)
+
+        single = {c: s[0] for c, s in self.optimizer.course_to_sections.items() if len(s) == 1}
+        neighbours = defaultdict(set)
+        for group in teacher_groups.values():
+            for a, b in combinations(group, 2):
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+        request_groups = []
+        for courses in self.patterns:
+            only = [single[c] for c in courses if c in single]
+            if len(only) > 1:
+                request_groups.append(only)
+            for a, b in combinations(only, 2):
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+
+        cliques = set()
+        for seed in list(teacher_groups.values()) + request_groups:
+            clique = set(seed)
+            candidates = set.intersection(*(neighbours[s] for s in clique)) - clique
+            # Greedy extension, preferring the best connected candidate
+            while candidates:
+                best = max(candidates, key=lambda s: len(neighbours[s]))
+                clique.add(best)
+                candidates &= neighbours[best]
+            if len(clique) > 1:
+                cliques.add(frozenset(clique))
+        # Rows identical to a plain teacher conflict add nothing
+        existing = {frozenset(g) for g in teacher_groups.values()}
+        return [sorted(c) for c in cliques if c not in existing]
+
+    def objective_bound(self):
+        """Lower bound on total capacity_violation implied by the analytic bounds"""
+        course_total = sum(self.course_bounds().values())
+        cover_total = max([c['students'] - c['max_seats'] for c in self.period_covers()] + [0])
+        return max(course_total, cover_total)
+
+    def add_cuts(self):
+        """Add the bounds as constraints to the optimizer's built model"""
+        optimizer = self.optimizer
+        model = optimizer.model
+        cv = optimizer.capacity_violation
+        counts = defaultdict(int)
+        self.constrs = []
+
+        for course_id, bound in self.course_bounds().items():
+            self.constrs.append(model.addConstr(
+                gp.quicksum(cv[s] for s in optimizer.course_to_sections[course_id]) >= bound,
+                name=f'course_overage_bound_{course_id}'))
+            counts['course_overage'] += 1
+
+        for cover in self.period_covers():
+            period = cover['period']
+            self.constrs.append(model.addConstr(
+                gp.quicksum(self.capacity[s] * optimizer.z[s, period] for s in cover['sections'])
+                + gp.quicksum(cv[s] for s in cover['sections']) >= cover['students'],
+                name=f'period_seat_cover_{period}'))
+            counts['period_seat_cover'] += 1
+
+        for index, clique in enumerate(self.conflict_cliques()):
+            for period in self.periods:
+                terms = [optimizer.z[s, period] for s in clique if (s, period) in optimizer.z]
+                if len(terms) > 1:
+                    self.constrs.append(model.addConstr(gp.quicksum(terms) <= 1,
+                                                        name=f'conflict_clique_{index}_{period}'))
+                    counts['conflict_clique'] += 1
+
+        bound = self.objective_bound()
+        if bound > 0:
+            self.constrs.append(model.addConstr(gp.quicksum(cv.values()) >= bound, name='total_overage_bound'))
+            counts['total_overage'] += 1
+        self.cut_counts = dict(counts)
+        logger.info(f"Added bound cuts: {self.cut_counts}; overage lower bound {bound}")
+        return bound
+
+    def report(self):
+        """Structured summary of the bounds and any infeasibility they reveal"""
+        cliques = self.conflict_cliques()
+        course_of = dict(zip(self.sections['Section ID'], self.sections['Course ID']))
+        too_large = []
+        for clique in cliques:
+            reachable = set().union(*(self.optimizer.get_allowed_periods(course_of[s]) for s in clique))
+            if len(clique) > len(reachable):
+                too_large.append(clique)
+        return {
+            'objective_bound': self.objective_bound(),
+            'course_bounds': self.course_bounds(),
+            'period_covers': [{k: v for k, v in c.items() if k != 'sections'} for c in self.period_covers()],
+            'conflict_cliques': len(cliques),
+            'infeasible_cliques': too_large,
+            'cuts_added': self.cut_counts
+        }
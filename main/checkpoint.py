@@ -0,0 +1,126 @@
+# Standard library imports
+import os
+import time
+import logging
+import tempfile
+
+# Third-party imports
+import numpy as np
+from gurobipy import GRB
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = 'incumbent.npz'
+
+
+def instance_key(optimizer):
+    """Key of the problem instance (input tables, options and formulation) a checkpoint belongs to"""
+    from model_cache import instance_hash
+    return instance_hash(optimizer)
+
+
+def save_checkpoint(solution, objective, directory, instance=''):
+    """Write a solution as compressed arrays, replacing the previous checkpoint atomically"""
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez_compressed(
+            f,
+            objective=np.float64(objective),
+            instance=np.str_(instance),
+            saved_at=np.float64(time.time()),
+            schedule_sections=np.asarray(solution['schedule']['Section ID'], dtype=str),
+            schedule_periods=np.asarray(solution['schedule']['Period'], dtype=str),
+            assigned_students=np.asarray(solution['assignments']['Student ID'], dtype=str),
+            assigned_sections=np.asarray(solution['assignments']['Section ID'], dtype=str)
+        )
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_checkpoint(directory, instance=None):
+    """Return (solution, objective, saved_at) from the latest checkpoint, or None
+
+    With an instance key, a checkpoint saved for another instance (or without a key) is ignored.
+    """
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            saved_instance = str(data['instance']) if 'instance' in data.files else ''
+            if instance is not None and saved_instance != instance:
+                logger.warning(f"Ignoring checkpoint {path}: it was saved for a different instance")
+                return None
+            solution = {
+                'schedule': {'Section ID': data['schedule_sections'].tolist(),
+                             'Period': data['schedule_periods'].tolist()},
+                'assignments': {'Student ID': data['assigned_students'].tolist(),
+                                'Section ID': data['assigned_sections'].tolist()}
+            }
+            return solution, float(data['objective']), float(data['saved_at'])
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {str(e)}")
+        return None
+
+
+class Checkpointer:
+    """Checkpoint every improved incumbent and refresh the output CSVs on a throttle during a solve"""
+
+    def __init__(self, optimizer, directory=os.path.join('output', 'checkpoints'), csv_interval=60):
+        self.optimizer = optimizer
+        self.directory = directory
+        self.csv_interval = csv_interval
+        self.best = float('inf')
+        self.pending = None
+        self.last_csv_write = 0.0
+        self.checkpoints = 0
+        self.instance = instance_key(optimizer)
+        self.x_keys = self.x_vars = self.z_keys = self.z_vars = None
+
+    def _incumbent(self, model):
+        """Read the new incumbent inside a MIPSOL callback as a columnar solution"""
+        if self.x_vars is None:
+            self.x_keys, self.x_vars = list(self.optimizer.x.keys()), list(self.optimizer.x.values())
+            self.z_keys, self.z_vars = list(self.optimizer.z.keys()), list(self.optimizer.z.values())
+        x_on = np.flatnonzero(np.asarray(model.cbGetSolution(self.x_vars)) > 0.5)
+        z_on = np.flatnonzero(np.asarray(model.cbGetSolution(self.z_vars)) > 0.5)
+        scheduled = [self.z_keys[i] for i in z_on]
+        assigned = [self.x_keys[i] for i in x_on]
+        return {
+            'schedule': {'Section ID': [s for s, _ in scheduled], 'Period': [p for _, p in scheduled]},
+            'assignments': {'Student ID': [i for i, _ in assigned], 'Section ID': [s for _, s in assigned]}
+        }
+
+    def flush(self, force=False):
+        """Write the pending incumbent to the output CSVs if the throttle allows it"""
+        if self.pending is None:
+            return
+        if not force and time.time() - self.last_csv_write < self.csv_interval:
+            return
+        self.optimizer.save_solution(self.pending)
+        self.last_csv_write = time.time()
+        self.pending = None
+
+    def callback(self, model, where):
+        """Hook for the solve callback: checkpoint on MIPSOL, flush throttled CSVs on MIP"""
+        if where == GRB.Callback.MIPSOL:
+            objective = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+            if objective >= self.best:
+                return
+            self.best = objective
+            self.pending = self._incumbent(model)
+            # A failed write must never take the solve down with it
+            try:
+                save_checkpoint(self.pending, objective, self.directory, self.instance)
+                self.checkpoints += 1
+                logger.info(f"Checkpointed incumbent with objective {objective:.0f}")
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Checkpoint write failed: {str(e)}")
+        elif where == GRB.Callback.MIP:
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Anytime CSV write failed: {str(e)}")
@@ -0,0 +1,318 @@
+# Standard library imports
+import math
+import time
+import logging
+from collections import defaultdict
+from itertools import combinations
+
+# Third-party imports
+import gurobipy as gp
+from gurobipy import GRB
+
+# Local imports
+from sectioning import Sectioner, match_periods, hall_violator
+
+logger = logging.getLogger(__name__)
+
+
+def _peel_timetables(counts, courses, periods, size):
+    """Split per-pattern course/period counts into one conflict-free timetable per student
+
+    counts[(course, period)] students of the pattern take the course in that period; every
+    course row sums to size and every period column to at most size. Padding the columns
+    with dummy rows makes the multigraph size-regular, so a perfect matching always exists
+    and peeling one off leaves a regular graph again (Konig's edge colouring theorem).
+    """
+    rows = [dict((p, counts.get((c, p), 0)) for p in periods) for c in courses]
+    slack = {p: size - sum(row[p] for row in rows) for p in periods}
+    for _ in range(len(periods) - len(courses)):
+        dummy, room = {}, size
+        for p in periods:
+            take = min(room, slack[p])
+            if take:
+                dummy[p] = take
+                slack[p] -= take
+                room -= take
+        rows.append(dummy)
+
+    timetables = []
+    for _ in range(size):
+        options = [[p for p, m in row.items() if m > 0] for row in rows]
+        chosen = match_periods(options)
+        for row, period in zip(rows, chosen):
+            row[period] -= 1
+        timetables.append(dict(zip(courses, chosen[:len(courses)])))
+    return timetables
+
+
+class TwoStageDecomposition:
+    """Schedule sections to periods first (z only), then section students with z fixed"""
+
+    def __init__(self, optimizer, stage1_time=300, stage2_time=300, max_rounds=10, corequest_pairs=200):
+        self.optimizer = optimizer
+        self.stage1_time = stage1_time
+        self.stage2_time = stage2_time
+        self.max_rounds = max_rounds
+        self.corequest_pairs = corequest_pairs
+        self.sections = optimizer.sections
+        self.periods = optimizer.periods
+        self.course_of = dict(zip(self.sections['Section ID'], self.sections['Course ID']))
+        self.capacity = dict(zip(self.sections['Section ID'], self.sections['# of Seats Available']))
+
+        # Request patterns, split by SPED so stage 2 can enforce the SPED distribution rule
+        prefs = optimizer.student_preferences.drop_duplicates('Student ID').set_index('Student ID')['Preferred Sections']
+        sped = set(optimizer.students.loc[optimizer.students['SPED'] == 1, 'Student ID'])
+        self.groups = defaultdict(list)
+        for student_id in optimizer.students['Student ID']:
+            if student_id not in prefs.index:
+                continue
+            courses = tuple(sorted({c for c in str(prefs[student_id]).split(';') if c in optimizer.course_to_sections}))
+            if courses:
+                self.groups[courses, student_id in sped].append(student_id)
+        self.pattern_sizes = defaultdict(int)
+        for (courses, _), students in self.groups.items():
+            self.pattern_sizes[courses] += len(students)
+
+        self.cuts = set()
+
+    def build_master(self):
+        """Stage 1: section periods, per-course period counts and pattern coverage"""
+        optimizer = self.optimizer
+        model = gp.Model('Master_Schedule')
+        model.setParam('OutputFlag', 0)
+
+        self.z = {}
+        for section_id, course_id in zip(self.sections['Section ID'], self.sections['Course ID']):
+            for period in optimizer.get_allowed_periods(course_id):
+                self.z[section_id, period] = model.addVar(vtype=GRB.BINARY, name=f'z_{section_id}_{period}')
+
+        # n[c,p] counts sections of course c in period p; o[c,p] marks that the course is offered then
+        self.n, self.o = {}, {}
+        for course_id, section_ids in optimizer.course_to_sections.items():
+            allowed = optimizer.get_allowed_periods(course_id)
+            target = math.ceil(len(section_ids) / len(allowed))
+            for period in allowed:
+                self.n[course_id, period] = model.addVar(vtype=GRB.INTEGER, ub=len(section_ids),
+                                                         name=f'n_{course_id}_{period}')
+                self.o[course_id, period] = model.addVar(vtype=GRB.BINARY, name=f'o_{course_id}_{period}')
+                model.addConstr(self.n[course_id, period] == gp.quicksum(self.z[s, period] for s in section_ids),
+                                name=f'count_{course_id}_{period}')
+                model.addConstr(self.o[course_id, period] <= self.n[course_id, period],
+                                name=f'offered_{course_id}_{period}')
+                # Spreading a course's sections over periods leaves stage 2 room to balance seats
+                crowding = model.addVar(lb=0, obj=1.0, name=f'crowding_{course_id}_{period}')
+                model.addConstr(crowding >= self.n[course_id, period] - target, name=f'spread_{course_id}_{period}')
+
+        for section_id in self.sections['Section ID']:
+            model.addConstr(gp.quicksum(self.z[section_id, p] for p in self.periods if (section_id, p) in self.z) == 1,
+                            name=f'one_period_{section_id}')
+
+        teacher_sections = self.sections[self.sections['Teacher Assigned'].isin(optimizer.teachers['Teacher ID'])]
+        for teacher_id, section_ids in teacher_sections.groupby('Teacher Assigned')['Section ID']:
+            for period in self.periods:
+                terms = [self.z[s, period] for s in section_ids if (s, period) in self.z]
+                if len(terms) > 1:
+                    model.addConstr(gp.quicksum(terms) <= 1, name=f'teacher_conflict_{teacher_id}_{period}')
+
+        # Every pattern needs at least as many periods with one of its courses as it has courses
+        for k, courses in enumerate(self.pattern_sizes):
+            covered = []
+            for period in self.periods:
+                offered = [self.o[c, period] for c in courses if (c, period) in self.o]
+                if offered:
+                    w = model.addVar(vtype=GRB.BINARY, name=f'w_{k}_{period}')
+                    model.addConstr(w <= gp.quicksum(offered), name=f'pattern_period_{k}_{period}')
+                    covered.append(w)
+            model.addConstr(gp.quicksum(covered) >= len(courses), name=f'pattern_cover_{k}')
+
+        # Penalize stacking all sections of often co-requested courses in the same period
+        corequests = defaultdict(int)
+        for courses, size in self.pattern_sizes.items():
+            for pair in combinations(courses, 2):
+                corequests[pair] += size
+        top = sorted(corequests.items(), key=lambda item: -item[1])[:self.corequest_pairs]
+        heaviest = top[0][1] if top else 1
+        for (c1, c2), weight in top:
+            s1, s2 = len(optimizer.course_to_sections[c1]), len(optimizer.course_to_sections[c2])
+            for period in self.periods:
+                if (c1, period) in self.n and (c2, period) in self.n:
+                    clash = model.addVar(lb=0, obj=weight / heaviest, name=f'corequest_{c1}_{c2}_{period}')
+                    model.addConstr(clash >= self.n[c1, period] / s1 + self.n[c2, period] / s2 - 1,
+                                    name=f'corequest_{c1}_{c2}_{period}')
+
+        model.ModelSense = GRB.MINIMIZE
+        model.update()
+        self.master = model
+        logger.info(f"Stage 1 model: {model.NumVars:,} variables, {model.NumConstrs:,} constraints, "
+                    f"{len(self.pattern_sizes)} request patterns")
+        return model
+
+    def solve_master(self, time_limit):
+        """Solve stage 1 and return the section -> period schedule, or None"""
+        self.master.setParam('TimeLimit', max(1.0, time_limit))
+        self.master.optimize()
+        if self.master.SolCount == 0:
+            logger.error(f"Stage 1 found no schedule (status {self.master.status})")
+            return None
+        values = self.master.getAttr('X', list(self.z.values()))
+        return {section_id: period for (section_id, period), value in zip(self.z.keys(), values) if value > 0.5}
+
+    def unplaceable_patterns(self, schedule):
+        """Patterns whose courses cannot meet in distinct periods under a schedule"""
+        offered = defaultdict(set)
+        for section_id, period in schedule.items():
+            offered[self.course_of[section_id]].add(period)
+        stuck = []
+        for courses in self.pattern_sizes:
+            violator = hall_violator([sorted(offered[c]) for c in courses])
+            if violator is not None:
+                stuck.append((courses, [courses[i] for i in violator[0]], violator[1]))
+        return stuck
+
+    def add_pattern_cut(self, courses, periods):
+        """Require one of the stuck courses to be offered outside the periods they share"""
+        key = (tuple(courses), frozenset(periods))
+        if key in self.cuts:
+            return False
+        terms = [self.o[c, p] for c in courses for p in self.optimizer.get_allowed_periods(c) if p not in periods]
+        if not terms:
+            return False
+        self.master.addConstr(gp.quicksum(terms) >= 1, name=f'pattern_cut_{len(self.cuts)}')
+        self.cuts.add(key)
+        return True
+
+    def _components(self, patterns):
+        """Group pattern keys whose courses are linked through shared requests"""
+        parent = {}
+
+        def find(course):
+            parent.setdefault(course, course)
+            while parent[course] != course:
+                parent[course] = parent[parent[course]]
+                course = parent[course]
+            return course
+
+        for courses, _ in patterns:
+            for course in courses[1:]:
+                parent[find(course)] = find(courses[0])
+        components = defaultdict(list)
+        for key in patterns:
+            components[find(key[0][0])].append(key)
+        return list(components.values())
+
+    def _section_component(self, keys, schedule, time_limit):
+        """Stage 2 for one component: pattern/section counts with z fixed"""
+        optimizer = self.optimizer
+        model = gp.Model('Student_Sectioning')
+        model.setParam('OutputFlag', 0)
+        model.setParam('TimeLimit', max(1.0, time_limit))
+
+        b = {}
+        for k, key in enumerate(keys):
+            courses, _ = key
+            size = len(self.groups[key])
+            for course_id in courses:
+                for section_id in optimizer.course_to_sections[course_id]:
+                    b[k, section_id] = model.addVar(vtype=GRB.INTEGER, lb=0, ub=size, name=f'b_{k}_{section_id}')
+                model.addConstr(gp.quicksum(b[k, s] for s in optimizer.course_to_sections[course_id]) == size,
+                                name=f'request_{k}_{course_id}')
+            for period in self.periods:
+                terms = [b[k, s] for c in courses for s in optimizer.course_to_sections[c] if schedule.get(s) == period]
+                if len(terms) > 1:
+                    model.addConstr(gp.quicksum(terms) <= size, name=f'period_{k}_{period}')
+
+        by_section = defaultdict(list)
+        for (k, section_id), var in b.items():
+            by_section[section_id].append((k, var))
+        for section_id, terms in by_section.items():
+            over = model.addVar(lb=0, obj=1.0, name=f'over_{section_id}')
+            model.addConstr(gp.quicksum(var for _, var in terms) <= self.capacity[section_id] + over,
+                            name=f'capacity_{section_id}')
+            # Same SPED distribution limit as the monolithic model
+            sped_terms = [var for k, var in terms if keys[k][1]]
+            if sped_terms:
+                model.addConstr(gp.quicksum(sped_terms) <= optimizer.max_sped_per_section, name=f'sped_{section_id}')
+
+        model.ModelSense = GRB.MINIMIZE
+        model.optimize()
+        if model.SolCount == 0:
+            logger.error(f"Stage 2 component with {len(keys)} patterns found no sectioning (status {model.status})")
+            return None
+        values = dict(zip(b.keys(), model.getAttr('X', list(b.values()))))
+
+        timetable = {}
+        for k, key in enumerate(keys):
+            courses, _ = key
+            students = self.groups[key]
+            pools = defaultdict(list)
+            for course_id in courses:
+                for section_id in optimizer.course_to_sections[course_id]:
+                    pools[course_id, schedule[section_id]].extend([section_id] * int(round(values[k, section_id])))
+            counts = {slot: len(pool) for slot, pool in pools.items()}
+            for student_id, periods in zip(students, _peel_timetables(counts, courses, self.periods, len(students))):
+                timetable[student_id] = {p: pools[c, p].pop() for c, p in periods.items()}
+        return timetable
+
+    def solve_sectioning(self, schedule, stuck_patterns=()):
+        """Stage 2: seat students for a fixed schedule, one independent model per component"""
+        stuck = set(stuck_patterns)
+        keys = [key for key in self.groups if key[0] not in stuck]
+        components = self._components(keys)
+        deadline = time.time() + self.stage2_time
+
+        sectioner = Sectioner(self.sections, schedule)
+        fallback = [key for key in self.groups if key[0] in stuck]
+        for index, component in enumerate(sorted(components, key=len, reverse=True)):
+            remaining = max(1.0, (deadline - time.time()) / (len(components) - index))
+            timetable = self._section_component(component, schedule, remaining)
+            if timetable is None:
+                fallback.extend(component)
+                continue
+            for student_id, periods in timetable.items():
+                sectioner.timetable[student_id] = periods
+                for section_id in periods.values():
+                    sectioner.enrolled[section_id] += 1
+
+        # Students the models could not place get the best partial timetable the greedy finds
+        for key in fallback:
+            for student_id in self.groups[key]:
+                sectioner.place(student_id, list(key[0]))
+        return sectioner
+
+    def run(self):
+        """Alternate stage 1 and pattern feedback, then section students; returns (solution, report)"""
+        start = time.time()
+        self.build_master()
+        deadline = start + self.stage1_time
+        schedule, stuck, rounds = None, [], 0
+        while rounds < self.max_rounds:
+            rounds += 1
+            candidate = self.solve_master(deadline - time.time())
+            if candidate is None:
+                break
+            schedule = candidate
+            stuck = self.unplaceable_patterns(schedule)
+            added = sum(self.add_pattern_cut(subset, periods) for _, subset, periods in stuck)
+            logger.info(f"Stage 1 round {rounds}: {len(stuck)} unplaceable patterns, {added} cuts added")
+            if not stuck or not added or time.time() >= deadline:
+                break
+        if schedule is None:
+            raise RuntimeError("Stage 1 could not produce a master schedule")
+
+        stuck_patterns = [courses for courses, _, _ in stuck]
+        sectioner = self.solve_sectioning(schedule, stuck_patterns)
+        solution = sectioner.solution()
+        overage = int(self.optimizer.section_overages(solution).sum())
+        report = {
+            'mode': 'decomposition',
+            'objective': overage,
+            'stage1_rounds': rounds,
+            'pattern_cuts': len(self.cuts),
+            'unplaceable_patterns': [list(c) for c in stuck_patterns],
+            'unplaced_requests': len(sectioner.unplaced),
+            'stage1_variables': self.master.NumVars,
+            'runtime_seconds': time.time() - start
+        }
+        logger.info(f"Decomposition: overage {overage}, {len(self.cuts)} pattern cuts over {rounds} rounds, "
+                    f"{len(sectioner.unplaced)} unplaced requests in {report['runtime_seconds']:.1f}s")
+        return solution, report
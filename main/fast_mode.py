@@ -0,0 +1,119 @@
+# Standard library imports
+import time
+import random
+import logging
+
+# Third-party imports
+from gurobipy import GRB
+
+# Local imports
+from aggregate import AggregateModel
+from sectioning import Sectioner
+
+logger = logging.getLogger(__name__)
+
+
+class FastScheduler:
+    """Approximate schedules from the LP relaxation with rounding and greedy repair"""
+
+    def __init__(self, optimizer, rounds=8, time_limit=60, seed=0):
+        if rounds < 1:
+            raise ValueError(f"Fast mode needs at least one rounding round, got {rounds}")
+        self.optimizer = optimizer
+        self.rounds = rounds
+        self.time_limit = time_limit
+        self.rng = random.Random(seed)
+
+    def solve_relaxation(self):
+        """Solve the aggregated LP and return fractional z values and its bound"""
+        aggregate = AggregateModel(self.optimizer, integer=False)
+        model = aggregate.build()
+        model.setParam('OutputFlag', 0)
+        model.setParam('Method', 2)      # Barrier handles the large, sparse LP best
+        model.setParam('Crossover', 0)   # Interior values are fine for randomized rounding
+        model.setParam('TimeLimit', max(1.0, self.time_limit / 2))
+        model.optimize()
+        if model.SolCount == 0:
+            logger.warning(f"LP relaxation returned no solution (status {model.status}); rounding uniformly")
+            return {}, None
+        # Only an optimal LP value is a valid lower bound on the MILP objective
+        bound = model.ObjVal if model.status == GRB.OPTIMAL else None
+        return aggregate.z_values(), bound
+
+    def round_schedule(self, z_values):
+        """Dependent rounding of z: sample periods per teacher without reusing a period"""
+        optimizer = self.optimizer
+        schedule = {}
+        clashes = 0
+        for teacher_id, group in optimizer.sections.groupby('Teacher Assigned', sort=False):
+            rows = list(zip(group['Section ID'], group['Course ID']))
+            self.rng.shuffle(rows)
+            # Decide the most constrained sections first
+            rows.sort(key=lambda r: len(optimizer.get_allowed_periods(r[1])))
+            taken = set()
+            for section_id, course_id in rows:
+                allowed = optimizer.get_allowed_periods(course_id)
+                free = [p for p in allowed if p not in taken]
+                if not free:
+                    clashes += 1
+                    free = list(allowed)
+                weights = [max(z_values.get((section_id, p), 0.0), 0.0) + 1e-6 for p in free]
+                period = self.rng.choices(free, weights=weights)[0]
+                schedule[section_id] = period
+                taken.add(period)
+        return schedule, clashes
+
+    def repair(self, schedule):
+        """Seat students for a rounded schedule and rebalance over-full sections"""
+        optimizer = self.optimizer
+        sectioner = Sectioner(optimizer.sections, schedule)
+        prefs = optimizer.student_preferences.drop_duplicates('Student ID').set_index('Student ID')['Preferred Sections']
+        requests = []
+        for student_id in optimizer.students['Student ID']:
+            if student_id not in prefs.index:
+                continue
+            courses = [c for c in dict.fromkeys(str(prefs[student_id]).split(';')) if c in optimizer.course_to_sections]
+            requests.append((student_id, courses))
+        # Students with the most requests are the hardest to place, so they go first
+        self.rng.shuffle(requests)
+        requests.sort(key=lambda r: -len(r[1]))
+        for student_id, courses in requests:
+            sectioner.place(student_id, courses)
+        sectioner.rebalance()
+        return sectioner
+
+    def run(self):
+        """Return (solution, report) for the best of several rounded schedules"""
+        start = time.time()
+        z_values, bound = self.solve_relaxation()
+        lp_time = time.time() - start
+
+        best = None
+        rounds_done = 0
+        for _ in range(self.rounds):
+            if rounds_done and time.time() - start > self.time_limit:
+                break
+            schedule, clashes = self.round_schedule(z_values)
+            sectioner = self.repair(schedule)
+            key = (len(sectioner.unplaced), clashes, sectioner.total_overage())
+            rounds_done += 1
+            if best is None or key < best[0]:
+                best = (key, sectioner, clashes)
+
+        (unplaced, clashes, overage), sectioner, _ = best
+        gap = (overage - bound) / overage if bound is not None and overage > 0 else (0.0 if bound is not None else None)
+        report = {
+            'mode': 'fast',
+            'objective': overage,
+            'lp_bound': bound,
+            'gap_estimate': gap,
+            'unplaced_requests': unplaced,
+            'teacher_clashes': clashes,
+            'rounds': rounds_done,
+            'lp_seconds': lp_time,
+            'runtime_seconds': time.time() - start
+        }
+        gap_text = f"{gap:.2%}" if gap is not None else "unknown"
+        logger.info(f"Fast mode: overage {overage} vs LP bound {bound} (gap {gap_text}), "
+                    f"{unplaced} unplaced requests, {rounds_done} rounds in {report['runtime_seconds']:.1f}s")
+        return sectioner.solution(), report
@@ -0,0 +1,339 @@
+# Standard library imports
+import time
+import random
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Third-party imports
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class Neighborhood:
+    """A set of sections whose period and student assignments are re-optimized together"""
+
+    def __init__(self, kind, label, sections, periods, fix_periods=False):
+        self.kind = kind
+        self.label = label
+        self.sections = frozenset(sections)
+        # Periods the free sections may occupy; the incumbent periods are always inside this set
+        self.periods = frozenset(periods)
+        self.fix_periods = fix_periods
+        self.students = frozenset()
+        self.teachers = frozenset()
+
+    def overlaps(self, other):
+        """Check whether two neighborhoods could produce conflicting moves when merged"""
+        if self.sections & other.sections:
+            return True
+        if not (self.periods & other.periods):
+            return False
+        return bool(self.students & other.students) or bool(self.teachers & other.teachers)
+
+    def __repr__(self):
+        return f"Neighborhood({self.kind}: {self.label}, {len(self.sections)} sections)"
+
+
+def build_subproblem(data, schedule, assignments, neighborhood):
+    """Build the data for a neighborhood sub-MILP with everything outside it held fixed"""
+    sections = data['sections'][data['sections']['Section ID'].isin(neighborhood.sections)]
+    section_to_course = sections.set_index('Section ID')['Course ID'].to_dict()
+
+    # Students move only among the free sections of the courses they already hold there
+    inside = assignments[assignments['Section ID'].isin(neighborhood.sections)]
+    courses = inside.assign(**{'Course ID': inside['Section ID'].map(section_to_course)})
+    preferences = (courses.groupby('Student ID')['Course ID']
+                   .agg(lambda c: ';'.join(sorted(set(c))))
+                   .rename('Preferred Sections').reset_index())
+    students = data['students'][data['students']['Student ID'].isin(preferences['Student ID'])]
+
+    # Periods occupied by the fixed part of the schedule are blocked for the free parts
+    outside = assignments[~assignments['Section ID'].isin(neighborhood.sections)
+                          & assignments['Student ID'].isin(preferences['Student ID'])]
+    outside_periods = outside['Section ID'].map(schedule)
+    blocked_students = outside.assign(Period=outside_periods).groupby('Student ID')['Period'].agg(set).to_dict()
+
+    section_teacher = data['sections'].set_index('Section ID')['Teacher Assigned']
+    fixed_sections = [s for s in schedule if s not in neighborhood.sections]
+    fixed_teachers = section_teacher.reindex(fixed_sections)
+    blocked_teachers = {}
+    for section_id, teacher_id in fixed_teachers.items():
+        blocked_teachers.setdefault(teacher_id, set()).add(schedule[section_id])
+
+    subdata = {
+        'students': students,
+        'student_preferences': preferences,
+        'teachers': data['teachers'][data['teachers']['Teacher ID'].isin(sections['Teacher Assigned'])],
+        'sections': sections,
+        'teacher_unavailability': data['teacher_unavailability'],
+        'periods': data.get('periods')
+    }
+    if neighborhood.fix_periods:
+        allowed = {s: {schedule[s]} for s in neighborhood.sections if s in schedule}
+    else:
+        allowed = {s: set(neighborhood.periods) for s in neighborhood.sections}
+    return subdata, blocked_students, blocked_teachers, allowed
+
+
+def _solve_neighborhood(subdata, blocked_students, blocked_teachers, allowed, start, time_limit, threads):
+    """Worker entry point: solve one neighborhood sub-MILP and return its best solution"""
+    from milp_soft import ScheduleOptimizer
+
+    optimizer = ScheduleOptimizer(data=subdata)
+    optimizer.create_variables()
+    optimizer.add_constraints()
+    optimizer.set_objective()
+    model = optimizer.model
+    model.setParam('OutputFlag', 0)
+    model.setParam('TimeLimit', time_limit)
+    model.setParam('Threads', threads)
+
+    # Block periods held by the fixed schedule and restrict free sections to the neighborhood periods
+    for (section_id, period), z_var in optimizer.z.items():
+        teacher_id = optimizer.section_to_teacher.get(section_id)
+        if period not in allowed.get(section_id, ()) or period in blocked_teachers.get(teacher_id, ()):
+            z_var.ub = 0
+    for (student_id, section_id, period), y_var in optimizer.y.items():
+        if period in blocked_students.get(student_id, ()):
+            y_var.ub = 0
+
+    # Warm start from the incumbent so the sub-solve never returns anything worse
+    start_schedule, start_pairs = start
+    for (section_id, period), z_var in optimizer.z.items():
+        z_var.start = 1 if start_schedule.get(section_id) == period else 0
+    for key, x_var in optimizer.x.items():
+        x_var.start = 1 if key in start_pairs else 0
+
+    model.optimize()
+    if model.SolCount == 0:
+        model.dispose()
+        return None
+    solution = optimizer.extract_solution()
+    objective = model.ObjVal
+    model.dispose()
+    return solution, objective
+
+
+class LNSDriver:
+    """Fix-and-optimize large neighborhood search around the full scheduling MILP"""
+
+    KINDS = ('department', 'period_pair', 'teacher_cluster', 'request_pattern')
+
+    def __init__(self, optimizer, workers=None, sub_time_limit=30, max_sections=40, seed=0):
+        self.optimizer = optimizer
+        self.data = optimizer.data
+        self.periods = optimizer.periods
+        self.workers = workers or max(1, min(4, multiprocessing.cpu_count() // 2))
+        self.threads = max(1, multiprocessing.cpu_count() // self.workers)
+        self.sub_time_limit = sub_time_limit
+        self.max_sections = max_sections
+        self.random = random.Random(seed)
+        self.sections = self.data['sections']
+        self.section_to_teacher = optimizer.section_to_teacher
+        self.section_to_course = self.sections.set_index('Section ID')['Course ID'].to_dict()
+        self.history = []
+
+    # ------------------------------------------------------------------
+    # Incumbent handling
+    # ------------------------------------------------------------------
+    def initial_solution(self, time_limit=120):
+        """Get a starting incumbent from fast mode, without building the full model
+
+        Neighborhoods keep each student's courses and reject merges with clashes, so they cannot
+        repair an unplaced request or a teacher clash; only if every rounding leaves one is the
+        full model built for a short, greedy-seeded solve.
+        """
+        from fast_mode import FastScheduler
+        solution, report = FastScheduler(self.optimizer, time_limit=time_limit).run()
+        if report['unplaced_requests'] == 0 and report['teacher_clashes'] == 0:
+            return solution
+        logger.warning(f"Fast mode left {report['unplaced_requests']} unplaced requests and "
+                       f"{report['teacher_clashes']} teacher clashes; solving the full model for the LNS start")
+        return self.full_model_solution(time_limit)
+
+    def full_model_solution(self, time_limit=120):
+        """Get a starting incumbent from a short, greedy-seeded solve of the full model"""
+        optimizer = self.optimizer
+        optimizer.create_variables()
+        optimizer.add_constraints()
+        optimizer.set_objective()
+        optimizer.greedy_initial_solution()
+        optimizer.model.setParam('TimeLimit', time_limit)
+        optimizer.model.optimize()
+        if optimizer.model.SolCount == 0:
+            raise RuntimeError("No feasible starting solution found for LNS")
+        return optimizer.extract_solution()
+
+    def objective(self, solution):
+        """Total students over capacity for a columnar solution"""
+        return float(self.optimizer.section_overages(solution).sum())
+
+    def _split(self, solution):
+        """Split a columnar solution into a schedule mapping and an assignments frame"""
+        schedule = dict(zip(solution['schedule']['Section ID'], solution['schedule']['Period']))
+        assignments = pd.DataFrame(solution['assignments'], columns=['Student ID', 'Section ID'])
+        return schedule, assignments
+
+    def _join(self, schedule, assignments):
+        """Build a columnar solution from a schedule mapping and an assignments frame"""
+        return {
+            'schedule': {'Section ID': list(schedule.keys()), 'Period': list(schedule.values())},
+            'assignments': {
+                'Student ID': assignments['Student ID'].tolist(),
+                'Section ID': assignments['Section ID'].tolist()
+            }
+        }
+
+    def has_conflicts(self, schedule, assignments):
+        """Check a merged solution for student or teacher period clashes"""
+        periods = assignments['Section ID'].map(schedule)
+        if assignments.assign(Period=periods).duplicated(['Student ID', 'Period']).any():
+            return True
+        teachers = pd.DataFrame({
+            'Teacher ID': [self.section_to_teacher.get(s) for s in schedule],
+            'Period': list(schedule.values())
+        })
+        return bool(teachers.duplicated().any())
+
+    # ------------------------------------------------------------------
+    # Neighborhoods
+    # ------------------------------------------------------------------
+    def _limit(self, section_ids):
+        """Keep whole courses together while capping neighborhood size"""
+        by_course = {}
+        for section_id in section_ids:
+            by_course.setdefault(self.section_to_course[section_id], []).append(section_id)
+        courses = list(by_course)
+        self.random.shuffle(courses)
+        chosen = []
+        for course_id in courses:
+            if chosen and len(chosen) + len(by_course[course_id]) > self.max_sections:
+                continue
+            chosen.extend(by_course[course_id])
+        return chosen
+
+    def generate_neighborhoods(self, schedule, assignments):
+        """Create candidate neighborhoods of every kind around the incumbent"""
+        candidates = []
+
+        for department, group in self.sections.groupby('Department'):
+            candidates.append(Neighborhood('department', department,
+                                           self._limit(group['Section ID']), self.periods))
+
+        periods = list(self.periods)
+        self.random.shuffle(periods)
+        for first, second in zip(periods[0::2], periods[1::2]):
+            section_ids = [s for s, p in schedule.items() if p in (first, second)]
+            candidates.append(Neighborhood('period_pair', f"{first}+{second}",
+                                           section_ids, (first, second)))
+
+        # Teacher clusters: a seed teacher plus the teachers who share the most students
+        enrolled = assignments.assign(Teacher=assignments['Section ID'].map(self.section_to_teacher))
+        teacher_students = enrolled.groupby('Teacher')['Student ID'].agg(set).to_dict()
+        teacher_ids = list(teacher_students)
+        for seed in self.random.sample(teacher_ids, min(len(teacher_ids), self.workers)):
+            shared = sorted(teacher_ids, key=lambda t: -len(teacher_students[t] & teacher_students[seed]))
+            section_ids = []
+            for teacher_id in shared:
+                teacher_sections = [s for s, t in self.section_to_teacher.items() if t == teacher_id]
+                if section_ids and len(section_ids) + len(teacher_sections) > self.max_sections:
+                    break
+                section_ids.extend(teacher_sections)
+            candidates.append(Neighborhood('teacher_cluster', seed, section_ids, self.periods))
+
+        # Request patterns: re-seat students of one pattern inside the current master schedule
+        prefs = self.data['student_preferences']
+        patterns = prefs.groupby('Preferred Sections')['Student ID'].agg(list)
+        for pattern in self.random.sample(list(patterns.index), min(len(patterns), self.workers)):
+            section_ids = assignments.loc[assignments['Student ID'].isin(patterns[pattern]), 'Section ID'].unique()
+            section_ids = self._limit(section_ids)
+            candidates.append(Neighborhood('request_pattern', pattern, section_ids,
+                                           {schedule[s] for s in section_ids if s in schedule},
+                                           fix_periods=True))
+
+        # Attach footprints used for the overlap test
+        for neighborhood in candidates:
+            inside = assignments['Section ID'].isin(neighborhood.sections)
+            neighborhood.students = frozenset(assignments.loc[inside, 'Student ID'])
+            neighborhood.teachers = frozenset(self.section_to_teacher[s] for s in neighborhood.sections)
+        return [n for n in candidates if n.sections]
+
+    def select_batch(self, candidates):
+        """Pick up to one neighborhood per worker with no pairwise overlap"""
+        self.random.shuffle(candidates)
+        batch = []
+        for neighborhood in candidates:
+            if all(not neighborhood.overlaps(other) for other in batch):
+                batch.append(neighborhood)
+            if len(batch) >= self.workers:
+                break
+        return batch
+
+    # ------------------------------------------------------------------
+    # Search loop
+    # ------------------------------------------------------------------
+    def run(self, time_budget=3600, initial=None, on_improvement=None, initial_time_limit=120):
+        """Run LNS until the time budget is spent and return the best solution found"""
+        started = time.time()
+        best = initial if initial is not None else self.initial_solution(initial_time_limit)
+        best_objective = self.objective(best)
+        schedule, assignments = self._split(best)
+        logger.info(f"LNS starting objective: {best_objective:.0f} students over capacity")
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            while time.time() - started < time_budget and best_objective > 0:
+                batch = self.select_batch(self.generate_neighborhoods(schedule, assignments))
+                if not batch:
+                    # No neighborhood has sections to free, and the incumbent cannot change until one does
+                    logger.warning("LNS found no neighborhoods to destroy; stopping early")
+                    break
+                start = (schedule, set(zip(assignments['Student ID'], assignments['Section ID'])))
+                futures = {}
+                for neighborhood in batch:
+                    subdata, blocked_students, blocked_teachers, allowed = build_subproblem(
+                        self.data, schedule, assignments, neighborhood)
+                    remaining = max(1, min(self.sub_time_limit, time_budget - (time.time() - started)))
+                    future = pool.submit(_solve_neighborhood, subdata, blocked_students, blocked_teachers,
+                                         allowed, start, remaining, self.threads)
+                    futures[future] = neighborhood
+
+                # Merge each improving neighborhood into the incumbent as soon as it finishes
+                for future in as_completed(futures):
+                    neighborhood = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning(f"LNS sub-solve failed for {neighborhood}: {str(e)}")
+                        continue
+                    if result is None:
+                        continue
+                    sub_solution, _ = result
+                    candidate_schedule = dict(schedule)
+                    candidate_schedule.update(zip(sub_solution['schedule']['Section ID'],
+                                                  sub_solution['schedule']['Period']))
+                    candidate_assignments = pd.concat([
+                        assignments[~assignments['Section ID'].isin(neighborhood.sections)],
+                        pd.DataFrame(sub_solution['assignments'], columns=['Student ID', 'Section ID'])
+                    ], ignore_index=True)
+                    candidate = self._join(candidate_schedule, candidate_assignments)
+                    candidate_objective = self.objective(candidate)
+                    self.history.append((time.time() - started, neighborhood.kind, candidate_objective))
+
+                    if candidate_objective >= best_objective:
+                        continue
+                    if self.has_conflicts(candidate_schedule, candidate_assignments):
+                        logger.warning(f"Discarding conflicting merge from {neighborhood}")
+                        continue
+
+                    best, best_objective = candidate, candidate_objective
+                    schedule, assignments = candidate_schedule, candidate_assignments
+                    logger.info(f"LNS improvement via {neighborhood}: {best_objective:.0f} students over capacity "
+                                f"after {time.time() - started:.1f}s")
+                    if on_improvement is not None:
+                        on_improvement(best, best_objective)
+
+        logger.info(f"LNS finished with objective {best_objective:.0f} after {time.time() - started:.1f}s")
+        return best
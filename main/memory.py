@@ -0,0 +1,164 @@
+# Standard library imports
+import os
+import time
+import logging
+
+# Third-party imports
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Rough per-element costs (bytes) measured on Gurobi 10/11 models of this formulation.
+# The solver keeps the original and presolved matrices plus LP factorizations, and
+# gurobipy keeps one Python Var/Constr object and dict entry per column and row.
+BYTES_PER_NONZERO = 40
+BYTES_PER_COLUMN_SOLVER = 120
+BYTES_PER_ROW_SOLVER = 100
+BYTES_PER_COLUMN_PYTHON = 260
+BYTES_PER_ROW_PYTHON = 180
+
+MB = 1024 ** 2
+GB = 1024 ** 3
+
+
+def estimate_model_size(data, periods, course_period_restrictions):
+    """Estimate rows, columns and nonzeros of the scheduling MILP before building it"""
+    sections = data['sections']
+    students = data['students']
+    preferences = data['student_preferences'].drop_duplicates('Student ID')
+    preferences = preferences[preferences['Student ID'].isin(students['Student ID'])]
+
+    allowed = sections['Course ID'].map(lambda c: len(course_period_restrictions.get(c, periods)))
+    sections_per_course = sections.groupby('Course ID').size()
+    periods_per_course = allowed.groupby(sections['Course ID']).sum()
+
+    requests = preferences.assign(**{'Course ID': preferences['Preferred Sections'].astype(str).str.split(';')})
+    requests = requests.explode('Course ID')
+    requests = requests[requests['Course ID'].isin(sections_per_course.index)]
+    demand = requests['Course ID'].value_counts()
+
+    # Mirror the model, which applies the SPED distribution rule to students flagged as 1
+    sped_students = set(students.loc[students['SPED'] == 1, 'Student ID'])
+    sped_x = (requests[requests['Student ID'].isin(sped_students)]['Course ID']
+              .map(sections_per_course).sum())
+
+    n_x = int((demand * sections_per_course.reindex(demand.index)).sum())
+    n_z = int(allowed.sum())
+    n_y = int((demand * periods_per_course.reindex(demand.index)).sum())
+    n_sections = len(sections)
+
+    columns = n_x + n_z + n_y + n_sections
+    rows = (n_sections * 3                       # one period, soft capacity, SPED distribution
+            + len(requests)                      # hard course requirements
+            + len(data['teachers']) * len(periods)
+            + len(students) * len(periods)
+            + 3 * n_y)                           # x/y/z linking
+    nonzeros = (n_z                              # one period
+                + n_x + n_sections               # soft capacity
+                + n_x                            # course requirements
+                + n_z                            # teacher conflicts
+                + n_y                            # student period conflicts
+                + 7 * n_y                        # linking (2 + 2 + 3 per y)
+                + int(sped_x))
+    return {'rows': int(rows), 'columns': int(columns), 'nonzeros': int(nonzeros),
+            'x': n_x, 'z': n_z, 'y': n_y}
+
+
+def estimate_footprint_mb(rows, columns, nonzeros):
+    """Estimate solver and Python memory (MB) for a model of the given size"""
+    solver = nonzeros * BYTES_PER_NONZERO + columns * BYTES_PER_COLUMN_SOLVER + rows * BYTES_PER_ROW_SOLVER
+    python = columns * BYTES_PER_COLUMN_PYTHON + rows * BYTES_PER_ROW_PYTHON
+    return {'solver_mb': solver / MB, 'python_mb': python / MB, 'total_mb': (solver + python) / MB}
+
+
+def _cgroup_limit_bytes():
+    """Return the container memory limit if one is set, otherwise None"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < psutil.virtual_memory().total:
+            return int(value)
+    return None
+
+
+class MemoryBudget:
+    """Memory available to one solver job and the Gurobi limits derived from it"""
+
+    # Keep headroom for the Python process, pandas data and output writing
+    PYTHON_RESERVE_FRACTION = 0.15
+    # Start spilling nodes to disk once the tree uses this share of what the solver may use
+    NODEFILE_FRACTION = 0.5
+
+    def __init__(self, budget_gb, source):
+        self.budget_gb = budget_gb
+        self.source = source
+
+    @classmethod
+    def resolve(cls, budget_gb=None):
+        """Pick the per-job budget: explicit value, env var, container limit, then available RAM"""
+        if budget_gb:
+            return cls(float(budget_gb), 'argument')
+        env_value = os.environ.get('SCHEDULER_MEM_BUDGET_GB')
+        if env_value:
+            return cls(float(env_value), 'SCHEDULER_MEM_BUDGET_GB')
+        cgroup = _cgroup_limit_bytes()
+        if cgroup:
+            return cls(cgroup / GB, 'container limit')
+        # Share what is actually free right now rather than the machine's total RAM
+        jobs = max(1, int(os.environ.get('SCHEDULER_CONCURRENT_JOBS', '1')))
+        return cls(psutil.virtual_memory().available / GB / jobs, 'available RAM')
+
+    def mem_limit_gb(self, footprint=None):
+        """Gurobi MemLimit (GB): the budget minus the Python side of the model and a reserve"""
+        python_gb = footprint['python_mb'] / 1024 if footprint else 0.0
+        return max(0.5, self.budget_gb * (1 - self.PYTHON_RESERVE_FRACTION) - python_gb)
+
+    def nodefile_start_gb(self, footprint=None):
+        """Gurobi NodefileStart (GB): spill the tree once it fills part of the solver headroom"""
+        solver_gb = footprint['solver_mb'] / 1024 if footprint else 0.0
+        headroom = max(0.25, self.mem_limit_gb(footprint) - solver_gb)
+        return headroom * self.NODEFILE_FRACTION
+
+    def fits(self, footprint):
+        """Check whether an estimated footprint fits in the budget"""
+        return footprint['total_mb'] / 1024 <= self.budget_gb * (1 - self.PYTHON_RESERVE_FRACTION)
+
+
+class PeakMemorySampler:
+    """Track the peak resident memory of the solver process during one solve"""
+
+    def __init__(self, interval=0.5):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.last_sample = 0.0
+        self.peak_rss = 0
+        self.samples = 0
+        self.sample(force=True)
+
+    def sample(self, force=False):
+        """Record current RSS (including child processes), throttled to the sampling interval"""
+        now = time.time()
+        if not force and now - self.last_sample < self.interval:
+            return
+        self.last_sample = now
+        try:
+            rss = self.process.memory_info().rss
+            for child in self.process.children(recursive=True):
+                rss += child.memory_info().rss
+        except psutil.Error:
+            return
+        self.samples += 1
+        self.peak_rss = max(self.peak_rss, rss)
+
+    @property
+    def peak_mb(self):
+        """Peak RSS in MB over the samples taken since the sampler started
+
+        The kernel's ru_maxrss is not used: it is the high-water mark of the whole process
+        lifetime, so it would report an earlier, larger solve in the same process (LNS, races,
+        the solver service's warm workers) as this one's peak.
+        """
+        return self.peak_rss / MB
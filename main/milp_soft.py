@@ -7,21 +7,28 @@ import platform
 # Third-party imports
 import gurobipy as gp
 from gurobipy import GRB
+import numpy as np
 import pandas as pd
 
 # Local imports
 from load import ScheduleDataLoader
 import greedy  # Import the greedy module
+from verifier import ScheduleVerifier, write_violations, HARD_RULES
+from memory import (MemoryBudget, PeakMemorySampler, estimate_model_size,
+                    estimate_footprint_mb)
+from reports import write_json_report
 
 class ScheduleOptimizer:
-    def __init__(self):
-        """Initialize the scheduler using the existing data loader"""
+    def __init__(self, data=None):
+        """Initialize the scheduler using the existing data loader or preloaded data"""
         # Set up logging
         self.setup_logging()
-        
-        # Use the existing data loader
-        loader = ScheduleDataLoader()
-        self.data = loader.load_all()
+
+        # Use the existing data loader unless the caller already has the data in memory
+        if data is None:
+            loader = ScheduleDataLoader()
+            data = loader.load_all()
+        self.data = data
         
         # Extract data from loader
         self.students = self.data['students']
@@ -46,6 +53,30 @@ class ScheduleOptimizer:
                 self.course_to_sections[row['Course ID']] = []
             self.course_to_sections[row['Course ID']].append(row['Section ID'])
         
+        # Section lookups used when writing solutions
+        self.section_to_teacher = self.sections.set_index('Section ID')['Teacher Assigned'].to_dict()
+
+        # Per-job memory budget in GB (None resolves from env, container limit or free RAM)
+        self.memory_budget_gb = None
+        self.memory_estimate = None
+
+        # Incumbent checkpointing during long solves (see checkpoint.Checkpointer)
+        self.checkpointer = None
+
+        # Most SPED students (flagged 1) allowed in one section
+        self.max_sped_per_section = 12
+
+        # Analytic lower bound on total overage; the solve stops once an incumbent reaches it
+        self.objective_bound = None
+        self.bound_constrs = []
+
+        # Most recent solution and the warm start kept across incremental re-solves
+        self.last_solution = None
+        self._warm_start = None
+
+        # Reuse precheck and greedy results for unchanged inputs (see stage_cache.StageCache)
+        self.stage_cache = None
+
         # Initialize the Gurobi model
         self.model = gp.Model("School_Scheduling")
         
@@ -55,6 +86,60 @@ class ScheduleOptimizer:
         """Get allowed periods for a course based on restrictions"""
         return self.course_period_restrictions.get(course_id, self.periods)
 
+    def count_total_requests(self):
+        """Count course requests across all students in a single vectorized pass"""
+        prefs = self.student_preferences.drop_duplicates('Student ID').set_index('Student ID')['Preferred Sections']
+        prefs = prefs.reindex(self.students['Student ID']).dropna().astype(str)
+        return int(prefs.str.count(';').add(1).sum())
+
+    def precheck(self, mode='warn'):
+        """Check demand, SPED headroom, teacher loads and request patterns before building the model"""
+        if mode == 'off':
+            return None
+        from precheck import Precheck
+        if self.stage_cache is not None and mode != 'adjust':
+            # Adjusting changes the data, so only the read-only modes are reused
+            key = self.stage_cache.key('precheck', self._stage_inputs(), {
+                'mode': mode, 'max_sped_per_section': self.max_sped_per_section,
+                'course_period_restrictions': self.course_period_restrictions}, code=('precheck.py',))
+            report = self.stage_cache.cached('precheck', key, lambda: Precheck(self).run(mode))
+        else:
+            report = Precheck(self).run(mode)
+        path = write_json_report('precheck_report', report)
+        for issue in report['issues'][:20]:
+            log = self.logger.error if issue['severity'] == 'error' else self.logger.warning
+            log(f"Precheck {issue['check']}: {issue['message']}")
+        for adjustment in report['adjustments']:
+            self.logger.warning(f"Precheck adjustment: {adjustment}")
+        self.logger.info(f"Precheck {report['status']} ({report['errors']} errors, {report['warnings']} warnings) "
+                         f"in {report['runtime_ms']} ms; report written to {path}")
+        if report['errors'] and mode in ('abort', 'adjust'):
+            raise RuntimeError(f"Precheck found {report['errors']} blocking issues; see {path}")
+        return report
+
+    def _stage_inputs(self):
+        """The tables the precheck and greedy stages read, for their stage cache keys"""
+        return {
+            'students': self.students,
+            'student_preferences': self.student_preferences,
+            'sections': self.sections,
+            'teacher_unavailability': self.teacher_unavailability
+        }
+
+    def estimate_memory(self):
+        """Estimate the model footprint from the instance before building it"""
+        size = estimate_model_size(self.data, self.periods, self.course_period_restrictions)
+        footprint = estimate_footprint_mb(size['rows'], size['columns'], size['nonzeros'])
+        self.memory_estimate = {**size, **footprint}
+
+        budget = MemoryBudget.resolve(self.memory_budget_gb)
+        self.logger.info(f"Estimated model size: {size['rows']:,} rows, {size['columns']:,} columns, "
+                         f"{size['nonzeros']:,} nonzeros (~{footprint['total_mb']:.0f} MB)")
+        if not budget.fits(footprint):
+            self.logger.warning(f"Estimated footprint exceeds the {budget.budget_gb:.1f} GB job budget "
+                                f"({budget.source}); consider --lns or a larger budget")
+        return self.memory_estimate
+
     def setup_logging(self):
         """Set up logging configuration"""
         output_dir = 'output'
@@ -142,12 +227,20 @@ class ScheduleOptimizer:
 
     def add_constraints(self):
         """Add all necessary constraints to the model"""
+        # Keep constraint handles so the live model can be edited incrementally later
+        self.one_period_constrs = {}
+        self.capacity_constrs = {}
+        self.course_constrs = {}
+        self.teacher_constrs = {}
+        self.student_period_constrs = {}
+        self.link_constrs = {}
+        self.sped_constrs = {}
         
         # 1. Each section must be scheduled in exactly one period
         for section_id in self.sections['Section ID']:
             valid_periods = [p for p in self.periods if (section_id, p) in self.z]
             if valid_periods:
-                self.model.addConstr(
+                self.one_period_constrs[section_id] = self.model.addConstr(
                     gp.quicksum(self.z[section_id, p] for p in valid_periods) == 1,
                     name=f'one_period_{section_id}'
                 )
@@ -157,7 +250,7 @@ class ScheduleOptimizer:
         for _, section in self.sections.iterrows():
             section_id = section['Section ID']
             capacity = section['# of Seats Available']
-            self.model.addConstr(
+            self.capacity_constrs[section_id] = self.model.addConstr(
                 gp.quicksum(self.x[student_id, section_id] 
                            for student_id in self.students['Student ID']
                            if (student_id, section_id) in self.x) <= capacity + self.capacity_violation[section_id],
@@ -180,7 +273,7 @@ class ScheduleOptimizer:
                 if course_id in self.course_to_sections:
                     # Hard constraint: Student MUST be assigned to exactly one section of each requested course
                     # No exceptions - this guarantees 100% satisfaction
-                    self.model.addConstr(
+                    self.course_constrs[student_id, course_id] = self.model.addConstr(
                         gp.quicksum(self.x[student_id, section_id]
                                   for section_id in self.course_to_sections[course_id]
                                   if (student_id, section_id) in self.x) == 1,  # MUST = 1
@@ -195,7 +288,7 @@ class ScheduleOptimizer:
             ]['Section ID']
             
             for period in self.periods:
-                self.model.addConstr(
+                self.teacher_constrs[teacher_id, period] = self.model.addConstr(
                     gp.quicksum(self.z[section_id, period]
                                for section_id in teacher_sections
                                if (section_id, period) in self.z) <= 1,
@@ -205,7 +298,7 @@ class ScheduleOptimizer:
         # 5. Student period conflicts
         for student_id in self.students['Student ID']:
             for period in self.periods:
-                self.model.addConstr(
+                self.student_period_constrs[student_id, period] = self.model.addConstr(
                     gp.quicksum(self.y[student_id, section_id, period]
                                for section_id in self.sections['Section ID']
                                if (student_id, section_id, period) in self.y) <= 1,
@@ -214,31 +307,73 @@ class ScheduleOptimizer:
 
         # 6. Linking constraints between x, y, and z variables
         for (student_id, section_id, period), y_var in self.y.items():
-            self.model.addConstr(
-                y_var <= self.x[student_id, section_id],
-                name=f'link_xy_{student_id}_{section_id}_{period}'
-            )
-            self.model.addConstr(
-                y_var <= self.z[section_id, period],
-                name=f'link_yz_{student_id}_{section_id}_{period}'
-            )
-            self.model.addConstr(
-                y_var >= self.x[student_id, section_id] + self.z[section_id, period] - 1,
-                name=f'link_xyz_{student_id}_{section_id}_{period}'
-            )
+            self.link_constrs[student_id, section_id, period] = self.add_link_constraints(
+                student_id, section_id, period)
 
         # 7. SPED student distribution constraint (soft)
         sped_students = self.students[self.students['SPED'] == 1]['Student ID']
         for section_id in self.sections['Section ID']:
-            self.model.addConstr(
+            self.sped_constrs[section_id] = self.model.addConstr(
                 gp.quicksum(self.x[student_id, section_id]
                            for student_id in sped_students
-                           if (student_id, section_id) in self.x) <= 12,
+                           if (student_id, section_id) in self.x) <= self.max_sped_per_section,
                 name=f'sped_distribution_{section_id}'
             )
 
         self.logger.info("Constraints added successfully - Using HARD constraints for student satisfaction")
 
+    def add_bound_cuts(self):
+        """Add analytic overage bounds and conflict cliques as cuts and record the bound"""
+        from bounds import BoundAnalyzer
+        analyzer = BoundAnalyzer(self)
+        self.objective_bound = analyzer.add_cuts()
+        self.bound_constrs = analyzer.constrs
+        report = analyzer.report()
+        if report['infeasible_cliques']:
+            self.logger.warning(f"{len(report['infeasible_cliques'])} conflict cliques need more periods than exist")
+        self.logger.info(f"Bounds report written to {write_json_report('bounds_report', report)}")
+        return self.objective_bound
+
+    def build_model(self, bounds=True, cache=True):
+        """Build the full model, or reload it from the model cache when inputs and options are unchanged"""
+        from model_cache import ModelCache, instance_hash
+        model_cache = ModelCache() if cache else None
+        key = instance_hash(self, bounds) if cache else None
+        if model_cache is not None and model_cache.load(self, key):
+            self.set_objective()
+            return key
+
+        self.create_variables()
+        self.add_constraints()
+        if bounds:
+            self.add_bound_cuts()
+        self.set_objective()
+        if model_cache is not None:
+            # A failed export only costs the next run a rebuild
+            try:
+                model_cache.store(self, key)
+            except (OSError, gp.GurobiError) as e:
+                self.logger.warning(f"Could not write the model cache: {str(e)}")
+        return key
+
+    def add_link_constraints(self, student_id, section_id, period):
+        """Link y[i,j,p] to x[i,j] and z[j,p] and return the three constraints"""
+        y_var = self.y[student_id, section_id, period]
+        return (
+            self.model.addConstr(
+                y_var <= self.x[student_id, section_id],
+                name=f'link_xy_{student_id}_{section_id}_{period}'
+            ),
+            self.model.addConstr(
+                y_var <= self.z[section_id, period],
+                name=f'link_yz_{student_id}_{section_id}_{period}'
+            ),
+            self.model.addConstr(
+                y_var >= self.x[student_id, section_id] + self.z[section_id, period] - 1,
+                name=f'link_xyz_{student_id}_{section_id}_{period}'
+            )
+        )
+
     def set_objective(self):
         """Set the objective function to minimize capacity violations (student satisfaction is guaranteed)"""
         # Calculate total section capacity 
@@ -268,9 +403,15 @@ class ScheduleOptimizer:
             teacher_unavailability = self.teacher_unavailability
             
             # Call the greedy algorithm from greedy.py
-            x_vars, z_vars, y_vars = greedy.greedy_initial_solution(
+            compute = lambda: greedy.greedy_initial_solution(
                 student_data, student_pref_data, section_data, periods, teacher_unavailability
             )
+            if self.stage_cache is not None:
+                key = self.stage_cache.key('greedy', self._stage_inputs(), {'periods': periods},
+                                           code=('greedy.py',))
+                x_vars, z_vars, y_vars = self.stage_cache.cached('greedy', key, compute)
+            else:
+                x_vars, z_vars, y_vars = compute()
             
             self.logger.info(f"Greedy algorithm generated initial values for: {len(x_vars)} x vars, "
                             f"{len(z_vars)} z vars, {len(y_vars)} y vars")
@@ -366,33 +507,33 @@ class ScheduleOptimizer:
         
         self.logger.info("Simple greedy initial solution generated successfully")
 
-    def solve(self):
-        """Solve the optimization model to find a solution in the top 10%"""
+    def solve(self, use_greedy=True, time_limit=25200, save=True):
+        """Solve the optimization model to find a solution in the top 10%
+
+        With save=False the solution is only kept in memory (see last_solution) for a caller
+        that writes the output files itself.
+        """
         try:
             # Calculate upper bound on objective (total course requests)
-            total_requests = 0
-            for _, student in self.students.iterrows():
-                student_id = student['Student ID']
-                requested_courses = self.student_preferences[
-                    self.student_preferences['Student ID'] == student_id
-                ]['Preferred Sections'].iloc[0].split(';')
-                total_requests += len(requested_courses)
-            
-            # Get system memory information
-            import psutil
-            total_ram_gb = psutil.virtual_memory().total / (1024 ** 3)  # RAM in GB
-            
-            # Use 95% of available RAM as requested
-            mem_limit_gb = int(total_ram_gb * 0.95)
-            node_file_start = 0.95  # Start writing to disk at 95% memory usage
+            total_requests = self.count_total_requests()
             
+            # Derive memory limits from this job's budget rather than the whole machine
+            budget = MemoryBudget.resolve(self.memory_budget_gb)
+            self.model.update()
+            actual_size = {'rows': self.model.NumConstrs, 'columns': self.model.NumVars, 'nonzeros': self.model.NumNZs}
+            footprint = estimate_footprint_mb(actual_size['rows'], actual_size['columns'], actual_size['nonzeros'])
+            mem_limit_gb = budget.mem_limit_gb(footprint)
+            node_file_start = budget.nodefile_start_gb(footprint)
+
             self.logger.info("=" * 80)
             self.logger.info(f"SYSTEM CONFIGURATION")
-            self.logger.info(f"System has {total_ram_gb:.1f} GB of RAM available")
-            self.logger.info(f"Setting Gurobi memory limit to {mem_limit_gb} GB (95% of available RAM)")
-            
-            # Set memory limit - convert GB to MB
-            self.model.setParam('MemLimit', mem_limit_gb * 1024)
+            self.logger.info(f"Job memory budget: {budget.budget_gb:.1f} GB (from {budget.source})")
+            self.logger.info(f"Model size: {actual_size['rows']:,} rows, {actual_size['columns']:,} columns, "
+                             f"{actual_size['nonzeros']:,} nonzeros (~{footprint['total_mb']:.0f} MB estimated)")
+            self.logger.info(f"Setting Gurobi memory limit to {mem_limit_gb:.2f} GB")
+
+            # MemLimit is expressed in GB
+            self.model.setParam('MemLimit', mem_limit_gb)
             
             # Set parameters as requested
             self.model.setParam('Presolve', 1)  # Use standard presolve
@@ -403,8 +544,15 @@ class ScheduleOptimizer:
             # Remove solution limit to allow solver to keep searching
             self.model.setParam('SolutionLimit', 20)  
 
-            self.model.setParam('TimeLimit', 25200)  # 7 hours time limit
+            self.model.setParam('TimeLimit', time_limit)  # 7 hours by default
             
+            # Stop as soon as the incumbent reaches the analytic lower bound
+            if self.objective_bound is not None:
+                self.model.setParam('BestObjStop', self.objective_bound)
+                self.logger.info(f"Analytic overage bound: {self.objective_bound} (solve stops when reached)")
+            else:
+                self.model.setParam('BestObjStop', -GRB.INFINITY)
+
             # Set up node file storage
             self.model.setParam('NodefileStart', node_file_start)
             
@@ -417,7 +565,7 @@ class ScheduleOptimizer:
             os.makedirs(node_dir, exist_ok=True)
             self.model.setParam('NodefileDir', node_dir)
             self.logger.info(f"Node file directory: {node_dir}")
-            self.logger.info(f"Will switch to disk storage when memory reaches {node_file_start*100}% of allocated RAM")
+            self.logger.info(f"Will switch to disk storage once node storage exceeds {node_file_start:.2f} GB")
             
             # Set verbosity level for detailed console output
             self.model.setParam('OutputFlag', 1)     # Enable Gurobi output
@@ -427,11 +575,21 @@ class ScheduleOptimizer:
             import multiprocessing
             cpu_count = multiprocessing.cpu_count()
             threads = min(cpu_count - 1, 32)  # Leave 1 core free, cap at 32 threads
+            if os.environ.get('SCHEDULER_SOLVER_THREADS'):
+                # Set by callers that run several solves side by side (e.g. scenario_sweep.py)
+                threads = min(threads, int(os.environ['SCHEDULER_SOLVER_THREADS']))
+            threads = max(1, threads)
             self.model.setParam('Threads', threads)
             self.logger.info(f"Using {threads} threads out of {cpu_count} available cores")
             
-            # Add callback to monitor disk usage - with proper error handling
+            # Sample the real resident memory of the solver process while it runs
+            memory_sampler = PeakMemorySampler()
+
+            # Add callback to monitor memory and disk usage - with proper error handling
             def node_file_callback(model, where):
+                memory_sampler.sample()
+                if self.checkpointer is not None:
+                    self.checkpointer.callback(model, where)
                 if where == GRB.Callback.MIP:
                     try:
                         nodefile = model.cbGet(GRB.Callback.MIP_NODEFILE)
@@ -442,8 +600,11 @@ class ScheduleOptimizer:
                         # Silently handle the case where MIP_NODEFILE isn't available
                         pass
             
-            # Generate a greedy initial solution
-            self.greedy_initial_solution()
+            # Generate a greedy initial solution, unless a re-solve already set a warm start
+            if use_greedy:
+                self.greedy_initial_solution()
+            else:
+                self.logger.info("Warm starting from the previous solution")
             
             self.logger.info("=" * 80)
             self.logger.info("STARTING OPTIMIZATION")
@@ -452,13 +613,17 @@ class ScheduleOptimizer:
             
             # Optimize with callback
             self.model.optimize(node_file_callback)
+            memory_sampler.sample(force=True)
             
             self.logger.info("=" * 80)
             self.logger.info("OPTIMIZATION RESULTS")
             
             # Always try to save at least some files if we have a solution
             has_solution = self.model.SolCount > 0
-            
+            solution = self.extract_solution() if has_solution else None
+            if has_solution:
+                self.remember_solution(solution)
+
             if self.model.status == GRB.OPTIMAL or (self.model.status == GRB.TIME_LIMIT and self.model.SolCount > 0):
                 # With hard constraints, we have 100% satisfaction (all requests are met)
                 satisfaction_rate = 100.0
@@ -473,13 +638,14 @@ class ScheduleOptimizer:
                 self.logger.info(f"SATISFACTION RATE: {satisfaction_rate:.2f}% (Hard constraint guaranteed)")
                 
                 # Calculate capacity violation metrics
-                sections_over_capacity = sum(1 for var in self.capacity_violation.values() if var.X > 0.5)
-                total_violations = sum(var.X for var in self.capacity_violation.values())
+                overages = self.section_overages(solution)
+                sections_over_capacity = int((overages > 0).sum())
+                total_violations = overages.sum()
                 self.logger.info(f"CAPACITY VIOLATIONS: {sections_over_capacity} sections over capacity")
                 self.logger.info(f"TOTAL OVERAGES: {int(total_violations)} students over capacity")
-                
+
                 # Objective breakdown - with hard constraints, there are only capacity penalties
-                capacity_penalty = sum(var.X for var in self.capacity_violation.values())
+                capacity_penalty = total_violations
                 self.logger.info(f"OBJECTIVE VALUE: {self.model.objVal}")
                 self.logger.info(f"  - Capacity violations penalty: {capacity_penalty} (Only objective component)")
                 
@@ -488,16 +654,8 @@ class ScheduleOptimizer:
                 self.logger.info(f"NODES EXPLORED: {self.model.NodeCount}")
                 self.logger.info(f"MIP GAP: {self.model.MIPGap*100:.2f}%")
                 
-                # Peak memory usage - with error handling
-                try:
-                    # Try to get peak memory usage, but don't crash if not available
-                    if hasattr(self.model, 'NodeFileStart'):
-                        peak_mem = self.model.getAttr('NodeFileStart') * mem_limit_gb * 1024  # MB
-                        self.logger.info(f"PEAK MEMORY USAGE: {peak_mem:.2f} MB")
-                    else:
-                        self.logger.info("PEAK MEMORY USAGE: Not available")
-                except Exception as e:
-                    self.logger.warning(f"Cannot retrieve peak memory usage: {str(e)}")
+                self.logger.info(f"PEAK MEMORY USAGE: {memory_sampler.peak_mb:.2f} MB "
+                                 f"({memory_sampler.samples} samples)")
             elif self.model.status == GRB.TIME_LIMIT:
                 self.logger.error("STATUS: Time limit reached without finding any solution")
                 # Check if we have a solution anyway
@@ -509,14 +667,43 @@ class ScheduleOptimizer:
                 self.logger.error(f"STATUS: Optimization failed with status code {self.model.status}")
                 
             # Save solution files 
-            if has_solution:
+            if has_solution and not save:
+                self.logger.info("Solution kept in memory; output files left to the caller")
+            elif has_solution:
                 self.logger.info("=" * 80)
                 self.logger.info("Saving solution files...")
-                self.save_solution()
+                self.save_solution(solution)
                 self.logger.info("Solution files saved successfully.")
             else:
                 self.logger.error("No solution available to save to files.")
-                
+
+            # Record what the run actually used, including the measured peak memory
+            summary_path = write_json_report('solver_summary', {
+                'timestamp': datetime.now().isoformat(),
+                'status': self.model.status,
+                'objective': self.model.ObjVal if has_solution else None,
+                'bound': self.model.ObjBound if has_solution else None,
+                'mip_gap': self.model.MIPGap if has_solution else None,
+                'runtime_seconds': self.model.Runtime,
+                'nodes': self.model.NodeCount,
+                'total_requests': total_requests,
+                'analytic_bound': self.objective_bound,
+                'checkpoints': self.checkpointer.checkpoints if self.checkpointer else 0,
+                'memory': {
+                    'budget_gb': budget.budget_gb,
+                    'budget_source': budget.source,
+                    'mem_limit_gb': mem_limit_gb,
+                    'nodefile_start_gb': node_file_start,
+                    'estimated_before_build': self.memory_estimate,
+                    'estimated_after_build_mb': footprint['total_mb'],
+                    'model_size': actual_size,
+                    'peak_rss_mb': memory_sampler.peak_mb,
+                    'rss_samples': memory_sampler.samples
+                }
+            })
+            self.logger.info(f"Run summary written to {summary_path}")
+            return solution
+
         except gp.GurobiError as e:
             self.logger.error(f"GUROBI ERROR: {str(e)}")
             raise
@@ -533,7 +720,326 @@ class ScheduleOptimizer:
                     self.logger.error(f"Failed to save solution: {str(save_error)}")
             raise
 
-    def save_solution(self):
+    def remember_solution(self, solution):
+        """Keep a solution as the warm start for the next incremental re-solve"""
+        self.last_solution = solution
+        self._warm_start = {
+            'schedule': dict(zip(solution['schedule']['Section ID'], solution['schedule']['Period'])),
+            'assignments': set(zip(solution['assignments']['Student ID'], solution['assignments']['Section ID'])),
+            # Students and sections whose start values must be completed by the solver
+            'unsettled_students': set(),
+            'unsettled_sections': set()
+        }
+
+    def _course_students(self):
+        """Map each course to the students requesting it, mirroring create_variables"""
+        if getattr(self, '_course_requests', None) is None:
+            prefs = self.student_preferences.drop_duplicates('Student ID')
+            prefs = prefs[prefs['Student ID'].isin(self.students['Student ID'])]
+            self._course_requests = {}
+            for student_id, courses in zip(prefs['Student ID'], prefs['Preferred Sections']):
+                for course_id in str(courses).split(';'):
+                    self._course_requests.setdefault(course_id, []).append(student_id)
+        return self._course_requests
+
+    def _section_row(self, section_id):
+        """Return the sections row for a section in the live model"""
+        rows = self.sections[self.sections['Section ID'] == section_id]
+        if rows.empty or section_id not in self.capacity_violation:
+            raise KeyError(f"Section {section_id} is not in the model")
+        return rows.iloc[0]
+
+    def _forget_section(self, section_id):
+        """Drop a section from the warm start and mark its students for re-seating"""
+        if self._warm_start is None:
+            return
+        start = self._warm_start
+        start['schedule'].pop(section_id, None)
+        seated = {key for key in start['assignments'] if key[1] == section_id}
+        start['assignments'] -= seated
+        start['unsettled_students'].update(student_id for student_id, _ in seated)
+        start['unsettled_sections'].discard(section_id)
+
+    def _drop_bound_cuts(self):
+        """Remove analytic bound cuts, which are only valid for the sections they were computed on"""
+        if self.bound_constrs:
+            self.model.remove(self.bound_constrs)
+            self.bound_constrs = []
+            self.logger.info("Dropped analytic bound cuts after a section edit")
+        self.objective_bound = None
+
+    def remove_section(self, section_id):
+        """Delete a section's variables and constraints from the live model"""
+        self._drop_bound_cuts()
+        course_id = self._section_row(section_id)['Course ID']
+
+        x_keys = [key for key in self.x if key[1] == section_id]
+        z_keys = [key for key in self.z if key[0] == section_id]
+        y_keys = [key for key in self.y if key[1] == section_id]
+
+        # Removing a variable also drops its coefficients from the shared course,
+        # teacher and student-period rows, so only per-section rows need removing
+        constrs = [c for key in y_keys for c in self.link_constrs.pop(key)]
+        for handles in (self.one_period_constrs, self.capacity_constrs, self.sped_constrs):
+            if section_id in handles:
+                constrs.append(handles.pop(section_id))
+        variables = ([self.x.pop(key) for key in x_keys] + [self.z.pop(key) for key in z_keys]
+                     + [self.y.pop(key) for key in y_keys] + [self.capacity_violation.pop(section_id)])
+        self.model.remove(constrs)
+        self.model.remove(variables)
+
+        self.sections = self.sections[self.sections['Section ID'] != section_id].reset_index(drop=True)
+        self.data['sections'] = self.sections
+        self.section_to_teacher.pop(section_id, None)
+        self.course_to_sections[course_id].remove(section_id)
+        if not self.course_to_sections[course_id]:
+            # An empty requirement row would make the model infeasible
+            del self.course_to_sections[course_id]
+            dropped = [key for key in self.course_constrs if key[1] == course_id]
+            self.model.remove([self.course_constrs.pop(key) for key in dropped])
+            self.logger.warning(f"Course {course_id} has no sections left; dropped {len(dropped)} course requests")
+
+        self._forget_section(section_id)
+        self.logger.info(f"Removed section {section_id}: {len(variables)} variables, {len(constrs)} constraints")
+
+    def add_section(self, section):
+        """Add a section (mapping with the Sections_Information columns) to the live model"""
+        section_id = section['Section ID']
+        course_id = section['Course ID']
+        teacher_id = section['Teacher Assigned']
+        capacity = section['# of Seats Available']
+        if section_id in self.capacity_violation:
+            raise ValueError(f"Section {section_id} is already in the model")
+        self._drop_bound_cuts()
+
+        allowed_periods = self.get_allowed_periods(course_id)
+        students = self._course_students().get(course_id, [])
+        sped_students = set(self.students.loc[self.students['SPED'] == 1, 'Student ID'])
+
+        for period in allowed_periods:
+            self.z[section_id, period] = self.model.addVar(vtype=GRB.BINARY, name=f'z_{section_id}_{period}')
+        for student_id in students:
+            self.x[student_id, section_id] = self.model.addVar(vtype=GRB.BINARY, name=f'x_{student_id}_{section_id}')
+            for period in allowed_periods:
+                self.y[student_id, section_id, period] = self.model.addVar(
+                    vtype=GRB.BINARY, name=f'y_{student_id}_{section_id}_{period}')
+        # New overage variables join the objective through their objective coefficient
+        self.capacity_violation[section_id] = self.model.addVar(
+            vtype=GRB.INTEGER, lb=0, obj=1.0, name=f'capacity_violation_{section_id}')
+
+        self.one_period_constrs[section_id] = self.model.addConstr(
+            gp.quicksum(self.z[section_id, p] for p in allowed_periods) == 1,
+            name=f'one_period_{section_id}')
+        self.capacity_constrs[section_id] = self.model.addConstr(
+            gp.quicksum(self.x[student_id, section_id] for student_id in students)
+            <= capacity + self.capacity_violation[section_id],
+            name=f'soft_capacity_{section_id}')
+        self.sped_constrs[section_id] = self.model.addConstr(
+            gp.quicksum(self.x[student_id, section_id] for student_id in students if student_id in sped_students)
+            <= self.max_sped_per_section,
+            name=f'sped_distribution_{section_id}')
+        for student_id in students:
+            for period in allowed_periods:
+                self.link_constrs[student_id, section_id, period] = self.add_link_constraints(
+                    student_id, section_id, period)
+        self.model.update()
+
+        # Extend the existing shared rows in place instead of rebuilding them
+        for student_id in students:
+            if (student_id, course_id) in self.course_constrs:
+                self.model.chgCoeff(self.course_constrs[student_id, course_id], self.x[student_id, section_id], 1.0)
+            else:
+                self.course_constrs[student_id, course_id] = self.model.addConstr(
+                    self.x[student_id, section_id] == 1,
+                    name=f'hard_course_requirement_{student_id}_{course_id}')
+            for period in allowed_periods:
+                self.model.chgCoeff(self.student_period_constrs[student_id, period],
+                                    self.y[student_id, section_id, period], 1.0)
+        for period in allowed_periods:
+            if (teacher_id, period) in self.teacher_constrs:
+                self.model.chgCoeff(self.teacher_constrs[teacher_id, period], self.z[section_id, period], 1.0)
+
+        row = {column: section.get(column) for column in self.sections.columns}
+        self.sections = pd.concat([self.sections, pd.DataFrame([row])], ignore_index=True)
+        self.data['sections'] = self.sections
+        self.section_to_teacher[section_id] = teacher_id
+        self.course_to_sections.setdefault(course_id, []).append(section_id)
+        if self._warm_start is not None:
+            self._warm_start['unsettled_sections'].add(section_id)
+        self.logger.info(f"Added section {section_id} ({course_id}) for {len(students)} requesting students")
+
+    def set_section_capacity(self, section_id, capacity):
+        """Change a section's seat count by updating the right-hand side of its capacity row"""
+        self._section_row(section_id)
+        self._drop_bound_cuts()
+        self.capacity_constrs[section_id].RHS = capacity
+        self.sections.loc[self.sections['Section ID'] == section_id, '# of Seats Available'] = capacity
+        self.data['sections'] = self.sections
+
+    def merge_sections(self, primary_section, secondary_section):
+        """Merge the secondary section into the primary one, combining their seats"""
+        combined = (self._section_row(primary_section)['# of Seats Available']
+                    + self._section_row(secondary_section)['# of Seats Available'])
+        self.set_section_capacity(primary_section, combined)
+        self.remove_section(secondary_section)
+        self.logger.info(f"Merged {secondary_section} into {primary_section} ({combined} seats)")
+
+    def split_section(self, section_id):
+        """Split a section into _A and _B halves taught by the same teacher"""
+        section = self._section_row(section_id).to_dict()
+        half = section['# of Seats Available'] // 2
+        self.remove_section(section_id)
+        new_ids = []
+        for suffix in ('A', 'B'):
+            new_section = dict(section, **{'Section ID': f'{section_id}_{suffix}', '# of Seats Available': half})
+            self.add_section(new_section)
+            new_ids.append(new_section['Section ID'])
+        return new_ids
+
+    def sync_sections(self, sections):
+        """Apply the difference between the live model and an edited sections table"""
+        current = self.sections.set_index('Section ID')
+        target = sections.drop_duplicates('Section ID').set_index('Section ID')
+        removed = [s for s in current.index if s not in target.index]
+        added = [s for s in target.index if s not in current.index]
+        # A new course or teacher changes which rows a section belongs to, so rebuild it
+        rebuilt = [s for s in current.index.intersection(target.index)
+                   if current.at[s, 'Course ID'] != target.at[s, 'Course ID']
+                   or current.at[s, 'Teacher Assigned'] != target.at[s, 'Teacher Assigned']]
+        resized = [s for s in current.index.intersection(target.index)
+                   if s not in rebuilt
+                   and current.at[s, '# of Seats Available'] != target.at[s, '# of Seats Available']]
+
+        for section_id in removed + rebuilt:
+            self.remove_section(section_id)
+        for section_id in added + rebuilt:
+            self.add_section(dict(target.loc[section_id].to_dict(), **{'Section ID': section_id}))
+        for section_id in resized:
+            self.set_section_capacity(section_id, target.at[section_id, '# of Seats Available'])
+
+        changes = {'removed': removed, 'added': added, 'rebuilt': rebuilt, 'resized': resized}
+        self.logger.info("Synced sections: " + ", ".join(f"{len(v)} {k}" for k, v in changes.items()))
+        return changes
+
+    def apply_warm_start(self):
+        """Set MIP start values from the last solution, leaving edited parts for the solver to complete"""
+        if self._warm_start is None:
+            return False
+        start = self._warm_start
+        schedule = start['schedule']
+        assignments = start['assignments']
+        unsettled_students = start['unsettled_students']
+        unsettled_sections = start['unsettled_sections']
+
+        x_start = [GRB.UNDEFINED if student_id in unsettled_students or section_id in unsettled_sections
+                   else float((student_id, section_id) in assignments)
+                   for student_id, section_id in self.x]
+        z_start = [GRB.UNDEFINED if section_id in unsettled_sections
+                   else float(schedule.get(section_id) == period)
+                   for section_id, period in self.z]
+        y_start = [GRB.UNDEFINED if student_id in unsettled_students or section_id in unsettled_sections
+                   else float((student_id, section_id) in assignments and schedule.get(section_id) == period)
+                   for student_id, section_id, period in self.y]
+        self.model.setAttr('Start', list(self.x.values()), x_start)
+        self.model.setAttr('Start', list(self.z.values()), z_start)
+        self.model.setAttr('Start', list(self.y.values()), y_start)
+        self.logger.info(f"Warm start: {len(unsettled_students)} students and {len(unsettled_sections)} "
+                         f"sections left for the solver to place")
+        return True
+
+    def reoptimize(self, time_limit=25200, save=True):
+        """Re-solve the edited live model from the previous solution instead of rebuilding it"""
+        warm = self.apply_warm_start()
+        return self.solve(use_greedy=not warm, time_limit=time_limit, save=save)
+
+    def enable_checkpoints(self, directory=os.path.join('output', 'checkpoints'), csv_interval=60):
+        """Checkpoint improved incumbents and refresh output CSVs while the solve runs"""
+        from checkpoint import Checkpointer
+        self.checkpointer = Checkpointer(self, directory=directory, csv_interval=csv_interval)
+        return self.checkpointer
+
+    def resume_from_checkpoint(self, directory=os.path.join('output', 'checkpoints')):
+        """Use the latest checkpoint of this instance as the MIP start; returns False if there is none"""
+        from checkpoint import instance_key, load_checkpoint
+        instance = self.checkpointer.instance if self.checkpointer is not None else instance_key(self)
+        checkpoint = load_checkpoint(directory, instance)
+        if checkpoint is None:
+            self.logger.warning(f"No checkpoint for these inputs in {directory}; starting from the greedy solution")
+            return False
+        solution, objective, saved_at = checkpoint
+        self.remember_solution(solution)
+        self.apply_warm_start()
+        if self.checkpointer is not None:
+            self.checkpointer.best = objective
+        self.logger.info(f"Resuming from checkpoint with objective {objective:.0f} "
+                         f"saved {datetime.fromtimestamp(saved_at).isoformat()}")
+        return True
+
+    def solve_fast(self, rounds=8, time_limit=60):
+        """Approximate schedule from the LP relaxation, without building the full MIP"""
+        from fast_mode import FastScheduler
+        solution, report = FastScheduler(self, rounds=rounds, time_limit=time_limit).run()
+        self.remember_solution(solution)
+        self.save_solution(solution)
+        report['timestamp'] = datetime.now().isoformat()
+        report['total_requests'] = self.count_total_requests()
+        self.logger.info(f"Run summary written to {write_json_report('solver_summary', report)}")
+        return solution
+
+    def solve_decomposed(self, stage1_time=300, stage2_time=300, max_rounds=10):
+        """Master schedule first, then student sectioning, without building the monolithic model"""
+        from decomposition import TwoStageDecomposition
+        decomposition = TwoStageDecomposition(self, stage1_time=stage1_time, stage2_time=stage2_time,
+                                              max_rounds=max_rounds)
+        solution, report = decomposition.run()
+        self.remember_solution(solution)
+        self.save_solution(solution)
+        report['timestamp'] = datetime.now().isoformat()
+        report['total_requests'] = self.count_total_requests()
+        self.logger.info(f"Run summary written to {write_json_report('solver_summary', report)}")
+        return solution
+
+    def solve_sharded(self, workers=None, time_limit=3600):
+        """Solve independent or weakly coupled parts of the instance in parallel and merge them"""
+        from sharding import ShardedSolver
+        solution, report = ShardedSolver(self, workers=workers, time_limit=time_limit).run()
+        self.remember_solution(solution)
+        self.save_solution(solution)
+        report['timestamp'] = datetime.now().isoformat()
+        report['total_requests'] = self.count_total_requests()
+        self.logger.info(f"Run summary written to {write_json_report('solver_summary', report)}")
+        return solution
+
+    def extract_solution(self):
+        """Read the incumbent with one bulk attribute query per variable family"""
+        z_keys = list(self.z.keys())
+        z_values = np.asarray(self.model.getAttr('X', list(self.z.values())), dtype=float)
+        x_keys = list(self.x.keys())
+        x_values = np.asarray(self.model.getAttr('X', list(self.x.values())), dtype=float)
+
+        scheduled = [z_keys[i] for i in np.flatnonzero(z_values > 0.5)]
+        assigned = [x_keys[i] for i in np.flatnonzero(x_values > 0.5)]
+
+        # Columnar layout so every output table is built without per-row lookups
+        return {
+            'schedule': {
+                'Section ID': [section_id for section_id, _ in scheduled],
+                'Period': [period for _, period in scheduled]
+            },
+            'assignments': {
+                'Student ID': [student_id for student_id, _ in assigned],
+                'Section ID': [section_id for _, section_id in assigned]
+            }
+        }
+
+    def section_overages(self, solution):
+        """Return students over capacity per section for a columnar solution"""
+        capacity = self.sections.set_index('Section ID')['# of Seats Available']
+        enrolled = pd.Series(solution['assignments']['Section ID'], dtype=object).value_counts()
+        enrolled = enrolled.reindex(capacity.index, fill_value=0)
+        return (enrolled - capacity).clip(lower=0)
+
+    def save_solution(self, solution=None):
         """Save the solution to CSV files"""
         output_dir = 'output'
         os.makedirs(output_dir, exist_ok=True)
@@ -542,107 +1048,50 @@ class ScheduleOptimizer:
         files_created = []
         
         try:
+            if solution is None:
+                solution = self.extract_solution()
+
             # Save section schedule
-            section_schedule = []
-            for (section_id, period), z_var in self.z.items():
-                if z_var.X > 0.5:
-                    section_schedule.append({
-                        'Section ID': section_id,
-                        'Period': period
-                    })
+            section_schedule = pd.DataFrame(solution['schedule'], columns=['Section ID', 'Period'])
             master_schedule_path = os.path.join(output_dir, 'Master_Schedule.csv')
-            pd.DataFrame(section_schedule).to_csv(master_schedule_path, index=False)
+            section_schedule.to_csv(master_schedule_path, index=False)
             files_created.append(master_schedule_path)
             self.logger.info(f"Created {master_schedule_path} with {len(section_schedule)} entries")
 
             # Save student assignments
-            student_assignments = []
-            for (student_id, section_id), x_var in self.x.items():
-                if x_var.X > 0.5:
-                    student_assignments.append({
-                        'Student ID': student_id,
-                        'Section ID': section_id
-                    })
+            student_assignments = pd.DataFrame(solution['assignments'], columns=['Student ID', 'Section ID'])
             student_assignments_path = os.path.join(output_dir, 'Student_Assignments.csv')
-            pd.DataFrame(student_assignments).to_csv(student_assignments_path, index=False)
+            student_assignments.to_csv(student_assignments_path, index=False)
             files_created.append(student_assignments_path)
             self.logger.info(f"Created {student_assignments_path} with {len(student_assignments)} entries")
 
-            # Save teacher schedule
-            teacher_schedule = []
-            for (section_id, period), z_var in self.z.items():
-                if z_var.X > 0.5:
-                    try:
-                        teacher_id = self.sections[
-                            self.sections['Section ID'] == section_id
-                        ]['Teacher Assigned'].iloc[0]
-                        teacher_schedule.append({
-                            'Teacher ID': teacher_id,
-                            'Section ID': section_id,
-                            'Period': period
-                        })
-                    except Exception as e:
-                        self.logger.warning(f"Error finding teacher for section {section_id}: {str(e)}")
-                        teacher_schedule.append({
-                            'Teacher ID': 'Unknown',
-                            'Section ID': section_id,
-                            'Period': period
-                        })
+            # Save teacher schedule using the precomputed section -> teacher mapping
+            teacher_ids = section_schedule['Section ID'].map(self.section_to_teacher)
+            if teacher_ids.isna().any():
+                missing = section_schedule.loc[teacher_ids.isna(), 'Section ID'].tolist()
+                self.logger.warning(f"No teacher found for sections: {missing}")
+            teacher_schedule = pd.DataFrame({
+                'Teacher ID': teacher_ids.fillna('Unknown'),
+                'Section ID': section_schedule['Section ID'],
+                'Period': section_schedule['Period']
+            })
             teacher_schedule_path = os.path.join(output_dir, 'Teacher_Schedule.csv')
-            pd.DataFrame(teacher_schedule).to_csv(teacher_schedule_path, index=False)
+            teacher_schedule.to_csv(teacher_schedule_path, index=False)
             files_created.append(teacher_schedule_path)
             self.logger.info(f"Created {teacher_schedule_path} with {len(teacher_schedule)} entries")
 
-            # Save metrics for soft constraints
-            constraint_violations = []
-            
-            # Calculate total requests from student preferences
-            total_requests = 0
-            for _, student in self.students.iterrows():
-                student_id = student['Student ID']
-                requested_courses = self.student_preferences[
-                    self.student_preferences['Student ID'] == student_id
-                ]['Preferred Sections'].iloc[0].split(';')
-                total_requests += len(requested_courses)
-            
-            # With hard constraints, all requests are satisfied
-            missed_count = 0
-            satisfied_count = total_requests
-            satisfaction_rate = 100.0
-            
-            constraint_violations.append({
-                'Metric': 'Missed Requests',
-                'Count': 0,  # Always 0 with hard constraints
-                'Total': total_requests,
-                'Percentage': "0.00%",
-                'Satisfaction_Rate': "100.00%"
-            })
-            
-            # Calculate and save capacity violations
-            sections_over_capacity = sum(1 for var in self.capacity_violation.values() if var.X > 0.5)
-            total_violations = sum(var.X for var in self.capacity_violation.values())
-            
-            constraint_violations.append({
-                'Metric': 'Sections Over Capacity',
-                'Count': int(sections_over_capacity),
-                'Total_Sections': len(self.sections),
-                'Percentage': f"{sections_over_capacity / len(self.sections) * 100:.2f}%" if len(self.sections) > 0 else "0.00%",
-                'Total_Overages': int(total_violations)
-            })
-            
-            # Add overall satisfaction stats - hard constraint means 100% satisfaction
-            constraint_violations.append({
-                'Metric': 'Overall Satisfaction',
-                'Count': int(total_requests),  # All requests are satisfied
-                'Total': total_requests,
-                'Percentage': "100.00%",       # Always 100% with hard constraints
-                'Status': "Perfect"            # Always Perfect with hard constraints
-            })
-            
-            violations_path = os.path.join(output_dir, 'Constraint_Violations.csv')
-            pd.DataFrame(constraint_violations).to_csv(violations_path, index=False)
+            # Verify the written schedule against the inputs instead of assuming the model held
+            verifier = ScheduleVerifier(self.sections, self.students, self.student_preferences,
+                                        self.teacher_unavailability, self.periods,
+                                        self.course_period_restrictions, self.max_sped_per_section)
+            report = verifier.verify(section_schedule, student_assignments, teacher_schedule)
+            violations_path = write_violations(report, output_dir)
             files_created.append(violations_path)
-            self.logger.info(f"Created {violations_path}")
+            self.logger.info(f"Created {violations_path} (verified in {report['runtime_ms']} ms, "
+                             f"{report['satisfied_requests']}/{report['total_requests']} requests satisfied)")
+            for name in HARD_RULES:
+                if report['issues'][name]:
+                    self.logger.warning(f"Verifier: {len(report['issues'][name])} {name.lower()}")
             
             # Save a summary of all output files
             self.logger.info(f"Successfully created {len(files_created)} output files:")
@@ -671,11 +1120,12 @@ class ScheduleOptimizer:
                         elif filename == 'Teacher_Schedule.csv':
                             pd.DataFrame(columns=['Teacher ID', 'Section ID', 'Period']).to_csv(filepath, index=False)
                         elif filename == 'Constraint_Violations.csv':
-                            # Create placeholder constraint violations with consistent columns
+                            # Create placeholder constraint violations with consistent columns; nothing
+                            # was verified, so no rate is reported and the run is marked as failed
                             placeholder_data = [
-                                {'Metric': 'Missed Requests', 'Count': 0, 'Total': 0, 'Percentage': '0.00%', 'Satisfaction_Rate': '100.00%'},
-                                {'Metric': 'Sections Over Capacity', 'Count': 0, 'Total_Sections': 0, 'Percentage': '0.00%', 'Total_Overages': 0},
-                                {'Metric': 'Overall Satisfaction', 'Count': 0, 'Total': 0, 'Percentage': '0.00%', 'Status': 'N/A'}
+                                {'Metric': 'Missed Requests', 'Count': 0, 'Total': 0, 'Percentage': 'N/A', 'Satisfaction_Rate': 'N/A'},
+                                {'Metric': 'Sections Over Capacity', 'Count': 0, 'Total_Sections': 0, 'Percentage': 'N/A', 'Total_Overages': 0},
+                                {'Metric': 'Overall Satisfaction', 'Count': 0, 'Total': 0, 'Percentage': 'N/A', 'Status': 'Failed'}
                             ]
                             pd.DataFrame(placeholder_data).to_csv(filepath, index=False)
                         self.logger.info(f"Created empty placeholder file: {filepath}")
@@ -685,14 +1135,86 @@ class ScheduleOptimizer:
         self.logger.info("Solution saved successfully")
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build and solve the school scheduling MILP')
+    parser.add_argument('--lns', action='store_true',
+                        help='Improve the schedule with large neighborhood search instead of one full solve')
+    parser.add_argument('--lns-time', type=float, default=3600, help='LNS time budget in seconds')
+    parser.add_argument('--lns-subtime', type=float, default=30, help='Time limit per neighborhood sub-solve')
+    parser.add_argument('--lns-workers', type=int, default=None, help='Concurrent neighborhood workers')
+    parser.add_argument('--race', type=int, default=0, metavar='K',
+                        help='Race K copies of the model with different seeds and parameter sets')
+    parser.add_argument('--race-gap', type=float, default=0.0001, help='MIP gap that ends the race')
+    parser.add_argument('--race-time', type=float, default=25200, help='Time limit for each racer in seconds')
+    parser.add_argument('--fast', action='store_true',
+                        help='Approximate schedule from the LP relaxation with rounding and repair')
+    parser.add_argument('--fast-rounds', type=int, default=8, help='Rounded schedules tried in fast mode')
+    parser.add_argument('--fast-time', type=float, default=60, help='Fast mode time budget in seconds')
+    parser.add_argument('--decompose', action='store_true',
+                        help='Solve the master schedule first, then student sectioning')
+    parser.add_argument('--stage1-time', type=float, default=300, help='Master schedule time budget in seconds')
+    parser.add_argument('--stage2-time', type=float, default=300, help='Student sectioning time budget in seconds')
+    parser.add_argument('--shard', action='store_true',
+                        help='Split the instance into student-independent shards and solve them in parallel')
+    parser.add_argument('--shard-workers', type=int, default=None, help='Concurrent shard solves')
+    parser.add_argument('--shard-time', type=float, default=3600, help='Time limit per shard in seconds')
+    parser.add_argument('--precheck', choices=['off', 'warn', 'abort', 'adjust'], default='warn',
+                        help='Feasibility precheck before the solve: report only, stop on errors, '
+                             'or adjust the data where possible')
+    parser.add_argument('--checkpoint-dir', default=os.path.join('output', 'checkpoints'),
+                        help='Directory for incumbent checkpoints during the full solve')
+    parser.add_argument('--csv-interval', type=float, default=60,
+                        help='Minimum seconds between refreshes of the output CSVs during the solve')
+    parser.add_argument('--resume', action='store_true',
+                        help='Start the full solve from the latest checkpoint')
+    parser.add_argument('--no-bounds', action='store_true',
+                        help='Skip the analytic lower bounds and cuts before the full solve')
+    parser.add_argument('--no-model-cache', action='store_true',
+                        help='Always rebuild the model instead of reloading an exported copy from cache/models')
+    parser.add_argument('--no-stage-cache', action='store_true',
+                        help='Always rerun the precheck and greedy start instead of reusing results from cache/stages')
+    parser.add_argument('--mem-budget', type=float, default=None,
+                        help='Memory budget for this job in GB (default: SCHEDULER_MEM_BUDGET_GB, '
+                             'container limit or free RAM)')
+    args = parser.parse_args()
+    if args.fast_rounds < 1:
+        parser.error("--fast-rounds must be at least 1")
+
     try:
         optimizer = ScheduleOptimizer()
-        optimizer.create_variables()
-        optimizer.add_constraints()
-        optimizer.set_objective()
-        optimizer.solve()
+        optimizer.memory_budget_gb = args.mem_budget
+        if not args.no_stage_cache:
+            from stage_cache import StageCache
+            optimizer.stage_cache = StageCache()
+        optimizer.precheck(args.precheck)
+        optimizer.estimate_memory()
+        if args.fast:
+            optimizer.solve_fast(rounds=args.fast_rounds, time_limit=args.fast_time)
+        elif args.decompose:
+            optimizer.solve_decomposed(stage1_time=args.stage1_time, stage2_time=args.stage2_time)
+        elif args.shard:
+            optimizer.solve_sharded(workers=args.shard_workers, time_limit=args.shard_time)
+        elif args.lns:
+            from lns import LNSDriver
+            driver = LNSDriver(optimizer, workers=args.lns_workers, sub_time_limit=args.lns_subtime)
+            # Stream every improvement to the output files so progress is visible during the search
+            best = driver.run(time_budget=args.lns_time,
+                              on_improvement=lambda solution, objective: optimizer.save_solution(solution))
+            optimizer.save_solution(best)
+        elif args.race:
+            from racing import SolveRace
+            race = SolveRace(optimizer.data, racers=args.race, time_limit=args.race_time, target_gap=args.race_gap)
+            best, record = race.run()
+            optimizer.save_solution(best)
+            optimizer.logger.info(f"Race record written to {write_json_report('race_summary', record)}")
+        else:
+            optimizer.build_model(bounds=not args.no_bounds, cache=not args.no_model_cache)
+            optimizer.enable_checkpoints(args.checkpoint_dir, args.csv_interval)
+            resumed = args.resume and optimizer.resume_from_checkpoint(args.checkpoint_dir)
+            optimizer.solve(use_greedy=not resumed)
     except KeyboardInterrupt:
         logging.info("Optimization interrupted by user")
     except Exception as e:
         logging.error(f"Error running optimization: {str(e)}")
-        raise
\ No newline at end of file
+        raise
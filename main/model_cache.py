@@ -0,0 +1,168 @@
+# Standard library imports
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+
+# Third-party imports
+import gurobipy as gp
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bump when the formulation changes in a way the source hash below would not catch
+FORMULATION_VERSION = 1
+
+# Modules whose code shapes the built model
+FORMULATION_MODULES = ('milp_soft.py', 'bounds.py', 'aggregate.py')
+
+# Variable and constraint families in the order the builder creates them
+VAR_FAMILIES = ('x', 'z', 'y', 'capacity_violation')
+CONSTR_FAMILIES = ('one_period_constrs', 'capacity_constrs', 'course_constrs', 'teacher_constrs',
+                   'student_period_constrs', 'link_constrs', 'sped_constrs')
+
+
+def instance_hash(optimizer, bounds=True):
+    """Hash the input tables and formulation options that determine the built model"""
+    digest = hashlib.sha256()
+    for name in sorted(optimizer.data):
+        value = optimizer.data[name]
+        digest.update(name.encode())
+        if isinstance(value, pd.DataFrame):
+            digest.update(json.dumps(list(map(str, value.columns))).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+    options = {
+        'version': FORMULATION_VERSION,
+        'periods': optimizer.periods,
+        'course_period_restrictions': optimizer.course_period_restrictions,
+        'max_sped_per_section': optimizer.max_sped_per_section,
+        'bounds': bool(bounds)
+    }
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in FORMULATION_MODULES:
+        path = os.path.join(here, module)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:24]
+
+
+class ModelCache:
+    """Built models stored as compressed MPS with an index mapping columns and rows back to their keys
+
+    Names are not relied on: MPS cannot carry the course IDs with spaces, so the index records
+    each family's keys in creation order and the reload maps them by position.
+    """
+
+    def __init__(self, directory=None, keep=5):
+        self.directory = directory or os.environ.get('SCHEDULER_MODEL_CACHE', os.path.join('cache', 'models'))
+        self.keep = keep
+
+    def paths(self, key):
+        """Return (model path, index path) for one cache entry"""
+        return (os.path.join(self.directory, f'{key}.mps.gz'),
+                os.path.join(self.directory, f'{key}.index.json.gz'))
+
+    def store(self, optimizer, key):
+        """Export the optimizer's freshly built model and its key index"""
+        started = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        model_path, index_path = self.paths(key)
+        optimizer.model.update()
+
+        index = {
+            'key': key,
+            'created': time.time(),
+            'objective_bound': optimizer.objective_bound,
+            'bound_constrs': len(optimizer.bound_constrs),
+            'vars': {family: [list(k) if isinstance(k, tuple) else k for k in getattr(optimizer, family)]
+                     for family in VAR_FAMILIES},
+            'constrs': {family: [list(k) if isinstance(k, tuple) else k for k in getattr(optimizer, family)]
+                        for family in CONSTR_FAMILIES}
+        }
+        # Gurobi picks the format from the extension, so the temporary name keeps it
+        tmp_model = os.path.join(self.directory, f'.{key}.{os.getpid()}.mps.gz')
+        optimizer.model.write(tmp_model)
+        os.replace(tmp_model, model_path)
+        # The index goes last: an entry only counts as present once its index exists
+        tmp_index = index_path + f'.{os.getpid()}.tmp'
+        with gzip.open(tmp_index, 'wt') as f:
+            json.dump(index, f, default=str)
+        os.replace(tmp_index, index_path)
+        self.prune()
+        logger.info(f"Cached built model as {model_path} in {time.time() - started:.1f}s")
+        return model_path
+
+    def load(self, optimizer, key):
+        """Replace the optimizer's model with the cached one; return False on a miss"""
+        model_path, index_path = self.paths(key)
+        if not (os.path.exists(model_path) and os.path.exists(index_path)):
+            return False
+        started = time.time()
+        try:
+            with gzip.open(index_path, 'rt') as f:
+                index = json.load(f)
+            model = gp.read(model_path)
+        except (OSError, ValueError, gp.GurobiError) as e:
+            logger.warning(f"Ignoring unreadable model cache entry {key}: {str(e)}")
+            return False
+
+        variables = model.getVars()
+        constrs = model.getConstrs()
+        expected_vars = sum(len(keys) for keys in index['vars'].values())
+        expected_constrs = (sum(len(keys) for keys in index['constrs'].values())
+                            + 2 * len(index['constrs']['link_constrs']) + index['bound_constrs'])
+        if len(variables) != expected_vars or len(constrs) != expected_constrs:
+            logger.warning(f"Model cache entry {key} does not match its index; rebuilding")
+            model.dispose()
+            return False
+
+        position = 0
+        for family in VAR_FAMILIES:
+            keys = index['vars'][family]
+            setattr(optimizer, family, {_key(k): v for k, v in zip(keys, variables[position:position + len(keys)])})
+            position += len(keys)
+        position = 0
+        for family in CONSTR_FAMILIES:
+            keys = index['constrs'][family]
+            # Each y variable has three linking rows, added together
+            width = 3 if family == 'link_constrs' else 1
+            rows = constrs[position:position + width * len(keys)]
+            if width == 3:
+                setattr(optimizer, family, {_key(k): tuple(rows[3 * n:3 * n + 3]) for n, k in enumerate(keys)})
+            else:
+                setattr(optimizer, family, {_key(k): row for k, row in zip(keys, rows)})
+            position += len(rows)
+        optimizer.bound_constrs = constrs[position:]
+        optimizer.objective_bound = index['objective_bound']
+        os.utime(index_path)
+
+        optimizer.model.dispose()
+        optimizer.model = model
+        model.ModelName = 'School_Scheduling'
+        logger.info(f"Loaded cached model {key} ({len(variables)} variables, {len(constrs)} constraints) "
+                    f"in {time.time() - started:.1f}s")
+        return True
+
+    def prune(self):
+        """Keep only the most recently used entries"""
+        entries = sorted((f for f in os.listdir(self.directory) if f.endswith('.index.json.gz')),
+                         key=lambda f: os.path.getmtime(os.path.join(self.directory, f)), reverse=True)
+        for stale in entries[self.keep:]:
+            key = stale[:-len('.index.json.gz')]
+            for path in self.paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _key(value):
+    """JSON turns tuple keys into lists; turn them back"""
+    return tuple(value) if isinstance(value, list) else value
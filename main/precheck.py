@@ -0,0 +1,188 @@
+# Standard library imports
+import re
+import math
+import time
+import logging
+from collections import defaultdict
+
+# Local imports
+from aggregate import request_patterns
+from sectioning import hall_violator
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'warn', 'abort', 'adjust')
+
+
+class Precheck:
+    """Cheap feasibility and demand/capacity checks run before the MILP is built"""
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+        self.sections = optimizer.sections
+        self.periods = optimizer.periods
+        self.issues = []
+        self.adjustments = []
+
+    def issue(self, severity, check, message, **details):
+        """Record one finding; severity is 'error' (model infeasible) or 'warning'"""
+        self.issues.append({'severity': severity, 'check': check, 'message': message, **details})
+
+    def check_demand(self):
+        """Requests per course against seats, and requested courses with no sections"""
+        optimizer = self.optimizer
+        prefs = optimizer.student_preferences.drop_duplicates('Student ID')
+        prefs = prefs[prefs['Student ID'].isin(optimizer.students['Student ID'])]
+        requested = prefs['Preferred Sections'].astype(str).str.split(';').explode()
+        demand = requested.value_counts()
+        seats = self.sections.groupby('Course ID')['# of Seats Available'].sum()
+
+        for course_id in demand.index.difference(seats.index):
+            self.issue('warning', 'demand', f"{demand[course_id]} requests for {course_id}, which has no sections "
+                                            f"(these requests are ignored by the model)",
+                       course=course_id, requests=int(demand[course_id]))
+        table = {}
+        for course_id, total in seats.items():
+            requests = int(demand.get(course_id, 0))
+            table[course_id] = {'requests': requests, 'seats': int(total),
+                                'utilization': round(requests / total, 3) if total else None}
+            if requests > total:
+                self.issue('warning', 'demand', f"{course_id}: {requests} requests for {int(total)} seats",
+                           course=course_id, shortfall=int(requests - total))
+        return table
+
+    def check_sped(self):
+        """SPED requests per course against the per-section SPED limit"""
+        optimizer = self.optimizer
+        flags = optimizer.students['SPED']
+        if not flags.isin([0, 1]).all():
+            self.issue('warning', 'sped', f"SPED column has values {sorted(map(str, flags.unique()))}; the SPED "
+                                          f"distribution rule only applies to students flagged 1")
+        sped_students = set(optimizer.students.loc[flags == 1, 'Student ID'])
+        sped_demand = defaultdict(int)
+        for courses, students in request_patterns(optimizer.data, optimizer.course_to_sections).items():
+            count = sum(1 for s in students if s in sped_students)
+            for course_id in courses:
+                sped_demand[course_id] += count
+
+        table = {}
+        for course_id, section_ids in optimizer.course_to_sections.items():
+            headroom = len(section_ids) * optimizer.max_sped_per_section
+            table[course_id] = {'sped_requests': sped_demand[course_id], 'sped_headroom': headroom}
+            if sped_demand[course_id] > headroom:
+                self.issue('error', 'sped', f"{course_id}: {sped_demand[course_id]} SPED requests but at most "
+                                            f"{headroom} fit ({len(section_ids)} sections x "
+                                            f"{optimizer.max_sped_per_section})",
+                           course=course_id, needed=math.ceil(sped_demand[course_id] / len(section_ids)))
+        return table
+
+    def check_teachers(self):
+        """Teacher section counts against the periods they can actually teach"""
+        optimizer = self.optimizer
+        unavailable = {}
+        for teacher_id, periods in zip(optimizer.teacher_unavailability.get('Teacher ID', []),
+                                       optimizer.teacher_unavailability.get('Unavailable Periods', [])):
+            if isinstance(periods, str):
+                unavailable[teacher_id] = {p.strip() for p in re.split('[;,]', periods) if p.strip()}
+
+        table = {}
+        for teacher_id, group in self.sections.groupby('Teacher Assigned'):
+            blocked = unavailable.get(teacher_id, set())
+            options = [list(optimizer.get_allowed_periods(c)) for c in group['Course ID']]
+            free_options = [[p for p in o if p not in blocked] for o in options]
+            table[teacher_id] = {'sections': len(group), 'available_periods': len(set(self.periods) - blocked)}
+            # The model enforces teacher conflicts but not unavailability, so only the former is fatal
+            if hall_violator(options) is not None:
+                self.issue('error', 'teacher', f"Teacher {teacher_id} has {len(group)} sections that cannot all "
+                                               f"meet in different periods", teacher=teacher_id)
+            elif hall_violator(free_options) is not None:
+                self.issue('warning', 'teacher', f"Teacher {teacher_id} cannot teach all {len(group)} sections "
+                                                 f"outside unavailable periods {sorted(blocked)}", teacher=teacher_id)
+        return table
+
+    def check_patterns(self):
+        """Each request pattern needs its courses in distinct periods (bipartite matching)"""
+        optimizer = self.optimizer
+        offered = {c: sorted({p for p in optimizer.get_allowed_periods(c)}) for c in optimizer.course_to_sections}
+        stuck = {}
+        patterns = request_patterns(optimizer.data, optimizer.course_to_sections)
+        for courses, students in patterns.items():
+            # Necessary condition only: it ignores how many sections each course actually has
+            violator = hall_violator([offered[c] for c in courses])
+            if violator is not None:
+                conflicting = [courses[i] for i in violator[0]]
+                stuck[courses] = conflicting
+                self.issue('error', 'pattern', f"{len(students)} students request {', '.join(conflicting)}, which "
+                                               f"only fit in periods {sorted(violator[1])}",
+                           courses=conflicting, students=len(students))
+        return {'patterns': len(patterns), 'unplaceable': len(stuck)}, stuck
+
+    def adjust(self, stuck_patterns):
+        """Relax what can be relaxed automatically: SPED limit and unplaceable requests"""
+        optimizer = self.optimizer
+        sped_needed = [i['needed'] for i in self.issues if i['check'] == 'sped' and i['severity'] == 'error']
+        if sped_needed:
+            old = optimizer.max_sped_per_section
+            optimizer.max_sped_per_section = max(sped_needed)
+            self.adjustments.append(f"Raised max SPED per section from {old} to {optimizer.max_sped_per_section}")
+
+        if stuck_patterns:
+            # Drop the conflicting request with the fewest allowed periods until each pattern fits
+            offered = {c: list(optimizer.get_allowed_periods(c)) for c in optimizer.course_to_sections}
+            replacements = {}
+            for courses in stuck_patterns:
+                kept = list(courses)
+                while hall_violator([offered[c] for c in kept]) is not None:
+                    conflicting = [kept[i] for i in hall_violator([offered[c] for c in kept])[0]]
+                    kept.remove(min(conflicting, key=lambda c: len(offered[c])))
+                replacements[courses] = (kept, [c for c in courses if c not in kept])
+
+            # Edit a copy: the caller's tables (and any cached or shared copies of them) stay as loaded
+            prefs = optimizer.student_preferences.copy()
+            dropped = 0
+            for index, (student_id, value) in enumerate(zip(prefs['Student ID'], prefs['Preferred Sections'])):
+                requested = list(dict.fromkeys(str(value).split(';')))
+                key = tuple(sorted(c for c in requested if c in optimizer.course_to_sections))
+                if key in replacements:
+                    removed = replacements[key][1]
+                    prefs.iat[index, prefs.columns.get_loc('Preferred Sections')] = ';'.join(
+                        c for c in requested if c not in removed)
+                    dropped += len(removed)
+            optimizer.student_preferences = prefs
+            optimizer.data = dict(optimizer.data, student_preferences=prefs)
+            optimizer._course_requests = None
+            for courses, (_, removed) in replacements.items():
+                self.adjustments.append(f"Dropped {', '.join(removed)} from pattern {', '.join(courses)}")
+            logger.warning(f"Precheck dropped {dropped} unplaceable course requests")
+
+    def run(self, mode='warn'):
+        """Run all checks, optionally adjust the data, and return the report"""
+        started = time.perf_counter()
+        checks = {
+            'demand': self.check_demand(),
+            'sped': self.check_sped(),
+            'teachers': self.check_teachers()
+        }
+        checks['patterns'], stuck = self.check_patterns()
+
+        if mode == 'adjust' and any(i['severity'] == 'error' for i in self.issues):
+            self.adjust(stuck)
+            # Re-run the checks the adjustments can fix to see what is left
+            before = len(self.issues)
+            self.issues = [i for i in self.issues if i['check'] not in ('sped', 'pattern')]
+            self.check_sped()
+            checks['patterns'], _ = self.check_patterns()
+            logger.info(f"Precheck adjustments resolved {before - len(self.issues)} issues")
+
+        errors = sum(1 for i in self.issues if i['severity'] == 'error')
+        warnings = len(self.issues) - errors
+        return {
+            'status': 'error' if errors else ('warning' if warnings else 'ok'),
+            'mode': mode,
+            'errors': errors,
+            'warnings': warnings,
+            'issues': self.issues,
+            'adjustments': self.adjustments,
+            'checks': checks,
+            'runtime_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
@@ -0,0 +1,228 @@
+# Standard library imports
+import os
+import glob
+import time
+import pickle
+import shutil
+import logging
+import tempfile
+import multiprocessing
+
+# Third-party imports
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Parameter sets raced against each other; seeds are assigned per racer on top of these
+RACE_CONFIGS = [
+    {'name': 'feasibility', 'params': {'MIPFocus': 1}},
+    {'name': 'bound', 'params': {'MIPFocus': 3, 'Cuts': 2}},
+    {'name': 'heuristic', 'params': {'MIPFocus': 1, 'Heuristics': 0.5, 'RINS': 10}},
+    {'name': 'balanced', 'params': {'MIPFocus': 0, 'Presolve': 2}},
+    {'name': 'optimality', 'params': {'MIPFocus': 2, 'Method': 2}},
+    {'name': 'no_symmetry', 'params': {'MIPFocus': 1, 'Symmetry': 2, 'Presolve': 2}},
+]
+
+DONE_MARKER = 'done'
+POLL_INTERVAL = 2.0  # Seconds between checks of the shared race directory
+
+
+def _write_atomic(path, payload):
+    """Pickle payload to path via a temporary file so readers never see a partial write"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    """Load a pickled race file, returning None if it vanished or is mid-replace"""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _racer(index, data, config, seed, threads, time_limit, target_gap, race_dir):
+    """Process entry point: solve one configured copy of the model and share incumbents"""
+    from gurobipy import GRB
+    from milp_soft import ScheduleOptimizer
+
+    optimizer = ScheduleOptimizer(data=data)
+    optimizer.create_variables()
+    optimizer.add_constraints()
+    optimizer.set_objective()
+    optimizer.greedy_initial_solution()
+
+    model = optimizer.model
+    model.setParam('OutputFlag', 0)
+    model.setParam('Seed', seed)
+    model.setParam('Threads', threads)
+    model.setParam('TimeLimit', time_limit)
+    model.setParam('MIPGap', target_gap)
+    for name, value in config['params'].items():
+        model.setParam(name, value)
+
+    x_vars = list(optimizer.x.values())
+    z_vars = list(optimizer.z.values())
+    # Shared incumbents only carry x and z; y and capacity_violation are derived from them on
+    # injection (as apply_warm_start does), so the injected solution is complete
+    x_index = {key: i for i, key in enumerate(optimizer.x)}
+    z_index = {key: i for i, key in enumerate(optimizer.z)}
+    y_vars = list(optimizer.y.values())
+    y_x = np.array([x_index[student_id, section_id] for student_id, section_id, _ in optimizer.y], dtype=int)
+    y_z = np.array([z_index[section_id, period] for _, section_id, period in optimizer.y], dtype=int)
+    cv_sections = list(optimizer.capacity_violation)
+    cv_vars = list(optimizer.capacity_violation.values())
+    section_index = {section_id: i for i, section_id in enumerate(cv_sections)}
+    x_section = np.array([section_index[section_id] for _, section_id in optimizer.x], dtype=int)
+    capacity = (optimizer.sections.set_index('Section ID')['# of Seats Available']
+                .reindex(cv_sections).fillna(0).to_numpy(dtype=float))
+    own_path = os.path.join(race_dir, f'incumbent_{index}.pkl')
+    state = {'best': float('inf'), 'injected': float('inf'), 'last_done_check': 0.0, 'last_share_check': 0.0}
+
+    def race_callback(model, where):
+        if where == GRB.Callback.MIPSOL:
+            objective = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+            if objective < state['best']:
+                state['best'] = objective
+                x_on = np.flatnonzero(np.asarray(model.cbGetSolution(x_vars)) > 0.5)
+                z_on = np.flatnonzero(np.asarray(model.cbGetSolution(z_vars)) > 0.5)
+                _write_atomic(own_path, {'racer': index, 'objective': objective, 'x_on': x_on, 'z_on': z_on})
+            return
+
+        now = time.time()
+        if where == GRB.Callback.MIP and now - state['last_done_check'] >= POLL_INTERVAL:
+            state['last_done_check'] = now
+            if os.path.exists(os.path.join(race_dir, DONE_MARKER)):
+                model.terminate()
+        elif (where == GRB.Callback.MIPNODE and now - state['last_share_check'] >= POLL_INTERVAL
+              and model.cbGet(GRB.Callback.MIPNODE_STATUS) == GRB.OPTIMAL):
+            state['last_share_check'] = now
+            # Adopt the best incumbent another racer has published, if it beats ours
+            best = None
+            for path in glob.glob(os.path.join(race_dir, 'incumbent_*.pkl')):
+                if path == own_path:
+                    continue
+                shared = _read(path)
+                if shared and shared['objective'] < min(state['best'], state['injected']):
+                    if best is None or shared['objective'] < best['objective']:
+                        best = shared
+            if best is not None:
+                x_values = np.zeros(len(x_vars))
+                x_values[best['x_on']] = 1
+                z_values = np.zeros(len(z_vars))
+                z_values[best['z_on']] = 1
+                enrolled = np.bincount(x_section[best['x_on']], minlength=len(cv_sections))
+                model.cbSetSolution(x_vars, x_values.tolist())
+                model.cbSetSolution(z_vars, z_values.tolist())
+                model.cbSetSolution(y_vars, (x_values[y_x] * z_values[y_z]).tolist())
+                model.cbSetSolution(cv_vars, np.maximum(0, enrolled - capacity).tolist())
+                model.cbUseSolution()
+                state['injected'] = best['objective']
+
+    model.optimize(race_callback)
+
+    result = {
+        'racer': index,
+        'config': config['name'],
+        'params': config['params'],
+        'seed': seed,
+        'threads': threads,
+        'status': model.status,
+        'runtime': model.Runtime,
+        'objective': model.ObjVal if model.SolCount > 0 else None,
+        'bound': model.ObjBound if model.SolCount > 0 else None,
+        'gap': model.MIPGap if model.SolCount > 0 else None,
+        'solution': optimizer.extract_solution() if model.SolCount > 0 else None
+    }
+    # The first racer to prove the target gap claims the win and stops the others
+    if result['gap'] is not None and result['gap'] <= target_gap and model.status == GRB.OPTIMAL:
+        try:
+            fd = os.open(os.path.join(race_dir, DONE_MARKER), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(index))
+        except FileExistsError:
+            pass
+    _write_atomic(os.path.join(race_dir, f'result_{index}.pkl'), result)
+    model.dispose()
+
+
+class SolveRace:
+    """Race several seeds and parameter sets of the same model in separate processes"""
+
+    def __init__(self, data, racers=4, time_limit=25200, target_gap=0.0001,
+                 core_budget=None, configs=None, race_dir=None):
+        self.data = data
+        self.racers = racers
+        self.time_limit = time_limit
+        self.target_gap = target_gap
+        self.core_budget = core_budget or max(1, multiprocessing.cpu_count() - 1)
+        self.configs = configs or RACE_CONFIGS
+        self.race_dir = race_dir
+
+    def run(self):
+        """Launch all racers, wait for the race to finish and return (solution, record)"""
+        if self.race_dir is not None:
+            os.makedirs(self.race_dir, exist_ok=True)
+            return self._run(self.race_dir)
+        # A race directory of our own is removed with everything the racers wrote to it
+        race_dir = tempfile.mkdtemp(prefix='gurobi_race_')
+        try:
+            return self._run(race_dir)
+        finally:
+            shutil.rmtree(race_dir, ignore_errors=True)
+
+    def _run(self, race_dir):
+        for stale in glob.glob(os.path.join(race_dir, '*.pkl')) + glob.glob(os.path.join(race_dir, DONE_MARKER)):
+            os.remove(stale)
+
+        # Split the core budget evenly so racers don't oversubscribe the machine
+        threads = max(1, self.core_budget // self.racers)
+        context = multiprocessing.get_context('spawn')
+        processes = []
+        for index in range(self.racers):
+            config = self.configs[index % len(self.configs)]
+            seed = index * 7919 + 1
+            process = context.Process(
+                target=_racer,
+                args=(index, self.data, config, seed, threads, self.time_limit, self.target_gap, race_dir)
+            )
+            process.start()
+            processes.append(process)
+            logger.info(f"Racer {index}: config={config['name']} seed={seed} threads={threads}")
+
+        # Give racers a grace period beyond the time limit to write their results
+        deadline = time.time() + self.time_limit + 300
+        for process in processes:
+            process.join(max(0, deadline - time.time()))
+            if process.is_alive():
+                logger.warning(f"Racer process {process.pid} did not finish; terminating")
+                process.terminate()
+                process.join()
+
+        results = [r for r in (_read(p) for p in glob.glob(os.path.join(race_dir, 'result_*.pkl'))) if r]
+        finished = [r for r in results if r['solution'] is not None]
+        if not finished:
+            raise RuntimeError("No racer produced a solution")
+
+        winner_marker = os.path.join(race_dir, DONE_MARKER)
+        winner_index = None
+        if os.path.exists(winner_marker):
+            with open(winner_marker) as f:
+                winner_index = int(f.read().strip())
+        winner = next((r for r in finished if r['racer'] == winner_index), None)
+        if winner is None:
+            winner = min(finished, key=lambda r: (r['objective'], r['gap']))
+
+        record = {
+            'winner': {k: winner[k] for k in ('racer', 'config', 'params', 'seed', 'objective', 'bound', 'gap', 'runtime')},
+            'proved_target_gap': winner_index is not None,
+            'racers': [{k: r[k] for k in ('racer', 'config', 'seed', 'threads', 'status', 'objective', 'gap', 'runtime')}
+                       for r in sorted(results, key=lambda r: r['racer'])]
+        }
+        logger.info(f"Race won by racer {winner['racer']} ({winner['config']}, seed {winner['seed']}) "
+                    f"with objective {winner['objective']} and gap {winner['gap']:.4%}")
+        return winner['solution'], record
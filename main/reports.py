@@ -0,0 +1,12 @@
+# Standard library imports
+import os
+import json
+
+
+def write_json_report(name, payload, output_dir='output'):
+    """Write a run report as <output_dir>/<name>.json next to the schedule outputs and return its path"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'{name}.json')
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    return path
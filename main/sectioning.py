@@ -0,0 +1,146 @@
+# Standard library imports
+import logging
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+def match_periods(options):
+    """Match each course to a distinct period (Kuhn's augmenting paths)
+
+    options[i] lists the candidate periods of course i in order of preference.
+    Returns the chosen period per course, or None where no period is left.
+    """
+    owner = {}
+
+    def augment(course, seen):
+        for period in options[course]:
+            if period in seen:
+                continue
+            seen.add(period)
+            if period not in owner or augment(owner[period], seen):
+                owner[period] = course
+                return True
+        return False
+
+    # Place the most constrained courses first so preferences survive augmentation
+    for course in sorted(range(len(options)), key=lambda i: len(options[i])):
+        augment(course, set())
+
+    chosen = [None] * len(options)
+    for period, course in owner.items():
+        chosen[course] = period
+    return chosen
+
+
+def hall_violator(options):
+    """Find courses that cannot all get distinct periods, or None if a full matching exists
+
+    Returns (courses, periods) where the courses together can only use the given periods
+    and there are fewer periods than courses (the set violating Hall's condition).
+    """
+    chosen = match_periods(options)
+    if None not in chosen:
+        return None
+    owner = {period: course for course, period in enumerate(chosen) if period is not None}
+    # Everything reachable from an unmatched course by alternating paths is stuck together
+    start = chosen.index(None)
+    courses, periods, frontier = {start}, set(), [start]
+    while frontier:
+        course = frontier.pop()
+        for period in options[course]:
+            if period not in periods:
+                periods.add(period)
+                if owner.get(period) is not None and owner[period] not in courses:
+                    courses.add(owner[period])
+                    frontier.append(owner[period])
+    return sorted(courses), periods
+
+
+class Sectioner:
+    """Seat students into sections for a fixed master schedule"""
+
+    def __init__(self, sections, schedule):
+        self.capacity = dict(zip(sections['Section ID'], sections['# of Seats Available']))
+        self.course_of = dict(zip(sections['Section ID'], sections['Course ID']))
+        self.schedule = schedule
+        self.enrolled = defaultdict(int)
+        # course -> period -> sections of that course meeting in that period
+        self.offered = defaultdict(lambda: defaultdict(list))
+        for section_id, period in schedule.items():
+            if section_id in self.course_of:
+                self.offered[self.course_of[section_id]][period].append(section_id)
+        # student -> period -> section
+        self.timetable = defaultdict(dict)
+        self.unplaced = []
+
+    def remaining(self, section_id):
+        """Free seats left in a section (negative when over capacity)"""
+        return self.capacity[section_id] - self.enrolled[section_id]
+
+    def _best_section(self, course_id, period):
+        return max(self.offered[course_id][period], key=self.remaining)
+
+    def place(self, student_id, courses, blocked=()):
+        """Seat one student in every requested course at distinct periods where possible"""
+        options = []
+        for course_id in courses:
+            periods = [p for p in self.offered.get(course_id, {}) if p not in blocked]
+            # Prefer periods with the most free seats in the course
+            periods.sort(key=lambda p: -self.remaining(self._best_section(course_id, p)))
+            options.append(periods)
+
+        for course_id, period in zip(courses, match_periods(options)):
+            if period is None:
+                self.unplaced.append((student_id, course_id))
+                continue
+            section_id = self._best_section(course_id, period)
+            self.enrolled[section_id] += 1
+            self.timetable[student_id][period] = section_id
+
+    def rebalance(self):
+        """Move students out of over-full sections into free seats of the same course"""
+        moved = 0
+        by_section = defaultdict(list)
+        for student_id, periods in self.timetable.items():
+            for period, section_id in periods.items():
+                by_section[section_id].append((student_id, period))
+
+        for section_id in [s for s in list(by_section) if self.remaining(s) < 0]:
+            course_id = self.course_of[section_id]
+            for student_id, period in list(by_section[section_id]):
+                if self.remaining(section_id) >= 0:
+                    break
+                busy = self.timetable[student_id]
+                # Same-period sections never create a clash; other periods must be free for the student
+                targets = [(p, s) for p, sections in self.offered[course_id].items() for s in sections
+                           if s != section_id and self.remaining(s) > 0 and (p == period or p not in busy)]
+                if not targets:
+                    continue
+                new_period, target = max(targets, key=lambda t: (t[0] == period, self.remaining(t[1])))
+                del busy[period]
+                busy[new_period] = target
+                self.enrolled[section_id] -= 1
+                self.enrolled[target] += 1
+                by_section[target].append((student_id, new_period))
+                moved += 1
+        return moved
+
+    def total_overage(self):
+        """Students seated beyond capacity across all sections"""
+        return sum(max(0, -self.remaining(s)) for s in self.capacity)
+
+    def solution(self):
+        """Columnar solution in the layout produced by ScheduleOptimizer.extract_solution"""
+        assigned = [(student_id, section_id) for student_id, periods in self.timetable.items()
+                    for section_id in periods.values()]
+        return {
+            'schedule': {
+                'Section ID': list(self.schedule.keys()),
+                'Period': list(self.schedule.values())
+            },
+            'assignments': {
+                'Student ID': [student_id for student_id, _ in assigned],
+                'Section ID': [section_id for _, section_id in assigned]
+            }
+        }
@@ -0,0 +1,216 @@
+# Standard library imports
+import time
+import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Third-party imports
+import pandas as pd
+
+# Local imports
+from sectioning import match_periods
+
+logger = logging.getLogger(__name__)
+
+
+def _solve_shard(index, subdata, blocked_teachers, time_limit, threads):
+    """Worker entry point: solve one shard's MILP with its share of the shared teachers' periods"""
+    from milp_soft import ScheduleOptimizer
+
+    optimizer = ScheduleOptimizer(data=subdata)
+    optimizer.create_variables()
+    optimizer.add_constraints()
+    optimizer.set_objective()
+    optimizer.greedy_initial_solution()
+    model = optimizer.model
+    model.setParam('OutputFlag', 0)
+    model.setParam('TimeLimit', time_limit)
+    model.setParam('Threads', threads)
+
+    # Shared teachers may only use the periods allotted to this shard
+    for (section_id, period), z_var in optimizer.z.items():
+        if period in blocked_teachers.get(optimizer.section_to_teacher.get(section_id), ()):
+            z_var.ub = 0
+
+    model.optimize()
+    result = {
+        'shard': index,
+        'status': model.status,
+        'objective': model.ObjVal if model.SolCount > 0 else None,
+        'gap': model.MIPGap if model.SolCount > 0 else None,
+        'runtime': model.Runtime,
+        'solution': optimizer.extract_solution() if model.SolCount > 0 else None
+    }
+    model.dispose()
+    return result
+
+
+class ShardAnalyzer:
+    """Split an instance into groups of courses that no student links together"""
+
+    def __init__(self, data, periods, course_period_restrictions):
+        self.data = data
+        self.periods = periods
+        self.course_period_restrictions = course_period_restrictions
+        self.sections = data['sections']
+
+        prefs = data['student_preferences'].drop_duplicates('Student ID')
+        prefs = prefs[prefs['Student ID'].isin(data['students']['Student ID'])]
+        offered = set(self.sections['Course ID'])
+        self.student_courses = {
+            student_id: [c for c in dict.fromkeys(str(courses).split(';')) if c in offered]
+            for student_id, courses in zip(prefs['Student ID'], prefs['Preferred Sections'])
+        }
+
+    def components(self):
+        """Course components of the student-course graph (union-find over co-requests)"""
+        parent = {course: course for course in self.sections['Course ID'].unique()}
+
+        def find(course):
+            while parent[course] != course:
+                parent[course] = parent[parent[course]]
+                course = parent[course]
+            return course
+
+        for courses in self.student_courses.values():
+            for course in courses[1:]:
+                parent[find(course)] = find(courses[0])
+        groups = defaultdict(set)
+        for course in parent:
+            groups[find(course)].add(course)
+        return list(groups.values())
+
+    def shards(self, max_shards):
+        """Pack components into at most max_shards balanced groups of courses"""
+        section_counts = self.sections.groupby('Course ID').size()
+        students_per_course = defaultdict(int)
+        for courses in self.student_courses.values():
+            for course in courses:
+                students_per_course[course] += 1
+
+        def weight(component):
+            return sum(students_per_course[c] for c in component) + sum(section_counts.get(c, 0) for c in component)
+
+        components = sorted(self.components(), key=weight, reverse=True)
+        bins = [set() for _ in range(max(1, min(max_shards, len(components))))]
+        loads = [0] * len(bins)
+        # Largest component first into the lightest shard
+        for component in components:
+            target = loads.index(min(loads))
+            bins[target] |= component
+            loads[target] += weight(component)
+        return [b for b in bins if b]
+
+    def allot_shared_periods(self, shards):
+        """Give each shard a disjoint set of periods for every teacher it shares with another shard"""
+        shard_of_course = {course: index for index, courses in enumerate(shards) for course in courses}
+        teacher_shards = defaultdict(set)
+        for teacher_id, course_id in zip(self.sections['Teacher Assigned'], self.sections['Course ID']):
+            teacher_shards[teacher_id].add(shard_of_course[course_id])
+        shared = {t for t, s in teacher_shards.items() if len(s) > 1}
+
+        blocked = defaultdict(dict)
+        overloaded = []
+        for teacher_id in shared:
+            rows = self.sections[self.sections['Teacher Assigned'] == teacher_id]
+            owners = [shard_of_course[c] for c in rows['Course ID']]
+            options = [self.course_period_restrictions.get(c, self.periods) for c in rows['Course ID']]
+            chosen = match_periods(options)
+            allotment = defaultdict(set)
+            for owner, period, allowed in zip(owners, chosen, options):
+                if period is None:
+                    # More sections than periods: this teacher will clash whatever we do
+                    overloaded.append(teacher_id)
+                    allotment[owner].update(allowed)
+                else:
+                    allotment[owner].add(period)
+            # Periods nobody needs go to the shard with the most of this teacher's sections
+            spare = set(self.periods) - set().union(*allotment.values())
+            busiest = max(set(owners), key=owners.count)
+            allotment[busiest] |= spare
+            for shard in set(owners):
+                blocked[shard][teacher_id] = set(self.periods) - allotment[shard]
+        return shared, blocked, sorted(set(overloaded))
+
+    def subdata(self, courses):
+        """Data dict restricted to one shard's courses and the students requesting them"""
+        data = self.data
+        students = [s for s, c in self.student_courses.items() if c and c[0] in courses]
+        sections = self.sections[self.sections['Course ID'].isin(courses)]
+        return {
+            'students': data['students'][data['students']['Student ID'].isin(students)],
+            'student_preferences': data['student_preferences'][data['student_preferences']['Student ID'].isin(students)],
+            'teachers': data['teachers'][data['teachers']['Teacher ID'].isin(sections['Teacher Assigned'])],
+            'sections': sections,
+            'teacher_unavailability': data['teacher_unavailability'],
+            'periods': data.get('periods')
+        }
+
+
+class ShardedSolver:
+    """Solve independent or weakly coupled parts of an instance in parallel and merge the results"""
+
+    def __init__(self, optimizer, workers=None, time_limit=3600):
+        self.optimizer = optimizer
+        self.workers = workers or max(1, min(4, multiprocessing.cpu_count() // 2))
+        self.threads = max(1, multiprocessing.cpu_count() // self.workers)
+        self.time_limit = time_limit
+        self.analyzer = ShardAnalyzer(optimizer.data, optimizer.periods, optimizer.course_period_restrictions)
+
+    def run(self):
+        """Return (merged solution, report)"""
+        started = time.time()
+        components = self.analyzer.components()
+        shards = self.analyzer.shards(self.workers)
+        shared, blocked, overloaded = self.analyzer.allot_shared_periods(shards)
+        logger.info(f"Instance splits into {len(components)} independent course components, packed into "
+                    f"{len(shards)} shards; {len(shared)} teachers are shared between shards")
+        if overloaded:
+            logger.warning(f"Teachers with more sections than periods: {overloaded}")
+
+        results = []
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            futures = [pool.submit(_solve_shard, index, self.analyzer.subdata(courses),
+                                   blocked.get(index, {}), self.time_limit, self.threads)
+                       for index, courses in enumerate(shards)]
+            for future in as_completed(futures):
+                result = future.result()
+                logger.info(f"Shard {result['shard']} finished: status {result['status']}, "
+                            f"objective {result['objective']} in {result['runtime']:.1f}s")
+                results.append(result)
+
+        missing = [r['shard'] for r in results if r['solution'] is None]
+        if missing:
+            raise RuntimeError(f"Shards {missing} produced no solution")
+
+        solution = {
+            'schedule': {column: [v for r in results for v in r['solution']['schedule'][column]]
+                         for column in ('Section ID', 'Period')},
+            'assignments': {column: [v for r in results for v in r['solution']['assignments'][column]]
+                            for column in ('Student ID', 'Section ID')}
+        }
+        clashes = self.teacher_clashes(solution)
+        if clashes:
+            logger.warning(f"Merged schedule double-books {clashes} teacher periods")
+
+        report = {
+            'mode': 'sharded',
+            'objective': int(self.optimizer.section_overages(solution).sum()),
+            'components': len(components),
+            'shards': [{'shard': r['shard'], 'courses': sorted(shards[r['shard']]), 'status': r['status'],
+                        'objective': r['objective'], 'gap': r['gap'], 'runtime': r['runtime']}
+                       for r in sorted(results, key=lambda r: r['shard'])],
+            'shared_teachers': sorted(shared),
+            'teacher_clashes': clashes,
+            'runtime_seconds': time.time() - started
+        }
+        return solution, report
+
+    def teacher_clashes(self, solution):
+        """Count teacher/period pairs used by more than one section in a merged schedule"""
+        schedule = pd.DataFrame(solution['schedule'])
+        schedule['Teacher ID'] = schedule['Section ID'].map(self.optimizer.section_to_teacher)
+        counts = schedule.groupby(['Teacher ID', 'Period']).size()
+        return int((counts > 1).sum())
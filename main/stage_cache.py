@@ -0,0 +1,160 @@
+# Standard library imports
+import os
+import copy
+import gzip
+import json
+import time
+import pickle
+import hashlib
+import logging
+from collections import OrderedDict
+
+# Third-party imports
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Recently used results kept in memory by long-lived processes (see solver_service.py)
+_memory = OrderedDict()
+
+
+def value_hash(value):
+    """Content hash of a stage input: DataFrames by their cells, containers recursively"""
+    digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(json.dumps(list(map(str, value.columns))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).values.tobytes())
+    elif isinstance(value, dict):
+        for name in sorted(value, key=str):
+            digest.update(str(name).encode())
+            digest.update(value_hash(value[name]).encode())
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            digest.update(value_hash(item).encode())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def file_hash(path):
+    """Content hash of a file, or of its absence"""
+    digest = hashlib.sha256()
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    else:
+        digest.update(b'missing')
+    return digest.hexdigest()
+
+
+class StageCache:
+    """Content-addressed results of pipeline stages, kept under a size limit with LRU eviction
+
+    A stage's key hashes its inputs, its configuration and the source of the modules that
+    compute it. Downstream stages take upstream keys as inputs, so a changed input file only
+    misses the stages that depend on it. Entries are gzipped pickles; a hit refreshes the
+    entry's mtime, and the least recently used entries go first once the store is too big.
+    With memory_items set, the most recent entries are also kept in memory for the life of the
+    process (shared by every StageCache in it) and handed out as copies.
+    """
+
+    def __init__(self, directory=None, max_mb=None, memory_items=None):
+        self.directory = directory or os.environ.get('SCHEDULER_STAGE_CACHE', os.path.join('cache', 'stages'))
+        self.max_bytes = int(float(max_mb or os.environ.get('SCHEDULER_STAGE_CACHE_MB', 512)) * 1024 * 1024)
+        self.memory_items = int(memory_items if memory_items is not None
+                                else os.environ.get('SCHEDULER_STAGE_CACHE_MEMORY', 0))
+        self.hits = {}
+        self.misses = {}
+
+    def key(self, stage, inputs, config=None, code=()):
+        """Key for one stage run; `code` lists module paths (relative to main/) whose source counts"""
+        digest = hashlib.sha256(stage.encode())
+        digest.update(value_hash(inputs).encode())
+        digest.update(json.dumps(config or {}, sort_keys=True, default=str).encode())
+        for module in code:
+            digest.update(file_hash(module if os.path.isabs(module) else os.path.join(HERE, module)).encode())
+        return f"{stage}-{digest.hexdigest()[:32]}"
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl.gz')
+
+    def get(self, key):
+        """Return (True, value) on a hit and (False, None) on a miss"""
+        if key in _memory:
+            _memory.move_to_end(key)
+            return True, copy.deepcopy(_memory[key])
+        path = self.path(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            logger.warning(f"Ignoring unreadable stage cache entry {key}: {str(e)}")
+            return False, None
+        os.utime(path)
+        self.remember(key, value)
+        return True, value
+
+    def remember(self, key, value):
+        if self.memory_items > 0:
+            _memory[key] = copy.deepcopy(value)
+            _memory.move_to_end(key)
+            while len(_memory) > self.memory_items:
+                _memory.popitem(last=False)
+
+    def put(self, key, value):
+        self.remember(key, value)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path(key) + f'.{os.getpid()}.tmp'
+        with gzip.open(tmp_path, 'wb', compresslevel=3) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path(key))
+        self.prune()
+
+    def cached(self, stage, key, compute):
+        """Return the stored result for `key`, or compute, store and return it"""
+        hit, value = self.get(key)
+        if hit:
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            logger.info(f"Stage {stage}: reusing cached result {key}")
+            return value
+        self.misses[stage] = self.misses.get(stage, 0) + 1
+        started = time.time()
+        value = compute()
+        try:
+            self.put(key, value)
+        except (OSError, pickle.PicklingError) as e:
+            # A result that cannot be stored only costs the next run a recompute
+            logger.warning(f"Could not cache stage {stage}: {str(e)}")
+        logger.info(f"Stage {stage}: computed in {time.time() - started:.2f}s and cached as {key}")
+        return value
+
+    def prune(self):
+        """Evict least recently used entries until the store fits its size limit"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl.gz'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def summary(self):
+        """Hits and misses per stage for run reports"""
+        stages = sorted(set(self.hits) | set(self.misses))
+        return {stage: {'hits': self.hits.get(stage, 0), 'misses': self.misses.get(stage, 0)} for stage in stages}
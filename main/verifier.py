@@ -0,0 +1,265 @@
+# Standard library imports
+import os
+import time
+import logging
+import argparse
+
+# Third-party imports
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ['R1', 'R2', 'R3', 'R4', 'G1', 'G2', 'G3', 'G4']
+COURSE_PERIOD_RESTRICTIONS = {
+    'Medical Career': ['R1', 'G1'],
+    'Heroes Teach': ['R2', 'G2']
+}
+
+HARD_RULES = ['Missed Requests', 'Unscheduled Sections', 'Sections Scheduled More Than Once',
+              'Period Restriction Violations', 'Student Period Conflicts', 'Teacher Period Conflicts',
+              'Teacher Unavailability Conflicts', 'Duplicate Course Assignments', 'Unknown Schedule Rows',
+              'Unknown Assignment Rows']
+SOFT_RULES = ['Sections Over Capacity', 'SPED Limit Violations', 'Teacher Overloads', 'Unrequested Assignments']
+
+
+# Constraint_Violations.csv columns, in the order the solver has always written them
+VIOLATION_COLUMNS = ['Metric', 'Count', 'Total', 'Percentage', 'Satisfaction_Rate', 'Total_Sections',
+                     'Total_Overages', 'Status']
+
+
+def _codes(values, categories):
+    """Integer codes of values within categories (-1 where unknown)"""
+    return pd.Index(categories).get_indexer(pd.Index(values)).astype(np.int64)
+
+
+def _percent(count, total):
+    return f"{count / total * 100:.2f}%" if total else "0.00%"
+
+
+class ScheduleVerifier:
+    """Check a finished schedule against the inputs, independently of how it was produced
+
+    Every rule is a join on integer codes followed by a bincount, so a district-sized schedule
+    is verified in milliseconds. Hard rules: every request seated, one period per section,
+    periods inside the course restrictions, no student or teacher in two places at once,
+    teachers only in periods they are available. Soft rules: seats, SPED students per section
+    and sections per teacher.
+    """
+
+    def __init__(self, sections, students, student_preferences, teacher_unavailability=None,
+                 periods=None, course_period_restrictions=None, max_sped_per_section=12,
+                 max_teacher_sections=6):
+        self.sections = sections.drop_duplicates('Section ID').reset_index(drop=True)
+        self.students = students
+        self.student_preferences = student_preferences
+        self.teacher_unavailability = teacher_unavailability
+        self.periods = list(periods or PERIODS)
+        self.course_period_restrictions = (COURSE_PERIOD_RESTRICTIONS if course_period_restrictions is None
+                                           else course_period_restrictions)
+        self.max_sped_per_section = max_sped_per_section
+        self.max_teacher_sections = max_teacher_sections
+
+        self.section_ids = self.sections['Section ID'].to_numpy()
+        self.student_ids = students['Student ID'].drop_duplicates().to_numpy()
+        self.course_ids = np.unique(self.sections['Course ID'].astype(str))
+        self.section_course = _codes(self.sections['Course ID'].astype(str), self.course_ids)
+        self.capacity = self.sections['# of Seats Available'].to_numpy(dtype=np.int64)
+
+    def requests(self):
+        """(student code, course code) for every distinct request of a known student"""
+        prefs = self.student_preferences.drop_duplicates('Student ID')
+        prefs = prefs[prefs['Student ID'].isin(self.student_ids)]
+        pairs = prefs.assign(course=prefs['Preferred Sections'].astype(str).str.split(';')).explode('course')
+        student = _codes(pairs['Student ID'], self.student_ids)
+        # Courses nobody offers still count as requests; they can only be missed
+        courses = np.union1d(self.course_ids, pairs['course'].unique().astype(str))
+        course = _codes(pairs['course'].astype(str), courses)
+        keys = np.unique(student * len(courses) + course)
+        return keys // len(courses), keys % len(courses), courses
+
+    def verify(self, schedule, assignments, teacher_schedule=None):
+        """Verify the schedule tables and return every metric with its offending rows"""
+        started = time.perf_counter()
+        n_sections, n_periods = len(self.section_ids), len(self.periods)
+        issues = {}
+
+        # Sections: exactly one period each, inside the course's restriction
+        section = _codes(schedule['Section ID'], self.section_ids)
+        period = _codes(schedule['Period'], self.periods)
+        known = (section >= 0) & (period >= 0)
+        times_scheduled = np.bincount(section[known], minlength=n_sections)
+        issues['Unscheduled Sections'] = self.section_ids[times_scheduled == 0].tolist()
+        issues['Sections Scheduled More Than Once'] = self.section_ids[times_scheduled > 1].tolist()
+        issues['Unknown Schedule Rows'] = schedule.loc[~known, ['Section ID', 'Period']].values.tolist()
+        section_period = np.full(n_sections, -1, dtype=np.int64)
+        section_period[section[known]] = period[known]
+
+        allowed = np.ones((len(self.course_ids), n_periods), dtype=bool)
+        for course_id, periods in self.course_period_restrictions.items():
+            course = np.searchsorted(self.course_ids, course_id)
+            if course < len(self.course_ids) and self.course_ids[course] == course_id:
+                allowed[course] = np.isin(self.periods, periods)
+        scheduled = section_period >= 0
+        restricted = scheduled.copy()
+        restricted[scheduled] = ~allowed[self.section_course[scheduled], section_period[scheduled]]
+        issues['Period Restriction Violations'] = [
+            [s, self.periods[p]] for s, p in zip(self.section_ids[restricted], section_period[restricted])]
+
+        # Students: requests seated, one course section each, no two sections in a period
+        student = _codes(assignments['Student ID'], self.student_ids)
+        seat = _codes(assignments['Section ID'], self.section_ids)
+        valid = (student >= 0) & (seat >= 0)
+        issues['Unknown Assignment Rows'] = assignments.loc[~valid, ['Student ID', 'Section ID']].values.tolist()
+        student, seat = student[valid], seat[valid]
+        pairs = np.unique(student * n_sections + seat)
+        student, seat = pairs // n_sections, pairs % n_sections
+
+        request_student, request_course, courses = self.requests()
+        n_courses = len(courses)
+        # Map the verifier's section course codes into the request course space
+        seat_course = np.searchsorted(courses, self.course_ids)[self.section_course[seat]]
+        taken = student * n_courses + seat_course
+        requested = request_student * n_courses + request_course
+        missed = ~np.isin(requested, taken)
+        issues['Missed Requests'] = [[self.student_ids[s], courses[c]]
+                                     for s, c in zip(request_student[missed], request_course[missed])]
+        course_counts = np.bincount(taken, minlength=len(self.student_ids) * n_courses)
+        doubled = np.flatnonzero(course_counts > 1)
+        issues['Duplicate Course Assignments'] = [[self.student_ids[k // n_courses], courses[k % n_courses]]
+                                                  for k in doubled]
+        extra = ~np.isin(taken, requested)
+        issues['Unrequested Assignments'] = [[self.student_ids[s], self.section_ids[j]]
+                                             for s, j in zip(student[extra], seat[extra])]
+
+        seated = section_period[seat] >= 0
+        slot = student[seated] * n_periods + section_period[seat][seated]
+        slot_counts = np.bincount(slot, minlength=len(self.student_ids) * n_periods)
+        clashes = np.flatnonzero(slot_counts > 1)
+        issues['Student Period Conflicts'] = [[self.student_ids[k // n_periods], self.periods[k % n_periods]]
+                                              for k in clashes]
+
+        # Seats and SPED students per section
+        enrolled = np.bincount(seat, minlength=n_sections)
+        overage = np.clip(enrolled - self.capacity, 0, None)
+        issues['Sections Over Capacity'] = self.section_ids[overage > 0].tolist()
+        sped_flags = self.students.drop_duplicates('Student ID').set_index('Student ID')['SPED']
+        is_sped = sped_flags.reindex(self.student_ids).isin([1, '1', 'Yes']).to_numpy()
+        sped = np.bincount(seat[is_sped[student]], minlength=n_sections)
+        issues['SPED Limit Violations'] = self.section_ids[sped > self.max_sped_per_section].tolist()
+
+        # Teachers: from the teacher schedule if given, else from the sections' assigned teachers
+        if teacher_schedule is None:
+            teaching = pd.DataFrame({'Teacher ID': self.sections['Teacher Assigned'].to_numpy()[scheduled],
+                                     'Section ID': self.section_ids[scheduled],
+                                     'Period': np.asarray(self.periods, dtype=object)[section_period[scheduled]]})
+        else:
+            teaching = teacher_schedule
+        teacher_ids = np.unique(teaching['Teacher ID'].astype(str))
+        teacher = _codes(teaching['Teacher ID'].astype(str), teacher_ids)
+        teacher_period = _codes(teaching['Period'], self.periods)
+        ok = teacher_period >= 0
+        teacher_slot = teacher[ok] * n_periods + teacher_period[ok]
+        teacher_counts = np.bincount(teacher_slot, minlength=len(teacher_ids) * n_periods)
+        issues['Teacher Period Conflicts'] = [[teacher_ids[k // n_periods], self.periods[k % n_periods]]
+                                              for k in np.flatnonzero(teacher_counts > 1)]
+        loads = np.bincount(teacher, minlength=len(teacher_ids))
+        issues['Teacher Overloads'] = teacher_ids[loads > self.max_teacher_sections].tolist()
+
+        unavailable = np.zeros(len(teacher_ids) * n_periods, dtype=bool)
+        if self.teacher_unavailability is not None and not self.teacher_unavailability.empty:
+            blocked = self.teacher_unavailability.dropna(subset=['Unavailable Periods'])
+            blocked = blocked.assign(Period=blocked['Unavailable Periods'].astype(str).str.split(',')).explode('Period')
+            blocked_teacher = _codes(blocked['Teacher ID'].astype(str), teacher_ids)
+            blocked_period = _codes(blocked['Period'].str.strip(), self.periods)
+            keep = (blocked_teacher >= 0) & (blocked_period >= 0)
+            unavailable[blocked_teacher[keep] * n_periods + blocked_period[keep]] = True
+        conflicted = unavailable[teacher_slot]
+        rows = teaching[ok][conflicted]
+        issues['Teacher Unavailability Conflicts'] = rows[['Teacher ID', 'Section ID', 'Period']].values.tolist()
+
+        return {
+            'issues': issues,
+            'total_requests': int(len(requested)),
+            'satisfied_requests': int(len(requested) - missed.sum()),
+            'total_sections': n_sections,
+            'total_overages': int(overage.sum()),
+            'runtime_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+
+def violation_rows(report):
+    """Constraint_Violations.csv rows for a verification report"""
+    issues = report['issues']
+    total = report['total_requests']
+    satisfied = report['satisfied_requests']
+    sections = report['total_sections']
+    missed = len(issues['Missed Requests'])
+    over = len(issues['Sections Over Capacity'])
+    hard = sum(len(issues[name]) for name in HARD_RULES)
+
+    rows = [
+        {'Metric': 'Missed Requests', 'Count': missed, 'Total': total, 'Percentage': _percent(missed, total),
+         'Satisfaction_Rate': _percent(satisfied, total)},
+        {'Metric': 'Sections Over Capacity', 'Count': over, 'Total_Sections': sections,
+         'Percentage': _percent(over, sections), 'Total_Overages': report['total_overages']},
+        {'Metric': 'Overall Satisfaction', 'Count': satisfied, 'Total': total,
+         'Percentage': _percent(satisfied, total),
+         'Status': 'Perfect' if satisfied == total and not hard else
+                   ('Hard Rule Violations' if hard else 'Incomplete')}
+    ]
+    for name in HARD_RULES + SOFT_RULES:
+        if name in ('Missed Requests', 'Sections Over Capacity'):
+            continue
+        count = len(issues[name])
+        rows.append({'Metric': name, 'Count': count,
+                     'Status': 'OK' if count == 0 else ('Violated' if name in HARD_RULES else 'Warning')})
+    return pd.DataFrame(rows, columns=VIOLATION_COLUMNS)
+
+
+def write_violations(report, output_dir='output'):
+    """Write Constraint_Violations.csv for a verification report"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, 'Constraint_Violations.csv')
+    violation_rows(report).to_csv(path, index=False)
+    return path
+
+
+def verify_outputs(input_dir='input', output_dir='output', write=True):
+    """Verify the schedule CSVs in output_dir against the inputs in input_dir"""
+    def read(directory, name, columns=None):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            return None if columns is None else pd.DataFrame(columns=columns)
+        try:
+            return pd.read_csv(path)
+        except pd.errors.EmptyDataError:
+            return None if columns is None else pd.DataFrame(columns=columns)
+
+    verifier = ScheduleVerifier(
+        read(input_dir, 'Sections_Information.csv'), read(input_dir, 'Student_Info.csv'),
+        read(input_dir, 'Student_Preference_Info.csv'),
+        read(input_dir, 'Teacher_unavailability.csv', ['Teacher ID', 'Unavailable Periods']))
+    report = verifier.verify(read(output_dir, 'Master_Schedule.csv', ['Section ID', 'Period']),
+                             read(output_dir, 'Student_Assignments.csv', ['Student ID', 'Section ID']),
+                             read(output_dir, 'Teacher_Schedule.csv'))
+    if write:
+        report['path'] = write_violations(report, output_dir)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Verify the schedule in output/ against the inputs')
+    parser.add_argument('--input-dir', default='input')
+    parser.add_argument('--output-dir', default='output')
+    parser.add_argument('--show', type=int, default=5, help='Offending rows to print per rule')
+    args = parser.parse_args()
+
+    report = verify_outputs(args.input_dir, args.output_dir)
+    print(f"Verified in {report['runtime_ms']} ms; wrote {report['path']}")
+    print(f"Satisfied {report['satisfied_requests']} of {report['total_requests']} requests")
+    for name in HARD_RULES + SOFT_RULES:
+        found = report['issues'][name]
+        if found:
+            kind = 'hard' if name in HARD_RULES else 'soft'
+            print(f"  {name} ({kind}): {len(found)}; e.g. {found[:args.show]}")
@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from consolidation import PRESERVED_COURSES, SectionConsolidator
+from what_if import WhatIfEvaluator
+from run_store import RunRecorder, RunStore, inputs_hash
+
+# The MILP modules use flat imports from main/
+MAIN_PATH = Path(__file__).parent / 'main'
+
+# Input tables and their files
+INPUT_FILES = {
+    'sections': 'Sections_Information.csv',
+    'students': 'Student_Info.csv',
+    'student_info': 'Student_Info.csv',
+    'student_preferences': 'Student_Preference_Info.csv',
+    'teachers': 'Teacher_Info.csv',
+    'teacher_unavailability': 'Teacher_unavailability.csv',
+    'periods': 'Period.csv'
+}
+
+# Tables the MILP's data loader provides, under its names
+MILP_TABLES = ('students', 'teachers', 'sections', 'periods', 'student_preferences', 'teacher_unavailability')
+
+_startup_seconds = None
+
+# One thread for every run's startup probe; the measurement is taken once and then cached
+_startup_probe = ThreadPoolExecutor(max_workers=1, thread_name_prefix='startup-probe')
+
+
+def startup_seconds() -> float:
+    """Wall-clock cost of a fresh Python process importing the solver stack, measured once"""
+    global _startup_seconds
+    if _startup_seconds is None:
+        started = time.time()
+        subprocess.run([sys.executable, '-c', 'import pandas, numpy, gurobipy'], capture_output=True)
+        _startup_seconds = time.time() - started
+    return _startup_seconds
+
+
+def load_inputs(input_path: Path) -> Dict[str, pd.DataFrame]:
+    """Read the input CSVs once, under the names both the MILP and the section tools use"""
+    students = pd.read_csv(input_path / 'Student_Info.csv')
+    teachers = pd.read_csv(input_path / 'Teacher_Info.csv')
+    try:
+        unavailability = pd.read_csv(input_path / 'Teacher_unavailability.csv')
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        unavailability = pd.DataFrame(columns=['Teacher ID', 'Unavailable Periods'])
+    data = {
+        'students': students,
+        'student_info': students,
+        'teachers': teachers,
+        'teacher_info': teachers,
+        'sections': pd.read_csv(input_path / 'Sections_Information.csv'),
+        'student_preferences': pd.read_csv(input_path / 'Student_Preference_Info.csv'),
+        'teacher_unavailability': unavailability
+    }
+    if (input_path / 'Period.csv').exists():
+        data['periods'] = pd.read_csv(input_path / 'Period.csv')
+    return data
+
+
+class PipelineOrchestrator:
+    """Run consolidation and the MILP in one process, handing data, the live model and solutions between stages
+
+    The inputs are read once, the consolidation plan is applied to the sections in memory and
+    the model is built once. Each further iteration closes sections that are still underused
+    and that the what-if check can empty without conflicts, edits the live model with
+    sync_sections and re-solves from the previous solution. Output files are written once, at
+    the end (checkpoints aside). isolate=True runs the stages as separate processes the way
+    pipeline.py always did, so a crash in one stage cannot take the others down.
+    """
+
+    def __init__(self, base_path: Optional[Path] = None, max_iterations: int = 1, time_limit: float = 25200,
+                 isolate: bool = False, bounds: bool = True, model_cache: bool = True,
+                 stage_cache: bool = True, run_store: Optional[RunStore] = None):
+        self.base_path = Path(base_path or os.getcwd())
+        self.input_path = self.base_path / 'input'
+        self.output_path = self.base_path / 'output'
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+        self.isolate = isolate
+        self.bounds = bounds
+        self.model_cache = model_cache
+        self.use_stage_cache = stage_cache
+        self.stage_cache = None
+        self.startup_probe = None
+        self.run_store = run_store or RunStore()
+        self.timings = {}
+
+    def run(self) -> Dict:
+        """Run the pipeline and return its report (also recorded in the run store)"""
+        kind = 'pipeline' if self.isolate else 'pipeline-in-process'
+        started = time.time()
+        # Measured alongside the run rather than in front of it
+        self.startup_probe = None if self.isolate else _startup_probe.submit(startup_seconds)
+        with self.run_store.run(kind, inputs_hash(self.input_path)) as run:
+            # Repeated stages (solve, sync) are summed
+            self.timings = run.timings
+            report = self._run_isolated(run) if self.isolate else self._run_in_process(run)
+            report['seconds'] = round(time.time() - started, 3)
+            report['stages'] = {stage: round(seconds, 3) for stage, seconds in self.timings.items()}
+            run.finish('ok', report, sections_before=report.get('sections_before'),
+                       sections_after=report.get('sections_after'))
+        return report
+
+    def _cached(self, stage: str, inputs: Dict, config: Dict, code, compute):
+        """Run a stage through the stage cache when it is enabled"""
+        if self.stage_cache is None:
+            return compute()
+        return self.stage_cache.cached(stage, self.stage_cache.key(stage, inputs, config, code), compute)
+
+    def load_stage(self):
+        """Hashes of the input files and the loaded tables (cached; also used to preload a service)"""
+        if str(MAIN_PATH) not in sys.path:
+            sys.path.insert(0, str(MAIN_PATH))
+        from stage_cache import StageCache, file_hash
+        if self.use_stage_cache and self.stage_cache is None:
+            self.stage_cache = StageCache()
+        files = {table: file_hash(self.input_path / filename) for table, filename in INPUT_FILES.items()}
+        return files, self._cached('load', files, {}, (), lambda: load_inputs(self.input_path))
+
+    def _run_in_process(self, run: RunRecorder) -> Dict:
+        if str(MAIN_PATH) not in sys.path:
+            sys.path.insert(0, str(MAIN_PATH))
+        from milp_soft import ScheduleOptimizer
+        from stage_cache import StageCache, value_hash
+        if self.use_stage_cache:
+            self.stage_cache = StageCache()
+
+        # Each stage is keyed by the inputs it reads, so a changed file only reruns what depends on it
+        with run.stage('load'):
+            files, data = self.load_stage()
+
+        with run.stage('consolidation'):
+            consolidator = SectionConsolidator(data)
+            plan = self._cached(
+                'consolidation', {t: files[t] for t in ('sections', 'student_info', 'student_preferences')},
+                {'seat_headroom': consolidator.seat_headroom,
+                 'max_teacher_sections': consolidator.max_teacher_sections,
+                 'max_sped_per_section': consolidator.max_sped_per_section,
+                 'preserved_courses': consolidator.preserved_courses},
+                (str(Path(__file__).parent / 'consolidation.py'),), consolidator.solve)
+            sections = consolidator.apply(plan).reset_index(drop=True)
+        print(f"Consolidation ({plan['status']}, {plan['runtime_seconds']}s): keeping {len(plan['open'])} of "
+              f"{len(data['sections'])} sections")
+
+        milp_data = {name: data[name] for name in MILP_TABLES if name in data}
+        milp_data['sections'] = sections
+        # Keyed by the consolidated sections' content, so re-consolidating to the same sections still hits
+        result = self._cached(
+            'solve', dict({t: files[t] for t in ('students', 'teachers', 'student_preferences',
+                                                 'teacher_unavailability', 'periods')},
+                          sections=value_hash(sections)),
+            {'bounds': self.bounds, 'time_limit': self.time_limit, 'max_iterations': self.max_iterations},
+            ('milp_soft.py', 'greedy.py', 'bounds.py', 'aggregate.py', str(Path(__file__).parent / 'what_if.py')),
+            lambda: self._solve(run, ScheduleOptimizer, milp_data))
+        solution, closed, solves = result['solution'], result['closed'], result['solves']
+        final_sections = result['sections']
+
+        with run.stage('write'):
+            # A cached solve still needs an optimizer for the output tables; it is never built
+            optimizer = ScheduleOptimizer(data=dict(milp_data, sections=final_sections))
+            optimizer.save_solution(solution)
+            self.output_path.mkdir(parents=True, exist_ok=True)
+            with open(self.output_path / 'consolidation_plan.json', 'w') as f:
+                json.dump(plan, f, indent=2)
+            if len(final_sections) != len(data['sections']):
+                sections_file = self.input_path / 'Sections_Information.csv'
+                data['sections'].to_csv(self.input_path / 'Sections_Information.backup.csv', index=False)
+                final_sections[data['sections'].columns].to_csv(sections_file, index=False)
+
+        run.metrics(result['solver'], prefix='solver.')
+        run.actions([{'action': 'remove', 'primary_section': s, 'stage': 'consolidation'} for s in plan['close']]
+                    + [{'action': 'remove', 'primary_section': s, 'stage': 'review'} for s in closed])
+        # A model of the separate-process pipeline, not a measurement: compare with an --isolate run
+        saved = self.estimate_savings(solves)
+        run.metrics(saved, prefix='estimated_saved.')
+        print(f"In-process run saved an estimated {saved['total_seconds']:.1f}s over separate processes "
+              f"({saved['startup_seconds']:.1f}s startup, {saved['reload_seconds']:.1f}s reloads, "
+              f"{saved['rebuild_seconds']:.1f}s rebuilds)")
+        report = {
+            'mode': 'in-process',
+            'solves': solves,
+            'sections_before': len(data['sections']),
+            'sections_after': len(final_sections),
+            'closed_by_review': closed,
+            'solver': result['solver'],
+            'estimated_saved': saved
+        }
+        if self.stage_cache is not None:
+            report['stage_cache'] = self.stage_cache.summary()
+            print("Stage cache: " + ", ".join(f"{stage} {'hit' if counts['hits'] else 'miss'}"
+                                              for stage, counts in report['stage_cache'].items()))
+        return report
+
+    def _solve(self, run: RunRecorder, optimizer_class, milp_data: Dict) -> Dict:
+        """Build, solve and iterate; returns everything the later stages need"""
+        with run.stage('build'):
+            optimizer = optimizer_class(data=milp_data)
+            optimizer.stage_cache = self.stage_cache
+            optimizer.build_model(bounds=self.bounds, cache=self.model_cache)
+
+        with run.stage('solve'):
+            solution = optimizer.solve(time_limit=self.time_limit, save=False)
+        if not solution:
+            raise RuntimeError("The MILP found no solution")
+        solves = 1
+        closed = []
+        reviewed = False
+        for iteration in range(1, self.max_iterations):
+            with run.stage('review'):
+                closable = self.closable_sections(optimizer, solution)
+            reviewed = not closable
+            if not closable:
+                break
+            print(f"Iteration {iteration + 1}: closing {len(closable)} underused sections: {', '.join(closable)}")
+            closed += closable
+            with run.stage('sync'):
+                optimizer.sync_sections(optimizer.sections[~optimizer.sections['Section ID'].isin(closable)])
+            with run.stage('solve'):
+                solution = optimizer.reoptimize(time_limit=self.time_limit, save=False)
+            solves += 1
+
+        if not reviewed:
+            # Capacity check (informational only), on the solution in memory
+            from pipeline import sections_below_capacity
+            sections_below_capacity(optimizer.sections, pd.DataFrame(solution['assignments']))
+
+        model = optimizer.model
+        result = {
+            'solution': solution,
+            'sections': optimizer.sections,
+            'closed': closed,
+            'solves': solves,
+            'solver': {'objective': model.ObjVal, 'mip_gap': model.MIPGap, 'runtime_seconds': model.Runtime,
+                       'nodes': model.NodeCount}
+        }
+        model.dispose()
+        return result
+
+    def closable_sections(self, optimizer, solution: Dict) -> List[str]:
+        """Underused sections whose students all fit elsewhere, at most one per course per round"""
+        from pipeline import sections_below_capacity
+        assignments = pd.DataFrame(solution['assignments'], columns=['Student ID', 'Section ID'])
+        schedule = pd.DataFrame(solution['schedule'], columns=['Section ID', 'Period'])
+        sections = optimizer.sections
+        below = [section_id for section_id, _ in sections_below_capacity(sections, assignments)]
+        preserved = set(sections.loc[sections['Course ID'].isin(PRESERVED_COURSES), 'Section ID'])
+        candidates = [{'action': 'remove', 'primary_section': s} for s in below if s not in preserved]
+        if not candidates:
+            return []
+
+        evaluator = WhatIfEvaluator(sections, schedule, assignments)
+        course_of = dict(zip(sections['Section ID'], sections['Course ID']))
+        closable, courses = [], set()
+        for result in evaluator.evaluate_all(candidates):
+            section_id = result['candidate']['primary_section']
+            if 'error' in result or result['unseated'] or result['conflicts'] or result['added_overage']:
+                continue
+            # Closures are scored one at a time, so two in the same course could collide
+            if course_of[section_id] not in courses:
+                courses.add(course_of[section_id])
+                closable.append(section_id)
+        return closable
+
+    def estimate_savings(self, solves: int) -> Dict[str, float]:
+        """Wall-clock the subprocess pipeline would have spent on top of this run
+
+        That pipeline starts one process for consolidation and then, per solve, one for the
+        MILP and one for schedule_optimizer.py in between; each pays interpreter startup with
+        the solver imports and a full CSV reload, and every re-solve rebuilds the model instead
+        of syncing the edited sections.
+        """
+        processes = 2 * solves
+        startup = processes * self.startup_probe.result()
+        reload = (processes - 1) * self.timings.get('load', 0.0)
+        rebuild = max(0.0, (solves - 1) * self.timings.get('build', 0.0) - self.timings.get('sync', 0.0))
+        # Intermediate outputs written by each MILP process and read back by the next stage
+        io = (solves - 1) * self.timings.get('write', 0.0)
+        return {
+            'startup_seconds': round(startup, 3),
+            'reload_seconds': round(reload, 3),
+            'rebuild_seconds': round(rebuild, 3),
+            'io_seconds': round(io, 3),
+            'total_seconds': round(startup + reload + rebuild + io, 3)
+        }
+
+    def _run_isolated(self, run: RunRecorder) -> Dict:
+        import pipeline
+        with run.stage('consolidation'):
+            pipeline.run_consolidation()
+        with run.stage('solve'):
+            pipeline.run_milpsoft()
+        solves = 1
+        while solves < self.max_iterations and pipeline.check_section_capacity():
+            with run.stage('review'):
+                pipeline.run_schedule_optimizer()
+            with run.stage('solve'):
+                pipeline.run_milpsoft()
+            solves += 1
+        pipeline.record_run_results(run)
+        return {'mode': 'isolated', 'solves': solves}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the scheduling pipeline in one process')
+    parser.add_argument('--iterations', type=int, default=1,
+                        help='Solves at most; later ones close underused sections and re-solve incrementally')
+    parser.add_argument('--time-limit', type=float, default=25200, help='Time limit per solve in seconds')
+    parser.add_argument('--isolate', action='store_true', help='Run each stage in its own process')
+    parser.add_argument('--no-bounds', action='store_true', help='Skip the analytic lower bounds and cuts')
+    parser.add_argument('--no-model-cache', action='store_true', help='Always build the model from scratch')
+    parser.add_argument('--no-stage-cache', action='store_true',
+                        help='Rerun every stage instead of reusing results for unchanged inputs from cache/stages')
+    args = parser.parse_args()
+
+    orchestrator = PipelineOrchestrator(max_iterations=args.iterations, time_limit=args.time_limit,
+                                        isolate=args.isolate, bounds=not args.no_bounds,
+                                        model_cache=not args.no_model_cache,
+                                        stage_cache=not args.no_stage_cache)
+    report = orchestrator.run()
+    print(f"\nPipeline finished in {report['seconds']:.1f}s ({report['mode']}, {report['solves']} solves)")
+    for stage, seconds in report['stages'].items():
+        print(f"  {stage}: {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import subprocess
 import sys
 import os
+import json
 import pandas as pd
 from pathlib import Path
 
@@ -28,69 +29,76 @@ def check_section_capacity():
         # Load data
         student_assignments = pd.read_csv(student_assignments_path)
         sections_info = pd.read_csv(sections_info_path)
-        
-        # Calculate enrollment for each section
-        section_enrollments = student_assignments['Section ID'].value_counts().to_dict()
-        
-        # Track statistics for better reporting
-        utilization_stats = {
-            'very_low': [], # < 50%
-            'low': [],      # 50-65%
-            'medium': [],   # 65-80%
-            'high': [],     # 80-95%
-            'full': []      # >= 95%
-        }
-        
-        # Check section utilization with more nuanced criteria
-        below_capacity_sections = []
-        for _, section in sections_info.iterrows():
-            section_id = section['Section ID']
-            capacity = section['# of Seats Available']
-            enrollment = section_enrollments.get(section_id, 0)
-            utilization = enrollment / capacity if capacity > 0 else 0
-            
-            # Track statistics
-            if utilization < 0.50:
-                utilization_stats['very_low'].append(section_id)
-            elif utilization < 0.65:
-                utilization_stats['low'].append(section_id)
-            elif utilization < 0.80:
-                utilization_stats['medium'].append(section_id)
-            elif utilization < 0.95:
-                utilization_stats['high'].append(section_id)
-            else:
-                utilization_stats['full'].append(section_id)
-                
-            # Size-dependent utilization thresholds - smaller sections should be more full
-            target_utilization = 0.65 if capacity <= 18 else 0.60
-            
-            if utilization < target_utilization:
-                below_capacity_sections.append((section_id, f"{utilization:.2%}"))
-        
-        # Print utilization statistics
-        print(f"\nSection utilization statistics:")
-        print(f"  Very low (<50%): {len(utilization_stats['very_low'])} sections")
-        print(f"  Low (50-65%): {len(utilization_stats['low'])} sections")
-        print(f"  Medium (65-80%): {len(utilization_stats['medium'])} sections")
-        print(f"  High (80-95%): {len(utilization_stats['high'])} sections")
-        print(f"  Full (>=95%): {len(utilization_stats['full'])} sections")
-        
-        if below_capacity_sections:
-            print(f"\nFound {len(below_capacity_sections)} sections below target capacity:")
-            for section_id, util in below_capacity_sections[:5]:  # Show only first 5 to avoid clutter
-                print(f"  - {section_id}: {util} capacity")
-            if len(below_capacity_sections) > 5:
-                print(f"  - ... and {len(below_capacity_sections) - 5} more")
-            return True
-        else:
-            print("\nAll sections are at or above target capacity.")
-            return False
+        return bool(sections_below_capacity(sections_info, student_assignments))
         
     except Exception as e:
         print(f"Error checking section capacity: {str(e)}")
         # If there's an error, assume we need to optimize
         return True
 
+def sections_below_capacity(sections_info, student_assignments):
+    """
+    Print utilization statistics for a schedule held in memory.
+    
+    Returns:
+        list: (Section ID, utilization) for every section below its target utilization
+    """
+    # Calculate enrollment for each section
+    section_enrollments = student_assignments['Section ID'].value_counts().to_dict()
+    
+    # Track statistics for better reporting
+    utilization_stats = {
+        'very_low': [], # < 50%
+        'low': [],      # 50-65%
+        'medium': [],   # 65-80%
+        'high': [],     # 80-95%
+        'full': []      # >= 95%
+    }
+    
+    # Check section utilization with more nuanced criteria
+    below_capacity_sections = []
+    for _, section in sections_info.iterrows():
+        section_id = section['Section ID']
+        capacity = section['# of Seats Available']
+        enrollment = section_enrollments.get(section_id, 0)
+        utilization = enrollment / capacity if capacity > 0 else 0
+        
+        # Track statistics
+        if utilization < 0.50:
+            utilization_stats['very_low'].append(section_id)
+        elif utilization < 0.65:
+            utilization_stats['low'].append(section_id)
+        elif utilization < 0.80:
+            utilization_stats['medium'].append(section_id)
+        elif utilization < 0.95:
+            utilization_stats['high'].append(section_id)
+        else:
+            utilization_stats['full'].append(section_id)
+            
+        # Size-dependent utilization thresholds - smaller sections should be more full
+        target_utilization = 0.65 if capacity <= 18 else 0.60
+        
+        if utilization < target_utilization:
+            below_capacity_sections.append((section_id, f"{utilization:.2%}"))
+    
+    # Print utilization statistics
+    print(f"\nSection utilization statistics:")
+    print(f"  Very low (<50%): {len(utilization_stats['very_low'])} sections")
+    print(f"  Low (50-65%): {len(utilization_stats['low'])} sections")
+    print(f"  Medium (65-80%): {len(utilization_stats['medium'])} sections")
+    print(f"  High (80-95%): {len(utilization_stats['high'])} sections")
+    print(f"  Full (>=95%): {len(utilization_stats['full'])} sections")
+    
+    if below_capacity_sections:
+        print(f"\nFound {len(below_capacity_sections)} sections below target capacity:")
+        for section_id, util in below_capacity_sections[:5]:  # Show only first 5 to avoid clutter
+            print(f"  - {section_id}: {util} capacity")
+        if len(below_capacity_sections) > 5:
+            print(f"  - ... and {len(below_capacity_sections) - 5} more")
+    else:
+        print("\nAll sections are at or above target capacity.")
+    return below_capacity_sections
+
 def run_milpsoft():
     """
     Run the MILPsoft.py optimization script from the main directory.
@@ -117,6 +125,125 @@ def run_schedule_optimizer():
     # Run the script
     subprocess.run([sys.executable, optimizer_path], check=True)
 
+def print_satisfaction_summary():
+    """
+    Print the satisfaction rate and capacity warnings from Constraint_Violations.csv.
+    """
+    constraints_file = os.path.join(os.getcwd(), 'output', 'Constraint_Violations.csv')
+    if os.path.exists(constraints_file):
+        try:
+            constraints_df = pd.read_csv(constraints_file)
+            # Find overall satisfaction row
+            for _, row in constraints_df.iterrows():
+                if 'Metric' in row and row['Metric'] == 'Overall Satisfaction':
+                    print(f"\nFinal satisfaction rate: {row['Percentage']} ({row.get('Status', 'N/A')})")
+                    print(f"Satisfied {int(row['Count'])} out of {int(row['Total'])} course requests")
+                # Find capacity violations
+                elif 'Metric' in row and row['Metric'] == 'Sections Over Capacity':
+                    if 'Count' in row and int(row['Count']) > 0:
+                        print(f"Warning: {int(row['Count'])} sections are over capacity!")
+                # Rule checks added by the schedule verifier
+                elif row.get('Status') == 'Violated':
+                    print(f"Error: {row['Metric']}: {int(row['Count'])}")
+        except Exception as e:
+            print(f"Error reading constraint violations: {str(e)}")
+
+def run_consolidation():
+    """
+    Run consolidation.py to close surplus sections before the schedule solve.
+    """
+    consolidation_path = os.path.join(os.getcwd(), 'consolidation.py')
+    print(f"Running section consolidation from {consolidation_path}...")
+    
+    if not os.path.exists(consolidation_path):
+        raise FileNotFoundError(f"Could not find consolidation.py at {consolidation_path}")
+    
+    # Run the script
+    subprocess.run([sys.executable, consolidation_path], check=True)
+
+def record_run_results(run):
+    """
+    Attach the consolidation plan, solver summary and satisfaction figures of a finished run.
+    """
+    output_dir = os.path.join(os.getcwd(), 'output')
+    plan_file = os.path.join(output_dir, 'consolidation_plan.json')
+    if os.path.exists(plan_file):
+        with open(plan_file, 'r') as f:
+            plan = json.load(f)
+        run.metrics({'runtime_seconds': plan['runtime_seconds'], 'closed': len(plan['close'])},
+                    prefix='consolidation.')
+        run.actions([{'action': 'remove', 'primary_section': section_id} for section_id in plan['close']])
+        run.finish(sections_before=len(plan['open']) + len(plan['close']), sections_after=len(plan['open']))
+
+    summary_file = os.path.join(output_dir, 'solver_summary.json')
+    if os.path.exists(summary_file):
+        with open(summary_file, 'r') as f:
+            run.metrics(json.load(f), prefix='solver.')
+
+    constraints_file = os.path.join(output_dir, 'Constraint_Violations.csv')
+    if os.path.exists(constraints_file):
+        for _, row in pd.read_csv(constraints_file).iterrows():
+            if row.get('Metric') == 'Overall Satisfaction' and row.get('Total', 0) > 0:
+                run.metrics({'satisfaction': row['Count'] / row['Total']})
+            elif row.get('Metric') == 'Sections Over Capacity':
+                run.metrics({'sections_over_capacity': row['Count']})
+
+def run_single_pass_pipeline(isolate=False, iterations=1):
+    """
+    Run the single-pass pipeline:
+    1. Choose the open sections with the consolidation model (seconds)
+    2. Run MILPsoft.py once on the consolidated sections
+    
+    Both stages run in this process and share the loaded data (see orchestrator.py); with
+    isolate=True each runs in its own process as before.
+    """
+    print("\n=== Starting Optimization Pipeline ===\n")
+    
+    try:
+        from orchestrator import PipelineOrchestrator
+        report = PipelineOrchestrator(max_iterations=iterations, isolate=isolate).run()
+        print(f"\nPipeline finished in {report['seconds']:.1f}s ({report['mode']}, {report['solves']} solves)")
+        
+        # Capacity check (informational only); the in-process run already checked its solution
+        if isolate:
+            check_section_capacity()
+        print_satisfaction_summary()
+        
+        print("\nOptimization pipeline completed successfully.")
+        
+    except Exception as e:
+        print(f"\nError in optimization pipeline: {str(e)}")
+        print("Pipeline execution failed.")
+
+def run_service_pipeline(url=None, iterations=1):
+    """
+    Run the single-pass pipeline on a running solver service (see solver_service.py).
+    
+    The service's warm worker runs in this directory, so input/ and output/ change exactly as
+    with a local run, without paying for interpreter startup, imports and license checkout.
+    """
+    from solver_service import SolverClient
+    client = SolverClient(url)
+    if not client.available():
+        raise RuntimeError(f"No solver service at {client.url}; start one with python solver_service.py")
+    
+    print(f"\n=== Submitting Optimization Pipeline to {client.url} ===\n")
+    job_id = client.submit(workspace=os.getcwd(), iterations=iterations)
+    try:
+        for status in client.follow(job_id):
+            for line in status['lines']:
+                print(line)
+    except KeyboardInterrupt:
+        client.cancel(job_id)
+        raise
+    
+    if status['state'] != 'done':
+        print(f"\nError in optimization pipeline: job {job_id} {status['state']} {status['error'] or ''}")
+        print("Pipeline execution failed.")
+        return
+    print_satisfaction_summary()
+    print("\nOptimization pipeline completed successfully.")
+
 def run_optimization_pipeline():
     """
     Run the optimization pipeline:
@@ -208,21 +335,7 @@ def run_optimization_pipeline():
             print("\nAll sections now at or above 60% capacity.")
             
         # Check satisfaction statistics
-        constraints_file = os.path.join(os.getcwd(), 'output', 'Constraint_Violations.csv')
-        if os.path.exists(constraints_file):
-            try:
-                constraints_df = pd.read_csv(constraints_file)
-                # Find overall satisfaction row
-                for _, row in constraints_df.iterrows():
-                    if 'Metric' in row and row['Metric'] == 'Overall Satisfaction':
-                        print(f"\nFinal satisfaction rate: {row['Percentage']} ({row.get('Status', 'N/A')})")
-                        print(f"Satisfied {int(row['Count'])} out of {int(row['Total'])} course requests")
-                    # Find capacity violations
-                    elif 'Metric' in row and row['Metric'] == 'Sections Over Capacity':
-                        if 'Count' in row and int(row['Count']) > 0:
-                            print(f"Warning: {int(row['Count'])} sections are over capacity!")
-            except Exception as e:
-                print(f"Error reading constraint violations: {str(e)}")
+        print_satisfaction_summary()
             
         print("\nOptimization pipeline completed successfully.")
         
@@ -231,5 +344,23 @@ def run_optimization_pipeline():
         print("Pipeline execution failed.")
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Run the master schedule optimization pipeline')
+    parser.add_argument('--iterative', action='store_true',
+                        help='Use the older loop of up to 3 MILP runs with schedule_optimizer.py in between')
+    parser.add_argument('--isolate', action='store_true',
+                        help='Run each stage in its own process instead of passing data in memory')
+    parser.add_argument('--iterations', type=int, default=1,
+                        help='Solves at most; later ones close underused sections and re-solve incrementally')
+    parser.add_argument('--service', nargs='?', const='', metavar='URL',
+                        help='Run on a solver service (default SCHEDULER_SERVICE_URL or http://127.0.0.1:8765)')
+    args = parser.parse_args()
+    
     print("Starting master schedule optimization pipeline")
-    run_optimization_pipeline()
+    if args.service is not None:
+        run_service_pipeline(args.service or None, iterations=args.iterations)
+    elif args.iterative:
+        run_optimization_pipeline()
+    else:
+        run_single_pass_pipeline(isolate=args.isolate, iterations=args.iterations)
@@ -11,6 +11,7 @@ function show_usage {
   echo "  (no argument)       Run the full pipeline (default)"
   echo "  milp                Run main/milp_soft.py"
   echo "  optimizer           Run schedule_optimizer.py"
+  echo "  consolidate         Run consolidation.py"
   echo "  synthetic           Run synthetic.py"
   echo "  help                Show this help message"
   echo ""
@@ -18,6 +19,7 @@ function show_usage {
   echo "  $0                  # Run the full pipeline"
   echo "  $0 milp             # Run only the MILP script"
   echo "  $0 optimizer        # Run only the schedule optimizer"
+  echo "  $0 consolidate      # Run only the section consolidation"
   echo "  $0 synthetic        # Run only the synthetic data generator"
 }
 
@@ -32,6 +34,9 @@ elif [ "$1" == "milp" ]; then
 elif [ "$1" == "optimizer" ]; then
   SCRIPT_TO_RUN="schedule_optimizer.py"
   echo "Running schedule optimizer only..."
+elif [ "$1" == "consolidate" ]; then
+  SCRIPT_TO_RUN="consolidation.py"
+  echo "Running section consolidation only..."
 elif [ "$1" == "synthetic" ]; then
   SCRIPT_TO_RUN="synthetic.py"
   echo "Running synthetic data generator only..."
@@ -56,13 +61,19 @@ else
   exit 1
 fi
 
+# Input and output directories (the web UI's job queue points these at a per-job workspace)
+INPUT_DIR="${SCHEDULER_INPUT_DIR:-$CURRENT_DIR/input}"
+OUTPUT_DIR="${SCHEDULER_OUTPUT_DIR:-$CURRENT_DIR/output}"
+
 # Base docker run command with volumes
-DOCKER_CMD="docker run --rm \
-  -v \"$CURRENT_DIR/input:/app/input\" \
-  -v \"$CURRENT_DIR/output:/app/output\" \
+DOCKER_CMD="docker run --rm ${SCHEDULER_CONTAINER_NAME:+--name $SCHEDULER_CONTAINER_NAME} \
+  -v \"$INPUT_DIR:/app/input\" \
+  -v \"$OUTPUT_DIR:/app/output\" \
   -v \"$CURRENT_DIR/main:/app/main\" \
   -v \"$CURRENT_DIR/gurobi.lic:/app/gurobi.lic\" \
   -e ANTHROPIC_API_KEY=\"$ANTHROPIC_API_KEY\" \
+  -e SCHEDULER_ADVISOR=\"${SCHEDULER_ADVISOR:-local}\" \
+  -e SCHEDULER_SOLVER_THREADS=\"${SCHEDULER_SOLVER_THREADS:-}\" \
   -e GRB_LICENSE_FILE=\"/app/gurobi.lic\" \
   scheduler-optimizer"
 
@@ -80,7 +91,7 @@ echo -e "\n===== Script completed ====="
 
 # Fix permissions on output files
 echo "Fixing output permissions..."
-chown -R ec2-user:ec2-user output/
+chown -R ec2-user:ec2-user "$OUTPUT_DIR"
 
 echo "The output files are available in the 'output' directory."
 if [ -z "$SCRIPT_TO_RUN" ]; then
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import pandas as pd
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+INPUT_FILES = ['Sections_Information.csv', 'Student_Info.csv', 'Student_Preference_Info.csv',
+               'Teacher_Info.csv', 'Teacher_unavailability.csv']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    status TEXT NOT NULL DEFAULT 'running',
+    inputs_hash TEXT,
+    sections_before INTEGER,
+    sections_after INTEGER,
+    mean_utilization REAL,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (kind, started);
+CREATE INDEX IF NOT EXISTS runs_inputs ON runs (inputs_hash);
+
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stages_by_run ON stages (run_id);
+CREATE INDEX IF NOT EXISTS stages_by_name ON stages (stage, run_id);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (name, run_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS course_utilization (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    course_id TEXT NOT NULL,
+    sections INTEGER,
+    seats INTEGER,
+    enrolled INTEGER,
+    utilization REAL,
+    PRIMARY KEY (run_id, course_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS actions (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    action TEXT NOT NULL,
+    section_id TEXT,
+    secondary_section TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS actions_by_run ON actions (run_id);
+CREATE INDEX IF NOT EXISTS actions_by_section ON actions (section_id);
+"""
+
+
+def inputs_hash(input_dir: Path, files: Iterable[str] = INPUT_FILES) -> str:
+    """Content hash of the scheduler's input files, so runs on the same inputs can be grouped"""
+    digest = hashlib.sha256()
+    for name in files:
+        path = Path(input_dir) / name
+        digest.update(name.encode())
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:24]
+
+
+def flatten_metrics(values: Dict, prefix: str = '') -> Dict[str, float]:
+    """Numeric leaves of a nested summary as dotted names, e.g. memory.peak_rss_mb"""
+    flat = {}
+    for key, value in values.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, f"{name}."))
+        elif isinstance(value, bool):
+            flat[name] = float(value)
+        elif isinstance(value, (int, float)) and value == value:
+            flat[name] = float(value)
+    return flat
+
+
+class RunStore:
+    """Append-only SQLite history of optimizer and pipeline runs
+
+    Each run is a row in `runs` with its stage timings, solver metrics, per-course utilization
+    and section actions in side tables keyed by run ID. Recording a run is a few inserts in one
+    transaction, whatever the size of the history, and the indexes keep trend and regression
+    queries fast across thousands of runs.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv('SCHEDULER_RUN_STORE', Path(__file__).parent / 'run_history.sqlite'))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        # WAL lets the UI read the history while a run is appending to it
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # Writing
+
+    def start_run(self, kind: str, inputs_hash: Optional[str] = None, started: Optional[float] = None) -> int:
+        with self.conn:
+            cursor = self.conn.execute('INSERT INTO runs (kind, started, inputs_hash) VALUES (?, ?, ?)',
+                                       (kind, started or time.time(), inputs_hash))
+        return cursor.lastrowid
+
+    def record_stage(self, run_id: int, stage: str, seconds: float, status: str = 'ok'):
+        with self.conn:
+            self.conn.execute('INSERT INTO stages VALUES (?, ?, ?, ?)', (run_id, stage, seconds, status))
+
+    def record_metrics(self, run_id: int, metrics: Dict, prefix: str = ''):
+        """Store the numeric values of a (possibly nested) metrics dict; later values replace earlier ones"""
+        rows = [(run_id, name, value) for name, value in flatten_metrics(metrics, prefix).items()]
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)', rows)
+
+    def record_utilization(self, run_id: int, sections: pd.DataFrame):
+        """Per-course utilization from a sections table with Enrolled counts (see section_metrics)"""
+        courses = sections.groupby('Course ID').agg(
+            sections=('Section ID', 'size'), seats=('# of Seats Available', 'sum'), enrolled=('Enrolled', 'sum'))
+        rows = [(run_id, str(course_id), int(row['sections']), int(row['seats']), int(row['enrolled']),
+                 float(row['enrolled'] / row['seats']) if row['seats'] > 0 else None)
+                for course_id, row in courses.iterrows()]
+        total_seats = courses['seats'].sum()
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO course_utilization VALUES (?, ?, ?, ?, ?, ?)', rows)
+            if total_seats > 0:
+                self.conn.execute('UPDATE runs SET mean_utilization = ? WHERE id = ?',
+                                  (float(courses['enrolled'].sum() / total_seats), run_id))
+
+    def record_actions(self, run_id: int, actions: List[Dict]):
+        """Store remove/merge/split decisions; anything besides the section IDs goes in detail"""
+        rows = []
+        for action in actions:
+            detail = {k: v for k, v in action.items() if k not in ('action', 'primary_section', 'secondary_section')}
+            rows.append((run_id, action.get('action'), action.get('primary_section'),
+                         action.get('secondary_section'), json.dumps(detail, default=str) if detail else None))
+        with self.conn:
+            self.conn.executemany('INSERT INTO actions VALUES (?, ?, ?, ?, ?)', rows)
+
+    def finish_run(self, run_id: int, status: str = 'ok', summary: Optional[Dict] = None,
+                   sections_before: Optional[int] = None, sections_after: Optional[int] = None):
+        with self.conn:
+            self.conn.execute(
+                'UPDATE runs SET finished = ?, status = ?, summary = COALESCE(?, summary), '
+                'sections_before = COALESCE(?, sections_before), sections_after = COALESCE(?, sections_after) '
+                'WHERE id = ?',
+                (time.time(), status, json.dumps(summary, default=str) if summary is not None else None,
+                 sections_before, sections_after, run_id))
+
+    @contextmanager
+    def run(self, kind: str, inputs_hash: Optional[str] = None):
+        """Record a run around a block; the run is marked failed if the block raises"""
+        recorder = RunRecorder(self, self.start_run(kind, inputs_hash))
+        try:
+            yield recorder
+        except BaseException:
+            self.finish_run(recorder.run_id, status='failed')
+            raise
+        self.finish_run(recorder.run_id, status=recorder.status)
+
+    def import_json_history(self, history_file: Path) -> int:
+        """Move the entries of a legacy utilization_history.json into the store, once"""
+        history_file = Path(history_file)
+        if not history_file.exists():
+            return 0
+        with open(history_file, 'r') as f:
+            entries = json.load(f)
+        with self.conn:
+            for entry in entries:
+                started = pd.Timestamp(entry.get('timestamp')).timestamp() if entry.get('timestamp') else time.time()
+                self.conn.execute(
+                    'INSERT INTO runs (kind, started, finished, status, sections_before, sections_after, summary) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ('schedule_optimizer', started, started, entry.get('status', 'applied'),
+                     entry.get('sections_before'), entry.get('sections_after'), json.dumps(entry)))
+        os.replace(history_file, history_file.with_suffix('.json.imported'))
+        return len(entries)
+
+    # Queries
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        frame = pd.read_sql_query(sql, self.conn, params=params)
+        for column in ('started', 'finished'):
+            if column in frame:
+                frame[column] = pd.to_datetime(frame[column], unit='s')
+        return frame
+
+    def recent(self, limit: int = 20, kind: Optional[str] = None) -> pd.DataFrame:
+        """Latest runs, newest first, with their total duration"""
+        where = 'WHERE kind = ?' if kind else ''
+        params = (kind, limit) if kind else (limit,)
+        return self._query(
+            f'SELECT id, kind, started, finished, finished - started AS seconds, status, inputs_hash, '
+            f'sections_before, sections_after, mean_utilization FROM runs {where} '
+            f'ORDER BY started DESC LIMIT ?', params)
+
+    def stages(self, run_id: int) -> pd.DataFrame:
+        return self._query('SELECT stage, seconds, status FROM stages WHERE run_id = ? ORDER BY rowid', (run_id,))
+
+    def actions(self, run_id: int) -> pd.DataFrame:
+        return self._query('SELECT action, section_id, secondary_section, detail FROM actions WHERE run_id = ?',
+                           (run_id,))
+
+    def trend(self, metric: str, limit: int = 200, kind: Optional[str] = None) -> pd.DataFrame:
+        """One metric over the latest runs, oldest first
+
+        Besides recorded metric names, 'stage:<name>' gives a stage's duration and
+        'mean_utilization' or 'sections_after' read the run columns.
+        """
+        kind_filter = 'AND r.kind = ?' if kind else ''
+        if metric.startswith('stage:'):
+            sql = (f'SELECT r.id, r.started, s.seconds AS value FROM stages s JOIN runs r ON r.id = s.run_id '
+                   f'WHERE s.stage = ? {kind_filter} ORDER BY r.started DESC LIMIT ?')
+            params = [metric[len('stage:'):]]
+        elif metric in ('mean_utilization', 'sections_before', 'sections_after'):
+            sql = (f'SELECT r.id, r.started, r.{metric} AS value FROM runs r '
+                   f'WHERE r.{metric} IS NOT NULL {kind_filter} ORDER BY r.started DESC LIMIT ?')
+            params = []
+        else:
+            sql = (f'SELECT r.id, r.started, m.value FROM metrics m JOIN runs r ON r.id = m.run_id '
+                   f'WHERE m.name = ? {kind_filter} ORDER BY r.started DESC LIMIT ?')
+            params = [metric]
+        params += ([kind] if kind else []) + [limit]
+        return self._query(sql, params).iloc[::-1].reset_index(drop=True)
+
+    def regressions(self, metric: str, window: int = 20, tolerance: float = 0.10,
+                    higher_is_better: bool = False, limit: int = 1000, kind: Optional[str] = None) -> pd.DataFrame:
+        """Runs whose metric is worse than the median of the previous `window` runs by more than `tolerance`"""
+        trend = self.trend(metric, limit=limit, kind=kind)
+        baseline = trend['value'].rolling(window, min_periods=min(3, window)).median().shift(1)
+        change = (trend['value'] - baseline) / baseline.abs()
+        worse = change < -tolerance if higher_is_better else change > tolerance
+        return trend.assign(baseline=baseline, change=change)[worse.fillna(False)]
+
+    def runs_for_inputs(self, inputs_hash: str) -> pd.DataFrame:
+        return self._query('SELECT id, kind, started, status, sections_after, mean_utilization FROM runs '
+                           'WHERE inputs_hash = ? ORDER BY started', (inputs_hash,))
+
+
+class RunRecorder:
+    """Handle for one run in progress: time stages and attach results"""
+
+    def __init__(self, store: RunStore, run_id: int):
+        self.store = store
+        self.run_id = run_id
+        self.status = 'ok'
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.time()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            self.record_stage(name, time.time() - started, status)
+
+    def record_stage(self, name: str, seconds: float, status: str = 'ok'):
+        """Record a stage timed by the caller; timings sums repeated stages"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        self.store.record_stage(self.run_id, name, seconds, status)
+
+    def metrics(self, metrics: Dict, prefix: str = ''):
+        self.store.record_metrics(self.run_id, metrics, prefix)
+
+    def utilization(self, sections: pd.DataFrame):
+        self.store.record_utilization(self.run_id, sections)
+
+    def actions(self, actions: List[Dict]):
+        self.store.record_actions(self.run_id, actions)
+
+    def finish(self, status: str = 'ok', summary: Optional[Dict] = None, **counts):
+        """Record the outcome now; the enclosing run() only updates the finish time and status"""
+        self.status = status
+        self.store.finish_run(self.run_id, status, summary, **counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the run history')
+    parser.add_argument('command', choices=['recent', 'trend', 'regressions', 'stages'])
+    parser.add_argument('metric', nargs='?', help="Metric name, 'stage:<name>', or a run ID for 'stages'")
+    parser.add_argument('--kind', help='Only runs of this kind (pipeline, schedule_optimizer)')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--window', type=int, default=20)
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--higher-is-better', action='store_true')
+    args = parser.parse_args()
+
+    store = RunStore()
+    pd.set_option('display.width', 200)
+    if args.command == 'recent':
+        print(store.recent(args.limit, kind=args.kind).to_string(index=False))
+    elif args.metric is None:
+        parser.error(f"{args.command} needs a metric")
+    elif args.command == 'stages':
+        print(store.stages(int(args.metric)).to_string(index=False))
+    elif args.command == 'trend':
+        print(store.trend(args.metric, limit=args.limit, kind=args.kind).to_string(index=False))
+    else:
+        found = store.regressions(args.metric, window=args.window, tolerance=args.tolerance,
+                                  higher_is_better=args.higher_is_better, kind=args.kind)
+        print(found.to_string(index=False) if not found.empty else f"No regressions in {args.metric}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
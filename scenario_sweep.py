@@ -0,0 +1,322 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BASE_PATH = Path(__file__).parent
+
+# Input tables a patch can edit, and their files
+TABLE_FILES = {
+    'sections': 'Sections_Information.csv',
+    'students': 'Student_Info.csv',
+    'student_preferences': 'Student_Preference_Info.csv',
+    'teachers': 'Teacher_Info.csv',
+    'teacher_unavailability': 'Teacher_unavailability.csv'
+}
+
+# Comparison table columns, in display order
+KPI_COLUMNS = ['scenario', 'status', 'sections', 'closed', 'requests', 'satisfaction', 'missed',
+               'over_capacity', 'overage', 'overage_vs_baseline', 'hard_violations', 'objective', 'mip_gap',
+               'solves', 'solve_seconds', 'pipeline_seconds', 'wall_seconds']
+
+
+def read_tables(input_path: Path) -> Dict[str, pd.DataFrame]:
+    tables = {}
+    for table, filename in TABLE_FILES.items():
+        try:
+            tables[table] = pd.read_csv(input_path / filename)
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            if table != 'teacher_unavailability':
+                raise
+            tables[table] = pd.DataFrame(columns=['Teacher ID', 'Unavailable Periods'])
+    return tables
+
+
+def write_tables(tables: Dict[str, pd.DataFrame], input_path: Path):
+    for table, filename in TABLE_FILES.items():
+        tables[table].to_csv(input_path / filename, index=False)
+
+
+def _next_ids(existing, prefix: str, count: int) -> List[str]:
+    """The next `count` IDs after the highest existing one, e.g. T041, T042"""
+    numbers = [int(m.group(1)) for m in (re.fullmatch(rf'{prefix}(\d+)', str(i)) for i in existing) if m]
+    width = max([len(str(i)) - len(prefix) for i in existing if str(i).startswith(prefix)] + [3])
+    start = max(numbers, default=0) + 1
+    return [f"{prefix}{n:0{width}d}" for n in range(start, start + count)]
+
+
+def _requests_per_course(tables: Dict[str, pd.DataFrame]) -> pd.Series:
+    prefs = tables['student_preferences']['Preferred Sections'].dropna().astype(str).str.split(';')
+    return prefs.explode().value_counts()
+
+
+def _add_teachers(tables: Dict[str, pd.DataFrame], patch: Dict):
+    """New teachers in a department, each with a full load of sections of one course
+
+    The course defaults to the department's course with the most requests per seat, the load
+    to the department's median sections per teacher and the seats to the course's median.
+    """
+    sections, teachers = tables['sections'], tables['teachers']
+    department = patch['department']
+    in_department = sections[sections['Department'] == department]
+    if in_department.empty:
+        raise ValueError(f"add_teachers: no sections in department {department!r}")
+    course = patch.get('course')
+    if course is None:
+        seats = in_department.groupby('Course ID')['# of Seats Available'].sum()
+        course = (_requests_per_course(tables).reindex(seats.index, fill_value=0) / seats).idxmax()
+    per_teacher = int(patch.get('sections_each', in_department.groupby('Teacher Assigned').size().median()))
+    course_seats = sections.loc[sections['Course ID'] == course, '# of Seats Available']
+    seats = int(patch.get('seats', course_seats.median() if len(course_seats) else in_department['# of Seats Available'].median()))
+
+    count = int(patch.get('count', 1))
+    teacher_ids = _next_ids(teachers['Teacher ID'], 'T', count)
+    section_ids = iter(_next_ids(sections['Section ID'], 'S', count * per_teacher))
+    new_teachers = [dict({c: 0 for c in teachers.columns}, **{'Teacher ID': t, 'Department': department,
+                                                               'Dedicated Course': course})
+                    for t in teacher_ids]
+    new_sections = [{'Section ID': next(section_ids), 'Course ID': course, 'Teacher Assigned': t,
+                     '# of Seats Available': seats, 'Department': department}
+                    for t in teacher_ids for _ in range(per_teacher)]
+    tables['teachers'] = pd.concat([teachers, pd.DataFrame(new_teachers, columns=teachers.columns)],
+                                   ignore_index=True)
+    tables['sections'] = pd.concat([sections, pd.DataFrame(new_sections, columns=sections.columns)],
+                                   ignore_index=True)
+
+
+def _cap_seats(tables: Dict[str, pd.DataFrame], patch: Dict):
+    """Cap section sizes, optionally only for one course or department"""
+    sections = tables['sections']
+    mask = pd.Series(True, index=sections.index)
+    if 'course' in patch:
+        mask &= sections['Course ID'] == patch['course']
+    if 'department' in patch:
+        mask &= sections['Department'] == patch['department']
+    sections.loc[mask, '# of Seats Available'] = sections.loc[mask, '# of Seats Available'].clip(upper=int(patch['max']))
+
+
+def _drop_course(tables: Dict[str, pd.DataFrame], patch: Dict):
+    """Stop offering a course: its sections go and students no longer request it"""
+    course = patch['course']
+    sections = tables['sections']
+    if not (sections['Course ID'] == course).any():
+        raise ValueError(f"drop_course: no sections of {course!r}")
+    tables['sections'] = sections[sections['Course ID'] != course].reset_index(drop=True)
+    prefs = tables['student_preferences'].copy()
+    prefs['Preferred Sections'] = prefs['Preferred Sections'].astype(str).str.split(';').map(
+        lambda courses: ';'.join(c for c in courses if c != course))
+    tables['student_preferences'] = prefs[prefs['Preferred Sections'] != ''].reset_index(drop=True)
+
+
+def _unavailable(tables: Dict[str, pd.DataFrame], patch: Dict):
+    """Make a teacher unavailable in more periods"""
+    blocked = tables['teacher_unavailability']
+    teacher = patch['teacher']
+    current = blocked.loc[blocked['Teacher ID'] == teacher, 'Unavailable Periods'].dropna().astype(str)
+    periods = [p.strip() for value in current for p in value.split(',')]
+    periods += [p for p in patch['periods'] if p not in periods]
+    row = pd.DataFrame([{'Teacher ID': teacher, 'Unavailable Periods': ','.join(periods)}])
+    tables['teacher_unavailability'] = pd.concat([blocked[blocked['Teacher ID'] != teacher], row],
+                                                 ignore_index=True)
+
+
+def _set(tables: Dict[str, pd.DataFrame], patch: Dict):
+    """Set a column in the rows of a table matching every `where` column"""
+    table = tables[patch['table']]
+    mask = pd.Series(True, index=table.index)
+    for column, value in patch.get('where', {}).items():
+        mask &= table[column] == value
+    if not mask.any():
+        raise ValueError(f"set: no rows of {patch['table']} match {patch.get('where')}")
+    table.loc[mask, patch['column']] = patch['value']
+
+
+PATCHES = {
+    'add_teachers': _add_teachers,
+    'cap_seats': _cap_seats,
+    'drop_course': _drop_course,
+    'unavailable': _unavailable,
+    'set': _set
+}
+
+
+def apply_patches(tables: Dict[str, pd.DataFrame], patches: List[Dict]) -> Dict[str, pd.DataFrame]:
+    tables = {table: frame.copy() for table, frame in tables.items()}
+    for patch in patches:
+        PATCHES[patch['op']](tables, patch)
+    return tables
+
+
+def load_scenarios(path: Path) -> List[Dict]:
+    """Read a scenario file: a list (or {"scenarios": [...]}) of {"name", "patches"}"""
+    with open(path, 'r') as f:
+        scenarios = json.load(f)
+    if isinstance(scenarios, dict):
+        scenarios = scenarios['scenarios']
+    names = set()
+    for scenario in scenarios:
+        if not scenario.get('name') or scenario['name'] in names:
+            raise ValueError(f"Every scenario needs a unique name: {scenario}")
+        names.add(scenario['name'])
+        for patch in scenario.get('patches', []):
+            if patch.get('op') not in PATCHES:
+                raise ValueError(f"Scenario {scenario['name']}: unknown patch op {patch.get('op')!r} "
+                                 f"(known: {', '.join(PATCHES)})")
+            if patch['op'] == 'set' and patch.get('table') not in TABLE_FILES:
+                raise ValueError(f"Scenario {scenario['name']}: unknown table {patch.get('table')!r}")
+    return scenarios
+
+
+def run_scenario(scenario: Dict, base_input: str, workspace: str, threads: int, time_limit: float,
+                 iterations: int, cache_root: str) -> Dict:
+    """Run one scenario in its own workspace (in a pool worker) and return its KPI row"""
+    started = time.time()
+    workspace = Path(workspace)
+    input_path = workspace / 'input'
+    shutil.copytree(base_input, input_path, dirs_exist_ok=True)
+    row = {'scenario': scenario['name'], 'workspace': str(workspace)}
+
+    # Solver and library output goes to the workspace log, not the sweep's console
+    log = open(workspace / 'sweep.log', 'w')
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    # Outputs are written relative to the working directory; caches stay shared across workers
+    os.chdir(workspace)
+    os.environ['SCHEDULER_SOLVER_THREADS'] = str(threads)
+    os.environ.setdefault('SCHEDULER_STAGE_CACHE', os.path.join(cache_root, 'stages'))
+    os.environ.setdefault('SCHEDULER_MODEL_CACHE', os.path.join(cache_root, 'models'))
+    try:
+        write_tables(apply_patches(read_tables(input_path), scenario.get('patches', [])), input_path)
+        from orchestrator import PipelineOrchestrator, MAIN_PATH
+        if str(MAIN_PATH) not in sys.path:
+            sys.path.insert(0, str(MAIN_PATH))
+        from verifier import HARD_RULES, verify_outputs
+
+        report = PipelineOrchestrator(base_path=workspace, max_iterations=iterations, time_limit=time_limit).run()
+        verified = verify_outputs(str(input_path), str(workspace / 'output'), write=False)
+        issues = verified['issues']
+        requests = verified['total_requests']
+        row.update({
+            'status': 'ok',
+            'sections': report['sections_after'],
+            'closed': report['sections_before'] - report['sections_after'],
+            'requests': requests,
+            'satisfaction': round(verified['satisfied_requests'] / requests * 100, 2) if requests else None,
+            'missed': len(issues['Missed Requests']),
+            'over_capacity': len(issues['Sections Over Capacity']),
+            'overage': verified['total_overages'],
+            'hard_violations': sum(len(issues[name]) for name in HARD_RULES),
+            'objective': report['solver']['objective'],
+            'mip_gap': report['solver']['mip_gap'],
+            'solves': report['solves'],
+            'solve_seconds': round(report['stages'].get('solve', 0.0), 3),
+            'pipeline_seconds': report['seconds']
+        })
+    except Exception as e:
+        row.update({'status': 'failed', 'error': f"{type(e).__name__}: {e}"})
+    row['wall_seconds'] = round(time.time() - started, 3)
+    return row
+
+
+def _run_task(args) -> Dict:
+    return run_scenario(*args)
+
+
+class ScenarioSweep:
+    """Run the pipeline on a base input set and patched variants of it, side by side
+
+    Each scenario gets a workspace with a patched copy of the inputs and runs in its own pool
+    process (a fresh one per scenario, so logging and the solver environment never leak
+    between scenarios). The core budget is split evenly between workers through
+    SCHEDULER_SOLVER_THREADS so concurrent solves don't oversubscribe the machine. Stage and
+    model caches are shared, so inputs a patch doesn't touch are only loaded once.
+    """
+
+    def __init__(self, scenarios: List[Dict], base_input: Optional[Path] = None, workers: Optional[int] = None,
+                 core_budget: Optional[int] = None, workspace: Optional[Path] = None, time_limit: float = 25200,
+                 iterations: int = 1, baseline: bool = True):
+        self.scenarios = ([{'name': 'baseline', 'patches': []}] if baseline else []) + list(scenarios)
+        self.base_input = Path(base_input or BASE_PATH / 'input')
+        self.core_budget = core_budget or max(1, multiprocessing.cpu_count() - 1)
+        self.workers = max(1, min(workers or self.core_budget, len(self.scenarios), self.core_budget))
+        self.threads = max(1, self.core_budget // self.workers)
+        self.workspace = Path(workspace or BASE_PATH / 'sweeps' / datetime.now().strftime('%Y%m%d_%H%M%S'))
+        self.time_limit = time_limit
+        self.iterations = iterations
+
+    def run(self) -> pd.DataFrame:
+        """Run every scenario and return the comparison table (also saved in the workspace)"""
+        started = time.time()
+        # Check every patch applies before spending solver time on any of them
+        tables = read_tables(self.base_input)
+        for scenario in self.scenarios:
+            try:
+                apply_patches(tables, scenario.get('patches', []))
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"Scenario {scenario['name']}: {e}") from e
+
+        print(f"Running {len(self.scenarios)} scenarios on {self.workers} workers x {self.threads} solver threads "
+              f"in {self.workspace}")
+        cache_root = str((BASE_PATH / 'cache').resolve())
+        tasks = []
+        for index, scenario in enumerate(self.scenarios):
+            directory = self.workspace / f"{index:02d}_{re.sub(r'[^A-Za-z0-9]+', '_', scenario['name']).strip('_')}"
+            directory.mkdir(parents=True, exist_ok=True)
+            tasks.append((scenario, str(self.base_input), str(directory.resolve()), self.threads, self.time_limit,
+                          self.iterations, cache_root))
+        rows = []
+        # maxtasksperchild=1 gives every scenario a fresh process (ProcessPoolExecutor's
+        # max_tasks_per_child needs Python 3.11, the Docker image runs 3.9)
+        with multiprocessing.get_context('spawn').Pool(self.workers, maxtasksperchild=1) as pool:
+            for row in pool.imap_unordered(_run_task, tasks):
+                rows.append(row)
+                detail = (f"{row['satisfaction']}% satisfied, overage {row['overage']}" if row['status'] == 'ok'
+                          else row['error'])
+                print(f"  {row['scenario']}: {row['status']} in {row['wall_seconds']:.1f}s ({detail})")
+
+        order = {scenario['name']: index for index, scenario in enumerate(self.scenarios)}
+        table = pd.DataFrame(sorted(rows, key=lambda r: order[r['scenario']]))
+        table = table.reindex(columns=KPI_COLUMNS + [c for c in table.columns if c not in KPI_COLUMNS])
+        baseline = table[(table['scenario'] == 'baseline') & (table['status'] == 'ok')]
+        if not baseline.empty:
+            table['overage_vs_baseline'] = table['overage'] - baseline['overage'].iloc[0]
+
+        table.to_csv(self.workspace / 'comparison.csv', index=False)
+        with open(self.workspace / 'sweep.json', 'w') as f:
+            json.dump({'scenarios': self.scenarios, 'workers': self.workers, 'threads': self.threads,
+                       'seconds': round(time.time() - started, 3),
+                       'results': json.loads(table.to_json(orient='records'))}, f, indent=2)
+        return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the pipeline on patched copies of the inputs in parallel')
+    parser.add_argument('scenarios', help='JSON file of scenarios: [{"name": ..., "patches": [{"op": ...}]}]')
+    parser.add_argument('--input-dir', default=str(BASE_PATH / 'input'), help='Base input set')
+    parser.add_argument('--workers', type=int, help='Scenarios solved at once (default: as many as cores allow)')
+    parser.add_argument('--cores', type=int, help='Cores shared by all workers (default: all but one)')
+    parser.add_argument('--time-limit', type=float, default=25200, help='Time limit per solve in seconds')
+    parser.add_argument('--iterations', type=int, default=1, help='Solves per scenario (see orchestrator.py)')
+    parser.add_argument('--workspace', help='Directory for the scenario workspaces (default: sweeps/<timestamp>)')
+    parser.add_argument('--no-baseline', action='store_true', help='Do not add the unpatched inputs as a scenario')
+    args = parser.parse_args()
+
+    sweep = ScenarioSweep(load_scenarios(Path(args.scenarios)), base_input=args.input_dir, workers=args.workers,
+                          core_budget=args.cores, workspace=args.workspace, time_limit=args.time_limit,
+                          iterations=args.iterations, baseline=not args.no_baseline)
+    table = sweep.run()
+    print()
+    print(table[KPI_COLUMNS].to_string(index=False))
+    print(f"\nComparison saved to {sweep.workspace / 'comparison.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,41 @@
 import pandas as pd
-import anthropic
 import json
 from pathlib import Path
 from typing import Dict, List, Optional
 import os
+import time
 from dotenv import load_dotenv
-import io 
+from concurrent.futures import Future
+from section_edits import SectionEditBatch
+from consolidation import SectionConsolidator
+from what_if import WhatIfEvaluator
+from advisor import AdviceRejected, AdvisorRunner, LocalAdvisor, make_advisor
+from run_store import RunRecorder, RunStore, inputs_hash
 
 # Load environment variables from .env file
 load_dotenv()
 
-def validate_api_key(api_key: str) -> bool:
-    """Validate Anthropic API key format"""
-    print(f"Debug - Full API key: {api_key}")  # Temporary debug line
-    print(f"Debug - Key length: {len(api_key)}")
-    print(f"Debug - Key type: {type(api_key)}")
-    
-    if not api_key or isinstance(api_key, str) is False:
-        print("API key is empty or not a string")
-        return False
-        
-    # Remove any whitespace and newlines
-    api_key = api_key.strip().replace('\n', '').replace('\r', '')
-    
-    if len(api_key) < 40:
-        print(f"API key length ({len(api_key)}) is too short")
-        return False
-    
-    print("API key validation passed")
-    return True
-
 class UtilizationOptimizer:
-    def __init__(self, api_key: str):
-        # Hardcoded API key - temporary solution
-        api_key = "sk-ant-REDACTED"
-        
-        print(f"Using API key: {api_key}")
-        print(f"API key length: {len(api_key)}")
-        
-        # Create Claude client
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(self):
+        # Advisor provider (SCHEDULER_ADVISOR: local, anthropic or a URL), run in the background;
+        # the anthropic provider reads ANTHROPIC_API_KEY from the environment
+        self.advisor = make_advisor()
+        self.advisor_runner = AdvisorRunner(self.advisor, timeout=float(os.getenv('SCHEDULER_ADVISOR_TIMEOUT', 120)))
         self.base_path = Path(__file__).parent
         # Fix paths to use absolute paths instead of relative
         self.input_path = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), "input")))
         self.output_path = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), "output")))
-        self.history_file = self.base_path / "utilization_history.json"
+        # Run history (SCHEDULER_RUN_STORE), replacing the old utilization_history.json
+        self.run_store = RunStore()
         self.target_utilization = 0.60
         
         # Print the resolved paths for debugging
         print(f"Input path: {self.input_path}")
         print(f"Output path: {self.output_path}")
         
-        self.load_history()
+        imported = self.run_store.import_json_history(self.base_path / "utilization_history.json")
+        if imported:
+            print(f"Moved {imported} entries from utilization_history.json into {self.run_store.path}")
         self.constraints = {
             'max_teacher_sections': 6,
             'target_utilization': 0.60,
@@ -61,19 +45,51 @@ class UtilizationOptimizer:
             'max_section_size': 40   # Add maximum section size
         }
 
-    def load_history(self):
-        if self.history_file.exists():
-            with open(self.history_file, 'r') as f:
-                self.history = json.load(f)
-        else:
-            self.history = []
+    def section_metrics(self, data: Dict[str, pd.DataFrame]) -> Dict:
+        """Per-section enrollment, utilization and SPED counts plus teacher loads and conflicts in one pass"""
+        sections = data['sections']
+        student_assignments = data.get('current_student_assignments')
+        if student_assignments is None:
+            student_assignments = pd.DataFrame(columns=['Student ID', 'Section ID'])
 
-    def save_history(self):
-        """Save optimization history to file"""
-        with open(self.history_file, 'w') as f:
-            json.dump(self.history, f, indent=2)
+        # Enrollment and SPED counts per section from one value_counts each
+        enrolled = student_assignments['Section ID'].value_counts()
+        sped_ids = data['student_info'].loc[data['student_info']['SPED'] == 'Yes', 'Student ID']
+        sped_rows = student_assignments[student_assignments['Student ID'].isin(sped_ids)]
+        sped = sped_rows.drop_duplicates(['Student ID', 'Section ID'])['Section ID'].value_counts()
+
+        metrics = sections[['Section ID', 'Course ID', '# of Seats Available']].copy()
+        metrics['Enrolled'] = metrics['Section ID'].map(enrolled).fillna(0).astype(int)
+        metrics['Utilization'] = metrics['Enrolled'] / metrics['# of Seats Available']
+        metrics['SPED'] = metrics['Section ID'].map(sped).fillna(0).astype(int)
+
+        # Teacher loads and unavailability conflicts from the teacher assignments, if any
+        teacher_assignments = data.get('current_teacher_assignments')
+        teacher_loads = pd.Series(dtype=int)
+        conflicts = pd.DataFrame(columns=['Teacher ID', 'Section ID', 'Period'])
+        if teacher_assignments is not None and not teacher_assignments.empty:
+            teacher_loads = teacher_assignments['Teacher ID'].value_counts(sort=False)
+            unavailable = data['teacher_unavailability'].dropna(subset=['Unavailable Periods'])
+            if not unavailable.empty:
+                unavailable = unavailable.assign(
+                    Period=unavailable['Unavailable Periods'].astype(str).str.split(','),
+                    row=range(len(unavailable))
+                ).explode('Period')
+                unavailable['Period'] = unavailable['Period'].str.strip()
+                # Report conflicts per unavailability row, then in assignment order
+                conflicts = unavailable[['Teacher ID', 'Period', 'row']].merge(
+                    teacher_assignments.assign(position=range(len(teacher_assignments))),
+                    on=['Teacher ID', 'Period']
+                ).drop_duplicates(['row', 'position']).sort_values(['row', 'position'])
+                conflicts = conflicts[['Teacher ID', 'Section ID', 'Period']].reset_index(drop=True)
+
+        return {
+            'sections': metrics,
+            'teacher_loads': teacher_loads,
+            'teacher_conflicts': conflicts
+        }
 
-    def validate_schedule_constraints(self, data: Dict[str, pd.DataFrame]) -> Dict:
+    def validate_schedule_constraints(self, data: Dict[str, pd.DataFrame], metrics: Optional[Dict] = None) -> Dict:
         """Validate all schedule constraints and relationships"""
         violations = {
             'teacher_overload': [],
@@ -88,80 +104,41 @@ class UtilizationOptimizer:
         if teacher_assignments is None:
             print("Note: Skipping teacher load validation - no assignments data available")
             return violations
+
+        if metrics is None:
+            metrics = self.section_metrics(data)
             
         # Rest of validation logic only runs if we have assignment data
         if not teacher_assignments.empty:
-            # Check teacher loads
-            teacher_loads = {}
-            for _, assignment in teacher_assignments.iterrows():
-                teacher_id = assignment['Teacher ID']
-                teacher_loads[teacher_id] = teacher_loads.get(teacher_id, 0) + 1
-                if teacher_loads[teacher_id] > self.constraints['max_teacher_sections']:
-                    violations['teacher_overload'].append(teacher_id)
-
-            # Check schedule conflicts
-            for _, unavail in data['teacher_unavailability'].iterrows():
-                teacher_id = unavail['Teacher ID']
-                unavail_periods = unavail['Unavailable Periods'].split(',')
-                assignments = teacher_assignments[
-                    teacher_assignments['Teacher ID'] == teacher_id
-                ]
-                for _, assignment in assignments.iterrows():
-                    if assignment['Period'] in unavail_periods:
-                        violations['teacher_conflicts'].append(
-                            (teacher_id, assignment['Section ID'], assignment['Period'])
-                        )
-
-        # Calculate section utilization using student assignments if available
+            # One entry per assignment past the limit, in assignment order
+            running_load = teacher_assignments.groupby('Teacher ID').cumcount() + 1
+            violations['teacher_overload'] = teacher_assignments.loc[
+                running_load > self.constraints['max_teacher_sections'], 'Teacher ID'
+            ].tolist()
+            violations['teacher_conflicts'] = list(metrics['teacher_conflicts'].itertuples(index=False, name=None))
+
+        # Section utilization and SPED distribution need student assignments
         student_assignments = data.get('current_student_assignments')
         if student_assignments is not None and not student_assignments.empty:
-            for _, section in data['sections'].iterrows():
-                section_id = section['Section ID']
-                enrolled = len(student_assignments[
-                    student_assignments['Section ID'] == section_id
-                ])
-                utilization = enrolled / section['# of Seats Available']
-                if utilization < self.constraints['min_utilization']:
-                    violations['low_utilization'].append((section_id, utilization))
-
-        # Check SPED distribution if we have both student info and assignments
-        if student_assignments is not None and not student_assignments.empty:
-            sped_students = data['student_info'][
-                data['student_info']['SPED'] == 'Yes'
-            ]['Student ID'].tolist()
-            
-            for _, section in data['sections'].iterrows():
-                section_id = section['Section ID']
-                section_assignments = student_assignments[
-                    student_assignments['Section ID'] == section_id
-                ]
-                sped_count = len(set(section_assignments['Student ID']) & set(sped_students))
-                if sped_count > self.constraints['max_sped_per_section']:
-                    violations['sped_distribution'].append((section_id, sped_count))
+            sections = metrics['sections']
+            low = sections[sections['Utilization'] < self.constraints['min_utilization']]
+            violations['low_utilization'] = list(zip(low['Section ID'], low['Utilization']))
+            crowded = sections[sections['SPED'] > self.constraints['max_sped_per_section']]
+            violations['sped_distribution'] = list(zip(crowded['Section ID'], crowded['SPED']))
 
         return violations
 
     def initialize_assignments(self, data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         """Initialize student assignments based on preferences"""
-        assignments = []
-        
-        # Create initial assignments based on preferences
-        for _, student in data['student_preferences'].iterrows():
-            student_id = student['Student ID']
-            for course in student['Preferred Sections'].split(';'):
-                # Find all sections for this course
-                course_sections = data['sections'][
-                    data['sections']['Course ID'] == course
-                ]
-                if not course_sections.empty:
-                    # Assign to least utilized section
-                    chosen_section = course_sections.iloc[0]['Section ID']
-                    assignments.append({
-                        'Student ID': student_id,
-                        'Section ID': chosen_section
-                    })
+        # Every requested course goes to its first listed section
+        first_section = data['sections'].drop_duplicates('Course ID').set_index('Course ID')['Section ID']
+        requests = data['student_preferences'][['Student ID', 'Preferred Sections']].copy()
+        requests['Course ID'] = requests['Preferred Sections'].str.split(';')
+        requests = requests.explode('Course ID')
+        requests['Section ID'] = requests['Course ID'].map(first_section)
+        assignments = requests.dropna(subset=['Section ID'])[['Student ID', 'Section ID']].reset_index(drop=True)
         
-        return pd.DataFrame(assignments)
+        return assignments
 
         
     def analyze_utilization(self, data: Dict[str, pd.DataFrame]) -> Dict:
@@ -176,24 +153,12 @@ class UtilizationOptimizer:
             print("No existing assignments found. Initializing based on preferences...")
             data['current_student_assignments'] = self.initialize_assignments(data)
         
-        # Calculate course demand and actual enrollments
-        course_demand = {}
-        course_enrollments = {}
-        
-        # Calculate demand from preferences
-        for _, student in student_preferences.iterrows():
-            for course in student['Preferred Sections'].split(';'):
-                course_demand[course] = course_demand.get(course, 0) + 1
-        
-        # Calculate actual enrollments
-        for _, section in sections.iterrows():
-            course = section['Course ID']
-            enrolled = len(data['current_student_assignments'][
-                data['current_student_assignments']['Section ID'] == section['Section ID']
-            ])
-            if course not in course_enrollments:
-                course_enrollments[course] = []
-            course_enrollments[course].append(enrolled)
+        # Demand from preferences and enrollments per section, each in one vectorized pass
+        requested = student_preferences['Preferred Sections'].str.split(';').explode()
+        course_demand = requested.groupby(requested, sort=False).size().to_dict()
+        metrics = self.section_metrics(data)
+        course_enrollments = metrics['sections'].groupby('Course ID', sort=False)['Enrolled'].agg(
+            lambda enrolled: enrolled.tolist()).to_dict()
 
         # Find optimization opportunities
         opportunities = {
@@ -202,31 +167,28 @@ class UtilizationOptimizer:
             'split_candidates': []
         }
 
-        for course, enrollments in course_enrollments.items():
-            course_sections = sections[sections['Course ID'] == course]
-            total_enrolled = sum(enrollments)
-            total_capacity = course_sections['# of Seats Available'].sum()
-            avg_enrollment = total_enrolled / len(enrollments)
+        for course, course_sections in metrics['sections'].groupby('Course ID', sort=False):
+            enrollments = course_enrollments[course]
+            avg_enrollment = sum(enrollments) / len(enrollments)
+            capacities = course_sections['# of Seats Available'].tolist()
+            section_ids = course_sections['Section ID'].tolist()
 
             # Find sections to potentially remove
             if len(enrollments) > 1:
-                for i in range(len(enrollments)):
-                    enrollment = enrollments[i]
-                    section = course_sections.iloc[i]
+                for section_id, enrollment in zip(section_ids, enrollments):
                     if enrollment < (0.3 * avg_enrollment):
                         opportunities['remove_candidates'].append({
                             'course': course,
-                            'section': section['Section ID'],
+                            'section': section_id,
                             'current_enrollment': enrollment,
                             'reason': f"Low enrollment ({enrollment}) compared to average ({avg_enrollment:.1f})"
                         })
 
             # Find merge candidates
             if len(enrollments) >= 2:
-                sorted_sections = sorted(zip(course_sections['Section ID'], enrollments), 
-                                      key=lambda x: x[1])
-                if sorted_sections[0][1] + sorted_sections[1][1] <= course_sections.iloc[0]['# of Seats Available']:
-                    current_util = (sorted_sections[0][1] + sorted_sections[1][1]) / course_sections.iloc[0]['# of Seats Available']
+                sorted_sections = sorted(zip(section_ids, enrollments), key=lambda x: x[1])
+                if sorted_sections[0][1] + sorted_sections[1][1] <= capacities[0]:
+                    current_util = (sorted_sections[0][1] + sorted_sections[1][1]) / capacities[0]
                     opportunities['merge_candidates'].append({
                         'course': course,
                         'section1': sorted_sections[0][0],
@@ -236,21 +198,14 @@ class UtilizationOptimizer:
                     })
 
             # Add split candidates for highly utilized sections
-            for i in range(len(enrollments)):
-                enrollment = enrollments[i]
-                try:
-                    section = course_sections.iloc[i]
-                    utilization = enrollment / section['# of Seats Available']
-                    if utilization > 0.9:  # 90% or higher utilization
-                        opportunities['split_candidates'].append({
-                            'course': course,
-                            'section': section['Section ID'],
-                            'current_enrollment': enrollment,
-                            'reason': f"High utilization ({utilization:.1%})"
-                        })
-                except Exception as e:
-                    print(f"Warning: Error processing split candidate for course {course}, enrollment {enrollment}: {str(e)}")
-                    continue
+            for section_id, enrollment, utilization in zip(section_ids, enrollments, course_sections['Utilization']):
+                if utilization > 0.9:  # 90% or higher utilization
+                    opportunities['split_candidates'].append({
+                        'course': course,
+                        'section': section_id,
+                        'current_enrollment': enrollment,
+                        'reason': f"High utilization ({utilization:.1%})"
+                    })
 
         return {
             'course_demand': course_demand,
@@ -260,22 +215,16 @@ class UtilizationOptimizer:
             'total_assignments': len(data.get('current_student_assignments', pd.DataFrame()))
         }
 
-    def generate_optimization_prompt(self, analysis: Dict, data: Dict[str, pd.DataFrame]) -> str:
-        """Create detailed optimization prompt with full context"""
-        # Get current departments for reference
-        departments = data['sections'].groupby('Course ID')['Department'].first().to_dict()
+    def generate_optimization_prompt(self, analysis: Dict, data: Dict[str, pd.DataFrame], top_k: int = 15) -> str:
+        """Create the optimization prompt from size-bounded summaries of the data"""
+        metrics = self.section_metrics(data)
+        sections = metrics['sections'].merge(data['sections'][['Section ID', 'Department']], on='Section ID')
         
-        # Calculate current teacher loads
-        teacher_loads = {}
-        for _, row in data.get('current_teacher_assignments', pd.DataFrame()).iterrows():
-            teacher_id = row['Teacher ID']
-            if teacher_id != 'Unassigned':
-                teacher_loads[teacher_id] = teacher_loads.get(teacher_id, 0) + 1
-
-        # Get teacher department info
-        teacher_departments = {}
-        for _, row in data['teacher_info'].iterrows():
-            teacher_departments[row['Teacher ID']] = row['Department']
+        # Current teacher loads, summarized per department with only the busiest teachers listed
+        teacher_info = data['teacher_info'][['Teacher ID', 'Department']].copy()
+        loads = metrics['teacher_loads'].drop('Unassigned', errors='ignore')
+        teacher_info['Load'] = teacher_info['Teacher ID'].map(loads).fillna(0).astype(int)
+        max_load = self.constraints['max_teacher_sections']
         
         prompt = f"""As a schedule optimization expert, analyze the data and MAKE CHANGES to optimize the Sections.
 You MUST optimize the schedule by merging, removing, or splitting sections - returning the original schedule unchanged is NOT acceptable.
@@ -291,39 +240,46 @@ SECTION SIZE CONSTRAINTS:
 - Do not merge sections if combined size would exceed maximum
 
 TEACHER CONSTRAINTS:
-1. Each teacher can teach maximum 6 sections
+1. Each teacher can teach maximum {max_load} sections
 2. Teachers must teach within their department
-3. Current teacher loads must be considered:
+3. Current teacher loads must be considered (department: teachers, sections taught, teachers with room):
 """
-        # Add current teacher loads
-        for teacher, load in teacher_loads.items():
-            dept = teacher_departments.get(teacher, 'Unknown')
-            prompt += f"\n{teacher} ({dept}): {load}/6 sections"
-
-        prompt += "\n\nAVAILABLE TEACHERS BY DEPARTMENT:"
-        # Group and add available teachers by department
-        for dept, teachers in pd.DataFrame(teacher_departments.items(), 
-                                         columns=['Teacher', 'Department']).groupby('Department'):
-            available_teachers = [t for t in teachers['Teacher'] 
-                                if teacher_loads.get(t, 0) < 6]
-            prompt += f"\n{dept}: {', '.join(available_teachers)}"
+        for dept, group in teacher_info.groupby('Department'):
+            open_teachers = group[group['Load'] < max_load]['Teacher ID'].tolist()
+            shown = ', '.join(open_teachers[:top_k]) + (f" (+{len(open_teachers) - top_k} more)"
+                                                       if len(open_teachers) > top_k else '')
+            prompt += f"\n{dept}: {len(group)} teachers, {group['Load'].sum()} sections, with room: {shown or 'none'}"
+        busiest = teacher_info[teacher_info['Load'] > 0].nlargest(top_k, 'Load')
+        if not busiest.empty:
+            prompt += "\nBusiest teachers: " + ', '.join(
+                f"{t} ({d}) {load}/{max_load}" for t, d, load in busiest[['Teacher ID', 'Department', 'Load']].values)
 
         prompt += "\n\nCURRENT STATISTICS:"
         prompt += f"\nTotal Students: {analysis['total_students']}"
         prompt += f"\nTotal Current Assignments: {analysis['total_assignments']}"
 
-        prompt += "\n\nDEPARTMENTS BY COURSE:"
-        for course, dept in departments.items():
-            prompt += f"\n{course}: {dept}"
-
-        prompt += "\n\nCOURSE RELATIONSHIPS:"
-        for course, demand in analysis['course_demand'].items():
-            enrollments = analysis['course_enrollments'].get(course, [])
-            prompt += f"\nCourse {course}:"
-            prompt += f"\n  Demand: {demand} students"
-            prompt += f"\n  Sections: {len(enrollments)}"
-            if enrollments:
-                prompt += f"\n  Current enrollments: {enrollments}"
+        # One row per course instead of every section's enrollment
+        courses = sections.groupby('Course ID').agg(
+            Department=('Department', 'first'), Sections=('Section ID', 'size'),
+            Seats=('# of Seats Available', 'sum'), Enrolled=('Enrolled', 'sum'),
+            MinEnrolled=('Enrolled', 'min'), MaxEnrolled=('Enrolled', 'max'))
+        courses['Demand'] = courses.index.map(analysis['course_demand']).fillna(0).astype(int)
+        courses['Utilization'] = (courses['Enrolled'] / courses['Seats']).round(2)
+        prompt += "\n\nCOURSES (course,department,demand,sections,seats,enrolled,min/max section enrollment,utilization):"
+        for course, row in courses.iterrows():
+            prompt += (f"\n{course},{row['Department']},{row['Demand']},{row['Sections']},{row['Seats']},"
+                       f"{row['Enrolled']},{row['MinEnrolled']}/{row['MaxEnrolled']},{row['Utilization']}")
+
+        # Only the sections most worth acting on
+        low = sections.nsmallest(top_k, 'Utilization')
+        high = sections[sections['Utilization'] > 0.9].nlargest(top_k, 'Utilization')
+        prompt += f"\n\nLOWEST UTILIZATION SECTIONS (section,course,enrolled/seats):"
+        for _, row in low.iterrows():
+            prompt += f"\n{row['Section ID']},{row['Course ID']},{row['Enrolled']}/{row['# of Seats Available']}"
+        if not high.empty:
+            prompt += f"\n\nSECTIONS ABOVE 90% UTILIZATION (section,course,enrolled/seats):"
+            for _, row in high.iterrows():
+                prompt += f"\n{row['Section ID']},{row['Course ID']},{row['Enrolled']}/{row['# of Seats Available']}"
                 
         prompt += """
 
@@ -379,99 +335,41 @@ Include only the CSV content in your response, no explanation or other text."""
 
         return prompt
 
-    def consult_claude(self, data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-        """Get Claude's optimized schedule as a DataFrame"""
+    def request_advice(self, data: Dict[str, pd.DataFrame]) -> Future:
+        """Start the advisor on the optimization prompt without waiting for it"""
         analysis = self.analyze_utilization(data)
         prompt = self.generate_optimization_prompt(analysis, data)
         
-        print("\nRequesting optimized schedule from Claude...")
-        
-        # Create the hardcoded client directly here to ensure correct API key
-        api_key = "sk-ant-REDACTED"
-        client = anthropic.Anthropic(api_key=api_key)
-        print(f"API key (direct check): {api_key}")
-        # Remove problematic line trying to access internal client attribute
-        # print(f"Client API key: {client._client.api_key}")
-        
-        print(f"Creating API request with key length: {len(api_key)}")
-        
-        try:
-            response = client.messages.create(
-                model="claude-3-opus-20240229",
-                max_tokens=2000,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
-            
-            csv_content = response.content[0].text.strip()
-            print("\nReceived CSV content:")
-            print(csv_content[:200] + "...")  # Show first few lines
-        except Exception as e:
-            print(f"\nAPI error: {str(e)}")
-            print("API call failed, continuing with unoptimized schedule")
-            # Return original sections if API fails
-            return data['sections']
+        print(f"\nRequesting optimized schedule from advisor ({self.advisor.name})...")
+        return self.advisor_runner.submit(prompt, data)
+
+    def consult_claude(self, data: Dict[str, pd.DataFrame], advice: Optional[Future] = None) -> pd.DataFrame:
+        """Get the advisor's optimized schedule as a DataFrame"""
+        if advice is None:
+            advice = self.request_advice(data)
         
+        # The advice is validated row by row as it streams in; a bad header or department aborts it
         try:
-            # Split content into lines and verify header
-            lines = csv_content.strip().split('\n')
-            if len(lines) < 2:  # Need at least header and one data row
-                print("Error: CSV content too short")
-                return None
-                
-            expected_header = "Section ID,Course ID,Teacher Assigned,# of Seats Available,Department"
-            if lines[0].strip() != expected_header:
-                print("Error: Incorrect header format")
-                print("Expected:", expected_header)
-                print("Got:", lines[0])
-                # Try to fix header
-                csv_content = expected_header + '\n' + '\n'.join(lines)
-            
-            # Parse CSV content
-            df = pd.read_csv(io.StringIO(csv_content))
-            
-            # Validate required columns exist
-            required_cols = ['Section ID', 'Course ID', 'Teacher Assigned', '# of Seats Available', 'Department']
-            if not all(col in df.columns for col in required_cols):
-                print("Error: Missing required columns")
-                print("Expected:", required_cols)
-                print("Got:", list(df.columns))
-                return None
-            
-            # Ensure columns are in correct order
-            df = df[required_cols]
-            
-            # Validate departments match original assignments
-            original_depts = data['sections'].groupby('Course ID')['Department'].first()
-            mismatched_depts = []
-            for _, row in df.iterrows():
-                if row['Course ID'] in original_depts:
-                    if row['Department'] != original_depts[row['Course ID']]:
-                        mismatched_depts.append(row['Course ID'])
-            
-            if mismatched_depts:
-                print("Error: Department assignments changed for courses:", mismatched_depts)
-                return None
-                
-            return df
-            
-        except Exception as e:
-            print(f"Error parsing CSV content: {str(e)}")
-            print("Raw CSV content:")
-            print(csv_content)
+            df = self.advisor_runner.result(advice)
+        except AdviceRejected as e:
+            print(f"Error: {str(e)}")
             return None
+        if df is None:
+            print("Advisor call failed, continuing with unoptimized schedule")
+            # Return original sections if the advisor fails
+            return data['sections']
+        print(f"\nReceived {len(df)} validated sections from the advisor")
+        return df
 
     def process_multiple_actions(self, data: Dict[str, pd.DataFrame], details: Dict) -> Dict[str, pd.DataFrame]:
-        """Process multiple optimization actions in the correct order"""
-        modified_data = {k: df.copy() for k, df in data.items()}
+        """Process multiple optimization actions in the correct order as one edit batch"""
+        decisions = []
         
         # Process actions in order: removes -> merges -> splits
         if 'expected_impact' in details:
             if 'removed_sections' in details['expected_impact']:
                 for section_id in details['expected_impact']['removed_sections']:
-                    modified_data = self.modify_data(modified_data, {
+                    decisions.append({
                         "action": "remove",
                         "primary_section": section_id,
                         "details": {"source": "multiple_action"}
@@ -481,7 +379,7 @@ Include only the CSV content in your response, no explanation or other text."""
                 for merge_info in details['expected_impact']['merged_sections']:
                     for merge_pair, course in merge_info.items():
                         section1, section2 = merge_pair.split(' + ')
-                        modified_data = self.modify_data(modified_data, {
+                        decisions.append({
                             "action": "merge",
                             "primary_section": section1.strip(),
                             "secondary_section": section2.strip(),
@@ -492,155 +390,32 @@ Include only the CSV content in your response, no explanation or other text."""
                 for split_info in details['expected_impact']['split_sections']:
                     for section_pair, course in split_info.items():
                         section = section_pair.split(' + ')[0]  # Take first section as base
-                        modified_data = self.modify_data(modified_data, {
+                        decisions.append({
                             "action": "split",
                             "primary_section": section.strip(),
                             "details": {"course": course}
                         })
-        
-        return modified_data
+
+        batch = SectionEditBatch(data, self.constraints, validate=self.validate_schedule_constraints)
+        applied = batch.apply_all(decisions)
+        print(f"Applied {applied} of {len(decisions)} actions")
+        return batch.commit()
 
     def modify_data(self, data: Dict[str, pd.DataFrame], decision: Dict) -> Dict[str, pd.DataFrame]:
         """Apply Claude's recommended changes to all relevant DataFrames"""
-        modified_data = {k: df.copy() for k, df in data.items()}
-        
-        # Validate change won't create constraint violations
-        if decision["action"] == "merge":
-            # Check teacher capacity
-            section1, section2 = decision["primary_section"], decision["secondary_section"]
-            teacher1 = modified_data['sections'][
-                modified_data['sections']['Section ID'] == section1
-            ]['Teacher Assigned'].iloc[0]
-            
-            teacher_load = len(modified_data['teacher_assignments'][
-                modified_data['teacher_assignments']['Teacher ID'] == teacher1
-            ])
-            
-            if teacher_load >= self.constraints['max_teacher_sections']:
-                print(f"Warning: Merge would exceed teacher {teacher1}'s capacity")
-                return modified_data
-
-            # Check combined size won't exceed maximum
-            current_enrollment1 = len(modified_data['student_assignments'][
-                modified_data['student_assignments']['Section ID'] == section1
-            ])
-            current_enrollment2 = len(modified_data['student_assignments'][
-                modified_data['student_assignments']['Section ID'] == section2
-            ])
-            
-            if current_enrollment1 + current_enrollment2 > self.constraints['max_section_size']:
-                print(f"Warning: Merge would exceed maximum section size of {self.constraints['max_section_size']}")
-                return modified_data
-
-        if decision["action"] == "remove":
-            # Remove section and redistribute students
-            section_id = decision["primary_section"]
-            modified_data['sections'] = modified_data['sections'][
-                modified_data['sections']['Section ID'] != section_id
-            ]
-            modified_data['teacher_assignments'] = modified_data['teacher_assignments'][
-                modified_data['teacher_assignments']['Section ID'] != section_id
-            ]
-            # Student redistribution would need additional logic
-            
-        elif decision["action"] == "merge":
-            # Merge two sections
-            section1 = decision["primary_section"]
-            section2 = decision["secondary_section"]
-            
-            # Keep primary section and update capacity
-            merged_capacity = (
-                modified_data['sections'][
-                    modified_data['sections']['Section ID'] == section1
-                ]['# of Seats Available'].iloc[0] +
-                modified_data['sections'][
-                    modified_data['sections']['Section ID'] == section2
-                ]['# of Seats Available'].iloc[0]
-            )
-            
-            modified_data['sections'].loc[
-                modified_data['sections']['Section ID'] == section1,
-                '# of Seats Available'
-            ] = merged_capacity
-            
-            # Remove secondary section
-            modified_data['sections'] = modified_data['sections'][
-                modified_data['sections']['Section ID'] != section2
-            ]
-            
-            # Update student assignments
-            modified_data['student_assignments'].loc[
-                modified_data['student_assignments']['Section ID'] == section2,
-                'Section ID'
-            ] = section1
-            
-        elif decision["action"] == "split":
-            # Split a section
-            section_id = decision["primary_section"]
-            original_section = modified_data['sections'][
-                modified_data['sections']['Section ID'] == section_id
-            ].iloc[0]
-            
-            # Create two new sections
-            section_a = original_section.copy()
-            section_b = original_section.copy()
-            section_a["Section ID"] = f"{section_id}_A"
-            section_b["Section ID"] = f"{section_id}_B"
-            
-            # Split capacity
-            original_capacity = original_section['# of Seats Available']
-            section_a['# of Seats Available'] = original_capacity // 2
-            section_b['# of Seats Available'] = original_capacity // 2
-            
-            # Update sections
-            modified_data['sections'] = modified_data['sections'][
-                modified_data['sections']['Section ID'] != section_id
-            ]
-            modified_data['sections'] = pd.concat([
-                modified_data['sections'],
-                pd.DataFrame([section_a, section_b])
-            ])
-            
-            # Split students
-            students = modified_data['student_assignments'][
-                modified_data['student_assignments']['Section ID'] == section_id
-            ]
-            half_point = len(students) // 2
-            
-            students.iloc[:half_point, students.columns.get_loc('Section ID')] = f"{section_id}_A"
-            students.iloc[half_point:, students.columns.get_loc('Section ID')] = f"{section_id}_B"
-            
-            modified_data['student_assignments'] = modified_data['student_assignments'][
-                modified_data['student_assignments']['Section ID'] != section_id
-            ]
-            modified_data['student_assignments'] = pd.concat([
-                modified_data['student_assignments'],
-                students
-            ])
-
-            # Check resulting sections won't be too small
-            current_enrollment = len(modified_data['student_assignments'][
-                modified_data['student_assignments']['Section ID'] == section_id
-            ])
-            
-            if current_enrollment / 2 < self.constraints['min_section_size']:
-                print(f"Warning: Split would create sections below minimum size of {self.constraints['min_section_size']}")
-                return modified_data
-        
-        # Validate results
-        violations = self.validate_schedule_constraints(modified_data)
-        if any(violations.values()):
-            print("\nWarning: Proposed changes would create constraint violations:")
-            for category, issues in violations.items():
-                if issues:
-                    print(f"\n{category.replace('_', ' ').title()}:")
-                    for issue in issues:
-                        print(f"  {issue}")
-
-        return modified_data
+        batch = SectionEditBatch(data, self.constraints, validate=self.validate_schedule_constraints)
+        batch.apply(decision)
+        return batch.commit()
 
     def optimize(self):
-        """Main optimization function"""
+        """Main optimization function, recorded in the run history"""
+        # Hash the inputs before the sections file is rewritten
+        with self.run_store.run('schedule_optimizer', inputs_hash(self.input_path)) as run:
+            self.run_optimization(run)
+
+    def run_optimization(self, run: RunRecorder):
+        """Load the data, consolidate sections, apply the result and record it in `run`"""
+        started = time.time()
         print(f"Using input directory: {self.input_path}")
         print(f"Reading from output directory: {self.output_path}")
 
@@ -716,165 +491,181 @@ Include only the CSV content in your response, no explanation or other text."""
             print("Creating output directory...")
             self.output_path.mkdir(parents=True, exist_ok=True)
 
+        run.record_stage('load', time.time() - started)
+
+        # Ask a remote advisor in the background while the consolidation model runs. The local
+        # advisor is handed the solved plan instead: solving the same model on its own thread would
+        # double the work and share gurobipy's default environment, which is not thread-safe
+        local = isinstance(self.advisor, LocalAdvisor)
+        advice = None if local else self.request_advice(data)
+        with run.stage('consolidation'):
+            consolidator = SectionConsolidator(data, max_teacher_sections=self.constraints['max_teacher_sections'])
+            plan = consolidator.solve()
+        if local:
+            self.advisor.plan = plan
+            advice = self.request_advice(data)
+        run.metrics({'runtime_seconds': plan['runtime_seconds'], 'closed': len(plan['close']),
+                     'teacher_overload': sum(plan['teacher_overload'].values())}, prefix='consolidation.')
+        
         # Get optimization recommendation as DataFrame
-        optimized_sections = self.consult_claude(data)
+        with run.stage('advice'):
+            optimized_sections = self.consult_claude(data, advice)
+        advice_received = optimized_sections is not None
+        run.metrics({'advice.received': advice_received})
+        if not advice_received:
+            # The consolidation plan overrides the advice anyway, so a rejected answer cannot veto it
+            print("Advice rejected; applying the consolidation plan regardless")
+            optimized_sections = data['sections']
+        report = {}
+        skipped = []
         
-        if optimized_sections is not None:
-            # Save directly to input directory with more detailed debugging
-            sections_file = self.input_path / 'Sections_Information.csv'
-            
-            # Check if file exists and is writable
-            try:
-                if sections_file.exists():
-                    print(f"File exists: {sections_file}")
-                    print(f"File is writable: {os.access(str(sections_file), os.W_OK)}")
-                    
-                    # Use output folder for reports instead of input folder
-                    report_dir = self.output_path
-                    if not report_dir.exists():
-                        os.makedirs(report_dir, exist_ok=True)
-                    
-                    # Create a backup only for reference
-                    backup_file = self.input_path / 'Sections_Information.backup.csv'
-                    print(f"Creating backup at: {backup_file}")
-                    data['sections'].to_csv(backup_file, index=False)
-                else:
-                    print(f"File does not exist yet: {sections_file}")
-                
-                # Always force changes regardless of Claude's response
-                print("Forcing direct schedule optimization...")
-                
-                # Calculate section utilization
-                section_counts = {}
-                if 'current_student_assignments' in data:
-                    section_counts = data['current_student_assignments']['Section ID'].value_counts().to_dict()
-                
-                # Get low utilization sections 
-                low_util_sections = []
-                for _, section in data['sections'].iterrows():
-                    section_id = section['Section ID']
-                    capacity = section['# of Seats Available']
-                    count = section_counts.get(section_id, 0)
-                    utilization = count / capacity if capacity > 0 else 0
-                    
-                    # Modified utilization criteria for better balance
-                    if ((utilization < 0.5) or 
-                        (utilization < 0.55 and capacity > 18 and count < 10)):  # Target larger sections with few students
-                        # Don't remove certain courses that need to be preserved
-                        if section['Course ID'] not in ['Medical Career', 'Heroes Teach', 'AP Biology']:
-                            low_util_sections.append((section_id, utilization))
-                        
-                # Sort by utilization (ascending)
-                low_util_sections.sort(key=lambda x: x[1])
-                print(f"Found {len(low_util_sections)} low-utilization sections")
-                
-                # Remove more low utilization sections
-                sections_to_remove = []
-                for i, (section_id, util) in enumerate(low_util_sections):
-                    if i < 5:  # Remove up to 5 sections per run for more aggressive optimization
-                        sections_to_remove.append(section_id)
-                        print(f"Removing section {section_id} with {util:.1%} utilization")
-                
-                if sections_to_remove:
-                    # Create a fresh optimized sections DataFrame to avoid issues
-                    optimized_sections = data['sections'][~data['sections']['Section ID'].isin(sections_to_remove)]
-                    print(f"Removed {len(sections_to_remove)} sections: {', '.join(sections_to_remove)}")
-                    
-                    # Create a detailed report of changes
-                    report = {
-                        "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "action": "remove_sections",
-                        "sections_before": len(data['sections']),
-                        "sections_after": len(optimized_sections),
-                        "sections_removed": sections_to_remove,
-                        "section_utilization": {section_id: f"{util:.1%}" for section_id, util in low_util_sections},
-                    }
-                    
-                    # Save the report as JSON in the output directory
-                    report_file = report_dir / 'optimization_summary.json'
-                    with open(report_file, 'w') as f:
-                        import json
-                        json.dump(report, f, indent=2)
-                    print(f"Saved optimization report to {report_file}")
+        # Save directly to input directory with more detailed debugging
+        sections_file = self.input_path / 'Sections_Information.csv'
+        
+        # Check if file exists and is writable
+        try:
+            if sections_file.exists():
+                print(f"File exists: {sections_file}")
+                print(f"File is writable: {os.access(str(sections_file), os.W_OK)}")
                 
-                # Write the optimized sections
-                print(f"Writing {len(optimized_sections)} sections to {sections_file}...")
-                optimized_sections.to_csv(sections_file, index=False)
-                print(f"\nSuccessfully updated {sections_file}")
+                # Use output folder for reports instead of input folder
+                report_dir = self.output_path
+                if not report_dir.exists():
+                    os.makedirs(report_dir, exist_ok=True)
                 
-                # Double-check the file was written
-                if sections_file.exists():
-                    print(f"Verified file exists after write. File size: {sections_file.stat().st_size} bytes")
-                    print(f"Number of sections changed from {len(data['sections'])} to {len(optimized_sections)}")
-                else:
-                    print("ERROR: File doesn't exist after write!")
-                
-            except Exception as e:
-                print(f"ERROR writing to {sections_file}: {str(e)}")
-                # Try to write to output directory instead
-                fallback_file = self.output_path / 'Optimized_Sections_Information.csv'
-                print(f"Trying fallback location: {fallback_file}")
-                optimized_sections.to_csv(fallback_file, index=False)
-                print(f"Wrote to fallback location. Please copy this file to the input directory manually.")
-            
-            # Save to history
-            self.history.append({
-                "timestamp": pd.Timestamp.now().isoformat(),
-                "sections_before": len(data['sections']),
-                "sections_after": len(optimized_sections),
-                "status": "applied"
-            })
-            self.save_history()
-            
-            # Generate summary statistics
-            stats = {
-                "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "sections_before": len(data['sections']),
-                "sections_after": len(optimized_sections),
-                "changes_made": len(data['sections']) - len(optimized_sections)
-            }
-            
-            # Calculate course statistics if student assignments are available
+                # Create a backup only for reference
+                backup_file = self.input_path / 'Sections_Information.backup.csv'
+                print(f"Creating backup at: {backup_file}")
+                data['sections'].to_csv(backup_file, index=False)
+            else:
+                print(f"File does not exist yet: {sections_file}")
+            
+            # Always force changes regardless of Claude's response
+            print("Forcing direct schedule optimization...")
+            
+            # Calculate section utilization
+            section_counts = {}
             if 'current_student_assignments' in data:
                 section_counts = data['current_student_assignments']['Section ID'].value_counts().to_dict()
-                before_utilization = {}
-                for _, section in data['sections'].iterrows():
-                    section_id = section['Section ID']
-                    course_id = section['Course ID']
-                    capacity = section['# of Seats Available']
-                    count = section_counts.get(section_id, 0)
-                    utilization = count / capacity if capacity > 0 else 0
-                    before_utilization[section_id] = {
-                        "course": course_id,
-                        "capacity": int(capacity),
-                        "enrollment": count,
-                        "utilization": f"{utilization:.1%}"
-                    }
-                stats["before_utilization"] = before_utilization
             
-            # Save statistics to output file for reference
-            summary_file = self.output_path / 'optimization_summary.json'
-            with open(summary_file, 'w') as f:
-                import json
-                json.dump(stats, f, indent=2)
+            # Close the sections picked by the consolidation model instead of fixed thresholds
+            sections_to_remove = plan['close']
+            print(f"Consolidation plan ({plan['status']}, {plan['runtime_seconds']}s) "
+                  f"closes {len(sections_to_remove)} sections")
+            
+            # Check each closure against the current schedule and keep only those it can absorb
+            what_if = []
+            if sections_to_remove and 'current_master_schedule' in data and 'current_student_assignments' in data:
+                what_if_started = time.time()
+                evaluator = WhatIfEvaluator(data['sections'], data['current_master_schedule'],
+                                            data['current_student_assignments'])
+                what_if = evaluator.evaluate_all(
+                    [{'action': 'remove', 'primary_section': s} for s in sections_to_remove])
+                for result in what_if:
+                    # A section missing from the current schedule has no students to move
+                    if result['unseated'] or result['conflicts']:
+                        section_id = result['candidate']['primary_section']
+                        print(f"Keeping {section_id} open: closing it leaves {result['unseated']} students "
+                              f"unseated and {result['conflicts']} with period conflicts under the current schedule")
+                        skipped.append(section_id)
+                sections_to_remove = [s for s in sections_to_remove if s not in skipped]
+                run.record_stage('what_if', time.time() - what_if_started)
+                run.metrics({'unseated': sum(r['unseated'] for r in what_if),
+                             'conflicts': sum(r['conflicts'] for r in what_if),
+                             'added_overage': sum(r['added_overage'] for r in what_if),
+                             'skipped': len(skipped)}, prefix='what_if.')
+                run.actions([{'action': 'keep', 'primary_section': section_id, 'stage': 'what_if'}
+                             for section_id in skipped])
+            
+            # Create a fresh optimized sections DataFrame to avoid issues; the plan overrides the
+            # advice even when the what-if check leaves nothing to close
+            optimized_sections = consolidator.apply(dict(plan, close=sections_to_remove))
+            if sections_to_remove:
+                print(f"Removed {len(sections_to_remove)} sections: {', '.join(sections_to_remove)}")
+                
+                capacities = data['sections'].set_index('Section ID')['# of Seats Available']
+                # Create a detailed report of changes
+                report = {
+                    "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "action": "remove_sections",
+                    "sections_before": len(data['sections']),
+                    "sections_after": len(optimized_sections),
+                    "sections_removed": sections_to_remove,
+                    "section_utilization": {
+                        section_id: f"{section_counts.get(section_id, 0) / capacities[section_id]:.1%}"
+                        for section_id in sections_to_remove if capacities[section_id] > 0
+                    },
+                    "courses": plan['courses'],
+                    "what_if": what_if,
+                }
+                run.actions([{'action': 'remove', 'primary_section': section_id,
+                              'utilization': report['section_utilization'].get(section_id)}
+                             for section_id in sections_to_remove])
+            
+            # Write the optimized sections
+            write_started = time.time()
+            print(f"Writing {len(optimized_sections)} sections to {sections_file}...")
+            optimized_sections.to_csv(sections_file, index=False)
+            print(f"\nSuccessfully updated {sections_file}")
+            
+            # Double-check the file was written
+            if sections_file.exists():
+                print(f"Verified file exists after write. File size: {sections_file.stat().st_size} bytes")
+                print(f"Number of sections changed from {len(data['sections'])} to {len(optimized_sections)}")
+            else:
+                print("ERROR: File doesn't exist after write!")
+            run.record_stage('write', time.time() - write_started)
             
-            # Print summary
-            print("\nOptimization Summary:")
-            print(f"Sections before: {len(data['sections'])}")
-            print(f"Sections after: {len(optimized_sections)}")
-            print(f"Changes made: {len(data['sections']) - len(optimized_sections)}")
-            print(f"Details saved to: {summary_file}")
-        else:
-            print("\nNo optimization applied - invalid response from Claude")
+        except Exception as e:
+            print(f"ERROR writing to {sections_file}: {str(e)}")
+            # Try to write to output directory instead
+            fallback_file = self.output_path / 'Optimized_Sections_Information.csv'
+            print(f"Trying fallback location: {fallback_file}")
+            optimized_sections.to_csv(fallback_file, index=False)
+            print(f"Wrote to fallback location. Please copy this file to the input directory manually.")
+        
+        # Generate summary statistics, keeping the removal report in the same file
+        stats = dict(report, **{
+            "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "sections_before": len(data['sections']),
+            "sections_after": len(optimized_sections),
+            "changes_made": len(data['sections']) - len(optimized_sections),
+            "sections_kept_by_what_if": skipped,
+            "advice": "received" if advice_received else "rejected"
+        })
+        
+        # Calculate course statistics if student assignments are available
+        if 'current_student_assignments' in data:
+            before = self.section_metrics(data)['sections']
+            run.utilization(before)
+            stats["before_utilization"] = {
+                section_id: {
+                    "course": course_id,
+                    "capacity": int(capacity),
+                    "enrollment": int(count),
+                    "utilization": f"{count / capacity if capacity > 0 else 0:.1%}"
+                }
+                for section_id, course_id, capacity, count in zip(
+                    before['Section ID'], before['Course ID'], before['# of Seats Available'], before['Enrolled'])
+            }
+        
+        # Save statistics to output file for reference
+        summary_file = self.output_path / 'optimization_summary.json'
+        with open(summary_file, 'w') as f:
+            json.dump(stats, f, indent=2)
+        run.finish('applied', {k: v for k, v in stats.items() if k != 'before_utilization'},
+                   sections_before=len(data['sections']), sections_after=len(optimized_sections))
+        
+        # Print summary
+        print("\nOptimization Summary:")
+        print(f"Sections before: {len(data['sections'])}")
+        print(f"Sections after: {len(optimized_sections)}")
+        print(f"Changes made: {len(data['sections']) - len(optimized_sections)}")
+        print(f"Details saved to: {summary_file}")
 
 def main():
-    print("Using hardcoded API key")
-    api_key = "sk-ant-REDACTED"
-    print(f"API key in main function: {api_key}")
-    print(f"API key length: {len(api_key)}")
-    
     try:
-        optimizer = UtilizationOptimizer(api_key)
+        optimizer = UtilizationOptimizer()
         optimizer.optimize()
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
@@ -0,0 +1,198 @@
+import pandas as pd
+from typing import Callable, Dict, List, Optional
+
+
+def _table_key(data: Dict[str, pd.DataFrame], name: str) -> Optional[str]:
+    """Find an assignment table under its own name or as loaded from the output directory"""
+    for key in (name, f"current_{name}"):
+        if key in data and data[key] is not None:
+            return key
+    return None
+
+
+class SectionEditBatch:
+    """Apply remove/merge/split actions as one delta over the data, then commit or roll back
+
+    The input DataFrames are never modified. Actions only record changes against indexed
+    views of the sections and assignments: overridden or new section rows, removed section
+    IDs and relabelled assignment rows. commit() builds the new tables once and validates
+    once; tables no action touched are passed through without copying.
+    """
+
+    def __init__(self, data: Dict[str, pd.DataFrame], constraints: Dict,
+                 validate: Optional[Callable[[Dict[str, pd.DataFrame]], Dict]] = None):
+        self.data = data
+        self.constraints = constraints
+        self.validate = validate
+        self.student_key = _table_key(data, 'student_assignments')
+        self.teacher_key = _table_key(data, 'teacher_assignments')
+        self.rollback()
+
+    def rollback(self):
+        """Discard every pending action"""
+        sections = self.data['sections']
+        self.section_rows = {section_id: position for position, section_id in enumerate(sections['Section ID'])}
+        self.overrides = {}       # Section ID -> changed copy of its row
+        self.added = {}           # Section ID -> new row, in creation order
+        self.removed = set()      # Section IDs dropped from sections
+        self.removed_teaching = set()  # Section IDs dropped from the teacher assignments
+        self.applied = []
+        self.rejected = []
+        self.violations = None
+
+        # Assignment rows grouped by section, relabelled in place by merges and splits
+        self.relabelled = {}      # assignment row position -> new Section ID
+        self.members = {}
+        # Where each row would sit had every split moved its rows to the end of the table, as
+        # the per-action edit did; members are kept in this order so later splits pick the same halves
+        self.order = {}           # assignment row position -> frame order, if not its position
+        self.next_order = 0
+        if self.student_key is not None:
+            groups = self.data[self.student_key].groupby('Section ID', sort=False).indices
+            self.members = {section_id: list(rows) for section_id, rows in groups.items()}
+            self.next_order = len(self.data[self.student_key])
+
+        self.teacher_loads = {}
+        if self.teacher_key is not None and not self.data[self.teacher_key].empty:
+            self.teacher_loads = self.data[self.teacher_key]['Teacher ID'].value_counts().to_dict()
+
+    def section(self, section_id: str) -> Optional[Dict]:
+        """Current row for a section, or None if it does not exist in the pending state"""
+        if section_id in self.removed:
+            return None
+        if section_id in self.overrides:
+            return self.overrides[section_id]
+        if section_id in self.added:
+            return self.added[section_id]
+        if section_id in self.section_rows:
+            return self.data['sections'].iloc[self.section_rows[section_id]].to_dict()
+        return None
+
+    def enrollment(self, section_id: str) -> int:
+        return len(self.members.get(section_id, []))
+
+    def _reject(self, decision: Dict, reason: str) -> bool:
+        print(f"Warning: {reason}")
+        self.rejected.append({'decision': decision, 'reason': reason})
+        return False
+
+    def _write(self, section_id: str, row: Dict):
+        """Copy-on-write for one section row"""
+        if section_id in self.added:
+            self.added[section_id] = row
+        else:
+            self.overrides[section_id] = row
+
+    def _drop(self, section_id: str):
+        self.added.pop(section_id, None)
+        self.overrides.pop(section_id, None)
+        if section_id in self.section_rows:
+            self.removed.add(section_id)
+
+    def apply(self, decision: Dict) -> bool:
+        """Record one action; returns False (and leaves the batch unchanged) if it is rejected"""
+        action = decision.get("action")
+        section_id = decision.get("primary_section")
+        row = self.section(section_id)
+        if row is None:
+            return self._reject(decision, f"Section {section_id} does not exist")
+
+        if action == "remove":
+            self._drop(section_id)
+            self.removed_teaching.add(section_id)
+            teacher_id = row['Teacher Assigned']
+            if teacher_id in self.teacher_loads:
+                self.teacher_loads[teacher_id] -= 1
+            # Student redistribution would need additional logic
+
+        elif action == "merge":
+            secondary_id = decision.get("secondary_section")
+            secondary = self.section(secondary_id)
+            if secondary is None:
+                return self._reject(decision, f"Section {secondary_id} does not exist")
+            teacher_id = row['Teacher Assigned']
+            if self.teacher_loads.get(teacher_id, 0) >= self.constraints['max_teacher_sections']:
+                return self._reject(decision, f"Merge would exceed teacher {teacher_id}'s capacity")
+            if self.enrollment(section_id) + self.enrollment(secondary_id) > self.constraints['max_section_size']:
+                return self._reject(decision, f"Merge would exceed maximum section size of "
+                                              f"{self.constraints['max_section_size']}")
+
+            # Keep primary section with the combined capacity and move the secondary's students
+            self._write(section_id, dict(row, **{
+                '# of Seats Available': row['# of Seats Available'] + secondary['# of Seats Available']}))
+            self._drop(secondary_id)
+            moved = self.members.pop(secondary_id, [])
+            for position in moved:
+                self.relabelled[position] = section_id
+            self.members[section_id] = sorted(self.members.get(section_id, []) + moved,
+                                              key=lambda position: self.order.get(position, position))
+
+        elif action == "split":
+            enrolled = self.enrollment(section_id)
+            if enrolled / 2 < self.constraints['min_section_size']:
+                return self._reject(decision, f"Split would create sections below minimum size of "
+                                              f"{self.constraints['min_section_size']}")
+            capacity = row['# of Seats Available'] // 2
+            self._drop(section_id)
+            students = self.members.pop(section_id, [])
+            for position in students:
+                self.order[position] = self.next_order
+                self.next_order += 1
+            half_point = len(students) // 2
+            for suffix, part in (('A', students[:half_point]), ('B', students[half_point:])):
+                new_id = f"{section_id}_{suffix}"
+                self.added[new_id] = dict(row, **{'Section ID': new_id, '# of Seats Available': capacity})
+                for position in part:
+                    self.relabelled[position] = new_id
+                self.members[new_id] = part
+
+        else:
+            return self._reject(decision, f"Unknown action {action}")
+
+        self.applied.append(decision)
+        return True
+
+    def apply_all(self, decisions: List[Dict]) -> int:
+        """Record several actions in order; returns how many were accepted"""
+        return sum(self.apply(decision) for decision in decisions)
+
+    def commit(self) -> Dict[str, pd.DataFrame]:
+        """Build the edited data dict once and validate it once"""
+        result = dict(self.data)
+
+        if self.overrides or self.added or self.removed:
+            sections = self.data['sections']
+            if self.removed:
+                sections = sections[~sections['Section ID'].isin(self.removed)]
+            if self.overrides:
+                sections = sections.copy()
+                positions = {section_id: i for i, section_id in enumerate(sections['Section ID'])}
+                for section_id, row in self.overrides.items():
+                    sections.iloc[positions[section_id]] = [row[column] for column in sections.columns]
+            if self.added:
+                sections = pd.concat([sections, pd.DataFrame(list(self.added.values()))[sections.columns]],
+                                     ignore_index=True)
+            result['sections'] = sections
+
+        if self.relabelled:
+            assignments = self.data[self.student_key].copy()
+            column = assignments.columns.get_loc('Section ID')
+            positions = list(self.relabelled.keys())
+            assignments.iloc[positions, column] = list(self.relabelled.values())
+            result[self.student_key] = assignments
+
+        if self.removed_teaching and self.teacher_key is not None:
+            teaching = self.data[self.teacher_key]
+            result[self.teacher_key] = teaching[~teaching['Section ID'].isin(self.removed_teaching)]
+
+        # Validate results
+        if self.validate is not None:
+            self.violations = self.validate(result)
+            if any(self.violations.values()):
+                print("\nWarning: Proposed changes would create constraint violations:")
+                for category, issues in self.violations.items():
+                    if issues:
+                        print(f"\n{category.replace('_', ' ').title()}:")
+                        for issue in issues:
+                            print(f"  {issue}")
+        return result
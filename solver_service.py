@@ -0,0 +1,509 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import shutil
+import logging
+import argparse
+import threading
+import multiprocessing
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+from jobs import (QUEUED, RUNNING, DONE, FAILED, CANCELLED, FINISHED, REQUIRED_INPUTS, OPTIONAL_INPUTS,
+                  parse_progress)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_URL = os.environ.get('SCHEDULER_SERVICE_URL', 'http://127.0.0.1:8765')
+
+# Log of a service job, inside its workspace
+SOLVER_LOG = 'solver.log'
+
+# In-memory stage results kept by each worker (loaded inputs, consolidation plans, solves)
+MEMORY_ITEMS = 32
+
+# Directories whose workspaces clients may run in, besides the service's own jobs directory:
+# the web UI's job workspaces and any listed in SCHEDULER_SERVICE_ROOTS (os.pathsep-separated)
+DEFAULT_WORKSPACE_ROOTS = [os.environ.get('SCHEDULER_JOBS_DIR', os.path.join(BASE_DIR, 'jobs'))] + [
+    root for root in os.environ.get('SCHEDULER_SERVICE_ROOTS', '').split(os.pathsep) if root]
+
+
+def _attach_output(log_path: str, saved_fds):
+    """Point this process's stdout and stderr (Python and Gurobi alike) at a job log, or back"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    if log_path is None:
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        return None
+    log = open(log_path, 'a')
+    os.dup2(log.fileno(), 1)
+    os.dup2(log.fileno(), 2)
+    return log
+
+
+def _worker_main(index: int, tasks, events, preload: List[str], threads: int, cache_root: str):
+    """A warm worker: imports the solver stack and checks out the Gurobi license once, then runs jobs"""
+    started = time.time()
+    os.environ['SCHEDULER_SOLVER_THREADS'] = str(threads)
+    os.environ.setdefault('SCHEDULER_STAGE_CACHE', os.path.join(cache_root, 'stages'))
+    os.environ.setdefault('SCHEDULER_MODEL_CACHE', os.path.join(cache_root, 'models'))
+    os.environ.setdefault('SCHEDULER_STAGE_CACHE_MEMORY', str(MEMORY_ITEMS))
+    sys.path.insert(0, BASE_DIR)
+    from orchestrator import MAIN_PATH, PipelineOrchestrator
+    sys.path.insert(0, str(MAIN_PATH))
+    import gurobipy as gp
+    import milp_soft  # noqa: F401  (warm import; the orchestrator loads it per run)
+    from verifier import verify_outputs  # noqa: F401
+
+    # Every model in this process uses the default environment, created here once
+    gp.Model('warmup').dispose()
+    for input_dir in preload:
+        PipelineOrchestrator(base_path=Path(input_dir).parent).load_stage()
+
+    # milp_soft's basicConfig is a no-op once the root logger has handlers
+    root = logging.getLogger()
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(formatter)
+    root.handlers = [console]
+    root.setLevel(logging.INFO)
+    saved_fds = (os.dup(1), os.dup(2))
+    sys.stdout.reconfigure(line_buffering=True)
+    events.put(('ready', index, round(time.time() - started, 3)))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, workspace, options, submitted = task
+        events.put(('started', index, job_id, time.time()))
+        log = _attach_output(os.path.join(workspace, SOLVER_LOG), saved_fds)
+        os.makedirs(os.path.join(workspace, 'output'), exist_ok=True)
+        file_log = logging.FileHandler(os.path.join(workspace, 'output', 'gurobi_scheduling.log'))
+        file_log.setFormatter(formatter)
+        root.addHandler(file_log)
+        os.chdir(workspace)
+        try:
+            report = PipelineOrchestrator(base_path=Path(workspace),
+                                          max_iterations=options.get('iterations', 1),
+                                          time_limit=options.get('time_limit', 25200),
+                                          stage_cache=options.get('stage_cache', True)).run()
+            report['dispatch_seconds'] = round(time.time() - submitted - report['seconds'], 3)
+            # Click to first solver iteration: queueing plus the stages before the solve
+            report['seconds_to_solver'] = round(report['dispatch_seconds'] + sum(
+                report['stages'].get(stage, 0.0) for stage in ('load', 'consolidation', 'build')), 3)
+            print("\nPipeline finished in {:.1f}s (service worker {}, {:.2f}s to the solver)".format(
+                report['seconds'], index, report['seconds_to_solver']))
+            verified = verify_outputs('input', 'output', write=False)
+            report['satisfied'] = verified['satisfied_requests']
+            report['requests'] = verified['total_requests']
+            events.put(('done', index, job_id, json.loads(json.dumps(report, default=str))))
+        except Exception as e:
+            print(f"\nError in optimization pipeline: {str(e)}")
+            events.put(('failed', index, job_id, f"{type(e).__name__}: {e}"))
+        finally:
+            root.removeHandler(file_log)
+            file_log.close()
+            os.chdir(BASE_DIR)
+            _attach_output(None, saved_fds)
+            log.close()
+
+
+class ServiceJob:
+    """A job known to the service; its output lines are read back from the workspace log"""
+
+    def __init__(self, job_id: str, workspace: str, options: Dict):
+        self.job_id = job_id
+        self.workspace = workspace
+        self.options = options
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.worker = None
+        self.report = None
+        self.error = None
+        self.metrics = {}
+        self.lines = []
+        self.log_offset = 0
+        self.log_lock = threading.Lock()
+
+    def read_log(self):
+        path = os.path.join(self.workspace, SOLVER_LOG)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            f.seek(self.log_offset)
+            chunk = f.read()
+        # Keep a partial last line for the next read
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        self.log_offset += len(complete)
+        for line in complete.decode(errors='replace').splitlines():
+            self.lines.append(line)
+            parse_progress(line, self.metrics)
+
+    def status(self, since: int = 0) -> Dict:
+        with self.log_lock:
+            self.read_log()
+        return {
+            'job_id': self.job_id,
+            'state': self.state,
+            'workspace': self.workspace,
+            'worker': self.worker,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+            'metrics': self.metrics,
+            'report': self.report,
+            'line_count': len(self.lines),
+            'lines': self.lines[since:]
+        }
+
+
+class Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.tasks = None
+        self.ready = False
+        self.job_id = None
+        self.warm_seconds = None
+
+
+class SolverService:
+    """Keep warm solver processes and serve pipeline jobs to them over a local HTTP API
+
+    Each worker process imports pandas, gurobipy and the scheduler modules and creates the
+    Gurobi environment once, then runs job after job with the in-process pipeline. Loaded
+    inputs and stage results stay in the worker's memory (preloaded for --preload directories),
+    so a job on familiar inputs reaches the solver without reading or hashing much. Cancelling
+    a running job replaces its worker with a fresh one. Jobs run in a workspace with an input/
+    directory: the client's own (shared filesystem) or one the service creates from uploaded
+    files. Client workspaces and input directories must resolve under the jobs directory or one
+    of the workspace roots, since workers write into them.
+
+    API: POST /jobs, GET /jobs, GET /jobs/<id>?since=<line>, POST /jobs/<id>/cancel,
+    GET /jobs/<id>/files/<name>, GET /health.
+    """
+
+    def __init__(self, workers: Optional[int] = None, jobs_dir: Optional[str] = None, preload: List[str] = (),
+                 core_budget: Optional[int] = None, workspace_roots: Optional[List[str]] = None):
+        self.core_budget = core_budget or max(1, multiprocessing.cpu_count() - 1)
+        self.workers = [Worker(index) for index in range(max(1, workers or 1))]
+        self.threads = max(1, self.core_budget // len(self.workers))
+        self.jobs_dir = jobs_dir or os.path.join(BASE_DIR, 'jobs', 'service')
+        self.preload = [os.path.abspath(p) for p in preload]
+        roots = DEFAULT_WORKSPACE_ROOTS if workspace_roots is None else workspace_roots
+        self.workspace_roots = [os.path.realpath(root) for root in [self.jobs_dir] + list(roots)]
+        self.cache_root = os.path.join(BASE_DIR, 'cache')
+        self.context = multiprocessing.get_context('spawn')
+        self.events = self.context.Queue()
+        self.jobs = {}
+        self.pending = []
+        self.lock = threading.RLock()
+        self.httpd = None
+
+    def start(self):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        for worker in self.workers:
+            self._spawn(worker)
+        threading.Thread(target=self._handle_events, name='service-events', daemon=True).start()
+
+    def _spawn(self, worker: Worker):
+        worker.ready = False
+        worker.job_id = None
+        worker.tasks = self.context.Queue()
+        worker.process = self.context.Process(
+            target=_worker_main, name=f'solver-worker-{worker.index}', daemon=True,
+            args=(worker.index, worker.tasks, self.events, self.preload, self.threads, self.cache_root))
+        worker.process.start()
+
+    def allowed_path(self, path: str) -> str:
+        """The real path of a client directory, if it lies under one of the workspace roots"""
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, root]) == root for root in self.workspace_roots):
+            raise ValueError(f"{path} is not under an allowed workspace root (see --workspace-root)")
+        return real
+
+    def submit(self, request: Dict) -> ServiceJob:
+        """Queue a job on {"workspace": dir}, {"input_dir": dir} or {"files": {name: csv text}}"""
+        job_id = datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        options = {k: request[k] for k in ('iterations', 'time_limit', 'stage_cache') if k in request}
+        if request.get('input_dir'):
+            request['input_dir'] = self.allowed_path(request['input_dir'])
+        if request.get('workspace'):
+            workspace = self.allowed_path(request['workspace'])
+        else:
+            workspace = os.path.join(self.jobs_dir, job_id)
+            input_dir = os.path.join(workspace, 'input')
+            os.makedirs(input_dir)
+            for name in REQUIRED_INPUTS + OPTIONAL_INPUTS:
+                if request.get('input_dir') and os.path.exists(os.path.join(request['input_dir'], name)):
+                    shutil.copy2(os.path.join(request['input_dir'], name), os.path.join(input_dir, name))
+                elif name in request.get('files', {}):
+                    with open(os.path.join(input_dir, name), 'w') as f:
+                        f.write(request['files'][name])
+        missing = [n for n in REQUIRED_INPUTS if not os.path.exists(os.path.join(workspace, 'input', n))]
+        if missing:
+            if not request.get('workspace'):
+                shutil.rmtree(workspace, ignore_errors=True)
+            raise ValueError(f"Missing required input files: {', '.join(missing)}")
+        # A fresh log per job, also when a client reuses its workspace
+        open(os.path.join(workspace, SOLVER_LOG), 'w').close()
+
+        job = ServiceJob(job_id, workspace, options)
+        with self.lock:
+            self.jobs[job_id] = job
+            self.pending.append(job_id)
+            self._dispatch()
+        return job
+
+    def get(self, job_id: str) -> ServiceJob:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job {job_id!r}")
+        return job
+
+    def cancel(self, job_id: str) -> ServiceJob:
+        with self.lock:
+            job = self.get(job_id)
+            if job.state == QUEUED:
+                self.pending.remove(job_id)
+                self._finish(job, CANCELLED)
+            elif job.state == RUNNING:
+                worker = self.workers[job.worker]
+                worker.process.terminate()
+                worker.process.join(10)
+                self._finish(job, CANCELLED)
+                # The replacement warms up in the background and takes the next job when ready
+                self._spawn(worker)
+        return job
+
+    def health(self) -> Dict:
+        with self.lock:
+            return {
+                'workers': [{'index': w.index, 'ready': w.ready, 'job': w.job_id, 'warm_seconds': w.warm_seconds,
+                             'alive': w.process.is_alive()} for w in self.workers],
+                'threads_per_worker': self.threads,
+                'queued': len(self.pending),
+                'jobs': len(self.jobs)
+            }
+
+    def _dispatch(self):
+        for worker in self.workers:
+            if not self.pending:
+                return
+            if worker.ready and worker.job_id is None:
+                job = self.jobs[self.pending.pop(0)]
+                worker.job_id = job.job_id
+                job.worker = worker.index
+                job.state = RUNNING
+                worker.tasks.put((job.job_id, job.workspace, job.options, job.submitted))
+
+    def _finish(self, job: ServiceJob, state: str, error: Optional[str] = None):
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        if job.worker is not None and self.workers[job.worker].job_id == job.job_id:
+            self.workers[job.worker].job_id = None
+
+    def _handle_events(self):
+        while True:
+            try:
+                event = self.events.get(timeout=1)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            kind, index = event[0], event[1]
+            with self.lock:
+                worker = self.workers[index]
+                if kind == 'ready':
+                    worker.ready = True
+                    worker.warm_seconds = event[2]
+                    print(f"Solver worker {index} ready in {event[2]:.1f}s")
+                elif kind == 'started' and event[2] in self.jobs:
+                    self.jobs[event[2]].started = event[3]
+                elif kind in ('done', 'failed') and event[2] in self.jobs:
+                    job = self.jobs[event[2]]
+                    if job.state == RUNNING:
+                        if kind == 'done':
+                            job.report = event[3]
+                            self._finish(job, DONE)
+                        else:
+                            self._finish(job, FAILED, event[3])
+                self._dispatch()
+
+    def _check_workers(self):
+        """Fail the job of a worker that died (e.g. out of memory) and replace the worker"""
+        with self.lock:
+            for worker in self.workers:
+                if not worker.process.is_alive():
+                    if worker.job_id is not None:
+                        self._finish(self.jobs[worker.job_id], FAILED,
+                                     f"solver worker exited with code {worker.process.exitcode}")
+                    self._spawn(worker)
+
+    def serve(self, host: str = '127.0.0.1', port: int = 8765):
+        """Start the workers and serve the HTTP API until interrupted"""
+        self.start()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, status, payload=None, body=None, content_type='application/json'):
+                body = body if body is not None else json.dumps(payload, default=str).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def route(self):
+                url = urllib.parse.urlparse(self.path)
+                return [p for p in url.path.split('/') if p], urllib.parse.parse_qs(url.query)
+
+            def do_GET(self):
+                parts, query = self.route()
+                try:
+                    if parts == ['health']:
+                        self.reply(200, service.health())
+                    elif parts == ['jobs']:
+                        self.reply(200, [job.status(len(job.lines)) for job in list(service.jobs.values())])
+                    elif len(parts) == 2 and parts[0] == 'jobs':
+                        self.reply(200, service.get(parts[1]).status(int(query.get('since', ['0'])[0])))
+                    elif len(parts) == 4 and parts[0] == 'jobs' and parts[2] == 'files':
+                        job = service.get(parts[1])
+                        # Only plain file names inside the job's output directory
+                        path = os.path.join(job.workspace, 'output', os.path.basename(parts[3]))
+                        if not os.path.isfile(path):
+                            self.reply(404, {'error': f"No output file {parts[3]}"})
+                            return
+                        with open(path, 'rb') as f:
+                            self.reply(200, body=f.read(), content_type='text/csv')
+                    else:
+                        self.reply(404, {'error': 'not found'})
+                except KeyError as e:
+                    self.reply(404, {'error': str(e)})
+
+            def do_POST(self):
+                parts, _ = self.route()
+                try:
+                    if parts == ['jobs']:
+                        length = int(self.headers.get('Content-Length', 0))
+                        job = service.submit(json.loads(self.rfile.read(length).decode() or '{}'))
+                        self.reply(202, job.status())
+                    elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'cancel':
+                        self.reply(200, service.cancel(parts[1]).status())
+                    else:
+                        self.reply(404, {'error': 'not found'})
+                except KeyError as e:
+                    self.reply(404, {'error': str(e)})
+                except (ValueError, OSError) as e:
+                    self.reply(400, {'error': str(e)})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        print(f"Solver service on http://{host}:{self.httpd.server_address[1]} with {len(self.workers)} workers "
+              f"x {self.threads} threads")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+            for worker in self.workers:
+                worker.process.terminate()
+
+
+class SolverClient:
+    """Client of the solver service, used by app.py's job queue and pipeline.py --service"""
+
+    def __init__(self, url: Optional[str] = None, timeout: float = 30):
+        self.url = (url or DEFAULT_URL).rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: Optional[Dict] = None, timeout: Optional[float] = None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method='POST' if data is not None else 'GET',
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+                body = response.read()
+                return json.loads(body) if response.headers.get('Content-Type') == 'application/json' else body
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Solver service: {json.loads(e.read()).get('error', e.reason)}") from e
+
+    def available(self) -> bool:
+        """True if a service answers with at least one live worker"""
+        try:
+            return any(w['alive'] for w in self._request('/health', timeout=1)['workers'])
+        except (OSError, RuntimeError, ValueError):
+            return False
+
+    def submit(self, workspace: Optional[str] = None, input_dir: Optional[str] = None,
+               files: Optional[Dict[str, str]] = None, **options) -> str:
+        """Queue a job and return its ID; give a workspace (with input/) to run in place"""
+        request = dict(options)
+        if workspace:
+            request['workspace'] = os.path.abspath(workspace)
+        elif input_dir:
+            request['input_dir'] = os.path.abspath(input_dir)
+        else:
+            request['files'] = files or {}
+        return self._request('/jobs', request)['job_id']
+
+    def status(self, job_id: str, since: int = 0) -> Dict:
+        return self._request(f'/jobs/{job_id}?since={since}')
+
+    def cancel(self, job_id: str) -> Dict:
+        return self._request(f'/jobs/{job_id}/cancel', {})
+
+    def follow(self, job_id: str, interval: float = 0.5) -> Iterator[Dict]:
+        """Yield the job's status with only its new output lines, until it has finished"""
+        seen = 0
+        while True:
+            status = self.status(job_id, since=seen)
+            seen = status['line_count']
+            yield status
+            if status['state'] in FINISHED:
+                return
+            time.sleep(interval)
+
+    def fetch(self, job_id: str, name: str, directory: str) -> str:
+        """Download one output file of a job into directory"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(self._request(f'/jobs/{job_id}/files/{urllib.parse.quote(name)}'))
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve pipeline runs from warm solver processes')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help='Jobs solved at once, one warm process each')
+    parser.add_argument('--cores', type=int, help='Cores shared by all workers (default: all but one)')
+    parser.add_argument('--preload', nargs='*', default=[],
+                        help='Input directories to load into every worker at startup (e.g. input)')
+    parser.add_argument('--jobs-dir', help='Where workspaces of uploaded jobs go (default: jobs/service)')
+    parser.add_argument('--workspace-root', action='append', default=[],
+                        help='Directory under which clients may run jobs in place (repeatable; '
+                             'the web UI\'s jobs directory and SCHEDULER_SERVICE_ROOTS are always allowed)')
+    args = parser.parse_args()
+
+    SolverService(workers=args.workers, jobs_dir=args.jobs_dir, preload=args.preload,
+                  core_budget=args.cores,
+                  workspace_roots=DEFAULT_WORKSPACE_ROOTS + args.workspace_root).serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The root modules and the solver modules in main/ import each other by plain module name
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'main')]
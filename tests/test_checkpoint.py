@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('gurobipy')
+
+from checkpoint import load_checkpoint, save_checkpoint
+
+
+def make_solution():
+    return {
+        'schedule': {'Section ID': ['S1', 'S2'], 'Period': ['R1', 'G2']},
+        'assignments': {'Student ID': ['ST1', 'ST2', 'ST2'], 'Section ID': ['S1', 'S1', 'S2']},
+    }
+
+
+def test_load_returns_checkpoint_of_same_instance(tmp_path):
+    save_checkpoint(make_solution(), 3, str(tmp_path), instance='instance-a')
+    solution, objective, saved_at = load_checkpoint(str(tmp_path), 'instance-a')
+    assert solution == make_solution()
+    assert objective == 3.0
+    assert saved_at > 0
+
+
+@pytest.mark.parametrize('saved, loaded', [
+    ('instance-a', 'instance-b'),
+    ('', 'instance-a'),
+])
+def test_load_ignores_checkpoint_of_another_instance(tmp_path, saved, loaded):
+    save_checkpoint(make_solution(), 3, str(tmp_path), instance=saved)
+    assert load_checkpoint(str(tmp_path), loaded) is None
+    # Without a key any checkpoint is taken, as before instance keys existed
+    assert load_checkpoint(str(tmp_path))[1] == 3.0
+
+
+def test_load_ignores_missing_and_unreadable_checkpoints(tmp_path):
+    assert load_checkpoint(str(tmp_path), 'instance-a') is None
+    (tmp_path / 'incumbent.npz').write_bytes(b'not an archive')
+    assert load_checkpoint(str(tmp_path), 'instance-a') is None
@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+gp = pytest.importorskip('gurobipy')
+
+from milp_soft import ScheduleOptimizer
+
+# Three periods and no course restrictions keep the model inside the size-limited license
+PERIODS = ['R1', 'R2', 'R3']
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    # The optimizer logs to output/ under the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def make_sections():
+    return pd.DataFrame([
+        ['S1', 'English', 'T1', 3],
+        ['S2', 'English', 'T2', 3],
+        ['S3', 'Math', 'T1', 4],
+        ['S4', 'Math', 'T3', 2],
+        ['S5', 'Biology', 'T2', 5],
+        ['S6', 'Art', 'T3', 2],
+    ], columns=['Section ID', 'Course ID', 'Teacher Assigned', '# of Seats Available'])
+
+
+def make_data(sections):
+    requests = ['English;Math;Biology', 'English;Math', 'English;Biology;Art', 'Math;Art',
+                'English;Math;Art', 'English;Biology', 'Math;Biology', 'English;Math;Biology',
+                'English;Art', 'Math;Biology;Art', 'English;Math', 'English;Biology']
+    student_ids = [f'ST{i:02d}' for i in range(len(requests))]
+    return {
+        'students': pd.DataFrame({'Student ID': student_ids, 'SPED': [int(i % 4 == 0) for i in range(len(requests))]}),
+        'student_preferences': pd.DataFrame({'Student ID': student_ids, 'Preferred Sections': requests}),
+        'teachers': pd.DataFrame({'Teacher ID': ['T1', 'T2', 'T3']}),
+        'sections': sections,
+        'teacher_unavailability': pd.DataFrame(columns=['Teacher ID', 'Unavailable Periods']),
+    }
+
+
+def make_optimizer(sections):
+    optimizer = ScheduleOptimizer(make_data(sections.copy()))
+    optimizer.periods = PERIODS
+    optimizer.course_period_restrictions = {}
+    optimizer.max_sped_per_section = 3
+    optimizer.model.Params.OutputFlag = 0
+    optimizer.build_model(bounds=False, cache=False)
+    return optimizer
+
+
+def objective(optimizer):
+    optimizer.model.optimize()
+    assert optimizer.model.Status == gp.GRB.OPTIMAL
+    return round(optimizer.model.ObjVal)
+
+
+def edit_sections(optimizer):
+    optimizer.remove_section('S6')
+    optimizer.add_section({'Section ID': 'S7', 'Course ID': 'Art', 'Teacher Assigned': 'T1',
+                           '# of Seats Available': 1})
+    optimizer.merge_sections('S1', 'S2')
+    optimizer.split_section('S5')
+
+
+def sync_sections(optimizer):
+    sections = optimizer.sections.copy()
+    sections.loc[sections['Section ID'] == 'S3', '# of Seats Available'] = 2
+    sections.loc[sections['Section ID'] == 'S4', 'Teacher Assigned'] = 'T2'
+    sections = sections[sections['Section ID'] != 'S5']
+    extra = pd.DataFrame([['S8', 'Biology', 'T3', 2]], columns=sections.columns)
+    optimizer.sync_sections(pd.concat([sections, extra], ignore_index=True))
+
+
+@pytest.mark.parametrize('edits', [
+    [edit_sections],
+    [sync_sections],
+    [edit_sections, sync_sections],
+])
+def test_edited_model_matches_rebuilt_model(edits):
+    optimizer = make_optimizer(make_sections())
+    before = objective(optimizer)
+    for edit in edits:
+        edit(optimizer)
+
+    rebuilt = make_optimizer(optimizer.sections)
+    assert objective(optimizer) == objective(rebuilt)
+    assert set(optimizer.x) == set(rebuilt.x)
+    assert set(optimizer.z) == set(rebuilt.z)
+    assert optimizer.model.NumConstrs == rebuilt.model.NumConstrs
+    # Every sequence changes the optimum, so an edit the live model ignored would show up
+    assert objective(optimizer) != before
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from run_store import RunStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RunStore(tmp_path / 'runs.sqlite')
+    yield store
+    store.close()
+
+
+def add_run(store, started, kind='pipeline', seconds=None, **metrics):
+    run_id = store.start_run(kind, started=started)
+    store.record_metrics(run_id, metrics)
+    if seconds is not None:
+        store.record_stage(run_id, 'solve', seconds)
+    store.finish_run(run_id)
+    return run_id
+
+
+def test_trend_is_oldest_first_and_limited(store):
+    # Inserted out of order; the trend follows the start times
+    for started, overage in [(300, 3.0), (100, 1.0), (400, 4.0), (200, 2.0)]:
+        add_run(store, started, overage=overage, seconds=started / 100)
+    add_run(store, 500, kind='schedule_optimizer', overage=9.0)
+
+    assert store.trend('overage')['value'].tolist() == [1.0, 2.0, 3.0, 4.0, 9.0]
+    assert store.trend('overage', limit=2)['value'].tolist() == [4.0, 9.0]
+    assert store.trend('overage', kind='pipeline')['value'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert store.trend('stage:solve')['value'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert store.trend('missing').empty
+
+
+def test_regressions_compare_with_previous_runs(store):
+    values = [10.0, 10.0, 11.0, 10.0, 13.0, 10.0, 9.0, 4.0]
+    ids = [add_run(store, started, runtime=value) for started, value in enumerate(values, start=1)]
+
+    slower = store.regressions('runtime', window=3, tolerance=0.10)
+    assert slower['id'].tolist() == [ids[4]]
+    assert slower['baseline'].tolist() == [10.0]
+    # The first runs have no baseline and are never flagged
+    assert store.regressions('runtime', window=3, tolerance=0.10, higher_is_better=True)['id'].tolist() == [ids[7]]
+
+
+def test_import_json_history_moves_entries_once(store, tmp_path):
+    history_file = tmp_path / 'utilization_history.json'
+    history_file.write_text(json.dumps([
+        {'timestamp': '2024-01-02 10:00:00', 'sections_before': 14, 'sections_after': 12},
+        {'timestamp': '2024-01-01 10:00:00', 'sections_before': 15, 'sections_after': 14, 'status': 'rejected'},
+    ]))
+
+    assert store.import_json_history(history_file) == 2
+    assert not history_file.exists()
+    assert history_file.with_suffix('.json.imported').exists()
+    assert store.import_json_history(history_file) == 0
+
+    runs = store.recent()
+    assert runs['sections_after'].tolist() == [12, 14]
+    assert runs['status'].tolist() == ['applied', 'rejected']
+    assert set(runs['kind']) == {'schedule_optimizer'}
+    assert store.trend('sections_after')['value'].tolist() == [14, 12]
+
+
+def test_run_records_failure_and_actions(store):
+    with pytest.raises(RuntimeError):
+        with store.run('pipeline', inputs_hash='abc') as run:
+            with run.stage('load'):
+                pass
+            run.actions([{'action': 'keep', 'primary_section': 'S1', 'stage': 'what_if'}])
+            with run.stage('solve'):
+                raise RuntimeError('solver crashed')
+
+    runs = store.runs_for_inputs('abc')
+    assert runs['status'].tolist() == ['failed']
+    run_id = int(runs['id'].iloc[0])
+    assert store.stages(run_id)[['stage', 'status']].values.tolist() == [['load', 'ok'], ['solve', 'failed']]
+    actions = store.actions(run_id)
+    assert actions[['action', 'section_id']].values.tolist() == [['keep', 'S1']]
+    assert json.loads(actions['detail'].iloc[0]) == {'stage': 'what_if'}
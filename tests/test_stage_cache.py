@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+import pytest
+
+import stage_cache
+from stage_cache import StageCache, file_hash, value_hash
+
+
+@pytest.fixture(autouse=True)
+def empty_memory_tier():
+    # The memory tier is shared by every StageCache in the process
+    stage_cache._memory.clear()
+    yield
+    stage_cache._memory.clear()
+
+
+def write_inputs(directory, sections_seats=5):
+    pd.DataFrame({'Section ID': ['S1', 'S2'], '# of Seats Available': [sections_seats, 4]}).to_csv(
+        directory / 'sections.csv', index=False)
+    pd.DataFrame({'Student ID': ['ST1', 'ST2', 'ST3']}).to_csv(directory / 'students.csv', index=False)
+
+
+def run_pipeline(cache, directory):
+    """Three stages keyed like the orchestrator's: by the files they read and by upstream results"""
+    files = {table: file_hash(directory / f'{table}.csv') for table in ('sections', 'students')}
+    sections = cache.cached('sections', cache.key('sections', {'sections': files['sections']}),
+                            lambda: pd.read_csv(directory / 'sections.csv'))
+    students = cache.cached('students', cache.key('students', {'students': files['students']}),
+                            lambda: pd.read_csv(directory / 'students.csv'))
+    return cache.cached('seats', cache.key('seats', {'sections': value_hash(sections),
+                                                     'students': files['students']}),
+                        lambda: int(sections['# of Seats Available'].sum()) - len(students))
+
+
+def test_changed_file_misses_only_downstream_stages(tmp_path):
+    write_inputs(tmp_path)
+    cache = StageCache(directory=str(tmp_path / 'cache'), memory_items=0)
+    assert run_pipeline(cache, tmp_path) == 6
+    assert run_pipeline(cache, tmp_path) == 6
+    assert cache.summary() == {stage: {'hits': 1, 'misses': 1} for stage in ('sections', 'students', 'seats')}
+
+    write_inputs(tmp_path, sections_seats=7)
+    assert run_pipeline(cache, tmp_path) == 8
+    assert cache.summary() == {'sections': {'hits': 1, 'misses': 2},
+                               'students': {'hits': 2, 'misses': 1},
+                               'seats': {'hits': 1, 'misses': 2}}
+
+
+def test_key_covers_config_and_code(tmp_path):
+    cache = StageCache(directory=str(tmp_path / 'cache'))
+    module = tmp_path / 'stage.py'
+    module.write_text('LIMIT = 1\n')
+    key = cache.key('stage', {'rows': [1, 2]}, {'limit': 1}, code=(str(module),))
+    assert key == cache.key('stage', {'rows': [1, 2]}, {'limit': 1}, code=(str(module),))
+    assert key != cache.key('stage', {'rows': [1, 2]}, {'limit': 2}, code=(str(module),))
+    module.write_text('LIMIT = 2\n')
+    assert key != cache.key('stage', {'rows': [1, 2]}, {'limit': 1}, code=(str(module),))
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    # Random bytes do not compress, so each entry takes about 800 bytes of a 2 KB store
+    cache = StageCache(directory=str(tmp_path / 'cache'), max_mb=2 / 1024, memory_items=0)
+    cache.put('a', os.urandom(800))
+    cache.put('b', os.urandom(800))
+    os.utime(cache.path('a'), (1000, 1000))
+    os.utime(cache.path('b'), (2000, 2000))
+
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('a')[0]
+    cache.put('c', os.urandom(800))
+    assert os.path.exists(cache.path('a'))
+    assert not os.path.exists(cache.path('b'))
+    assert os.path.exists(cache.path('c'))
+    assert cache.get('b') == (False, None)
+
+
+def test_memory_tier_hands_out_copies(tmp_path):
+    cache = StageCache(directory=str(tmp_path / 'cache'), memory_items=2)
+    value = {'rows': [1, 2]}
+    cache.put('a', value)
+    value['rows'].append(3)
+
+    hit, first = cache.get('a')
+    assert hit and first == {'rows': [1, 2]}
+    first['rows'].append(4)
+    # Served from memory even once the file is gone, and unchanged by the caller's edits
+    os.remove(cache.path('a'))
+    assert cache.get('a') == (True, {'rows': [1, 2]})
+
+
+def test_memory_tier_keeps_most_recent_items(tmp_path):
+    cache = StageCache(directory=str(tmp_path / 'cache'), memory_items=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key.upper())
+    assert list(stage_cache._memory) == ['b', 'c']
+    assert cache.get('a') == (True, 'A')
+    assert list(stage_cache._memory) == ['c', 'a']
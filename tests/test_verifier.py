@@ -0,0 +1,173 @@
+import pandas as pd
+import pytest
+
+from verifier import HARD_RULES, SOFT_RULES, ScheduleVerifier, violation_rows
+
+
+def make_inputs():
+    sections = pd.DataFrame([
+        ['S1', 'English', 'T1', 2],
+        ['S2', 'Math', 'T2', 2],
+        ['S3', 'English', 'T3', 2],
+        ['S4', 'Medical Career', 'T4', 2],
+    ], columns=['Section ID', 'Course ID', 'Teacher Assigned', '# of Seats Available'])
+    students = pd.DataFrame({'Student ID': ['A', 'B'], 'SPED': ['Yes', 'No']})
+    preferences = pd.DataFrame({'Student ID': ['A', 'B'], 'Preferred Sections': ['English;Math', 'English;Math']})
+    unavailability = pd.DataFrame({'Teacher ID': ['T1'], 'Unavailable Periods': ['G4']})
+    return sections, students, preferences, unavailability
+
+
+def make_schedule():
+    schedule = pd.DataFrame({'Section ID': ['S1', 'S2', 'S3', 'S4'], 'Period': ['R1', 'R2', 'R3', 'G1']})
+    assignments = pd.DataFrame({'Student ID': ['A', 'A', 'B', 'B'], 'Section ID': ['S1', 'S2', 'S1', 'S2']})
+    return schedule, assignments
+
+
+def verify(sections=None, schedule=None, assignments=None, **options):
+    default_sections, students, preferences, unavailability = make_inputs()
+    default_schedule, default_assignments = make_schedule()
+    verifier = ScheduleVerifier(default_sections if sections is None else sections, students, preferences,
+                                unavailability, **options)
+    return verifier.verify(default_schedule if schedule is None else schedule,
+                           default_assignments if assignments is None else assignments)
+
+
+def violated(report):
+    return {name for name, rows in report['issues'].items() if rows}
+
+
+def add_row(frame, *values):
+    return pd.concat([frame, pd.DataFrame([values], columns=frame.columns)], ignore_index=True)
+
+
+def test_valid_schedule_has_no_violations():
+    report = verify()
+    assert violated(report) == set()
+    assert report['satisfied_requests'] == report['total_requests'] == 4
+    assert report['total_overages'] == 0
+    assert set(report['issues']) == set(HARD_RULES + SOFT_RULES)
+
+
+# Hard rules
+
+def test_missed_request():
+    schedule, assignments = make_schedule()
+    report = verify(assignments=assignments.iloc[1:])
+    assert violated(report) == {'Missed Requests'}
+    assert report['issues']['Missed Requests'] == [['A', 'English']]
+    assert report['satisfied_requests'] == 3
+
+
+def test_unscheduled_section():
+    schedule, _ = make_schedule()
+    report = verify(schedule=schedule[schedule['Section ID'] != 'S3'])
+    assert violated(report) == {'Unscheduled Sections'}
+    assert report['issues']['Unscheduled Sections'] == ['S3']
+
+
+def test_section_scheduled_more_than_once():
+    schedule, _ = make_schedule()
+    report = verify(schedule=add_row(schedule, 'S3', 'R4'))
+    assert violated(report) == {'Sections Scheduled More Than Once'}
+    assert report['issues']['Sections Scheduled More Than Once'] == ['S3']
+
+
+def test_period_restriction_violation():
+    schedule, _ = make_schedule()
+    schedule.loc[schedule['Section ID'] == 'S4', 'Period'] = 'R2'
+    report = verify(schedule=schedule)
+    assert violated(report) == {'Period Restriction Violations'}
+    assert report['issues']['Period Restriction Violations'] == [['S4', 'R2']]
+
+
+def test_student_period_conflict():
+    schedule, _ = make_schedule()
+    schedule.loc[schedule['Section ID'] == 'S2', 'Period'] = 'R1'
+    report = verify(schedule=schedule)
+    assert violated(report) == {'Student Period Conflicts'}
+    assert report['issues']['Student Period Conflicts'] == [['A', 'R1'], ['B', 'R1']]
+
+
+def test_teacher_period_conflict():
+    sections, _, _, _ = make_inputs()
+    sections.loc[sections['Section ID'] == 'S3', 'Teacher Assigned'] = 'T1'
+    schedule, _ = make_schedule()
+    schedule.loc[schedule['Section ID'] == 'S3', 'Period'] = 'R1'
+    report = verify(sections=sections, schedule=schedule)
+    assert violated(report) == {'Teacher Period Conflicts'}
+    assert report['issues']['Teacher Period Conflicts'] == [['T1', 'R1']]
+
+
+def test_teacher_unavailability_conflict():
+    schedule, _ = make_schedule()
+    schedule.loc[schedule['Section ID'] == 'S1', 'Period'] = 'G4'
+    report = verify(schedule=schedule)
+    assert violated(report) == {'Teacher Unavailability Conflicts'}
+    assert report['issues']['Teacher Unavailability Conflicts'] == [['T1', 'S1', 'G4']]
+
+
+def test_duplicate_course_assignment():
+    _, assignments = make_schedule()
+    report = verify(assignments=add_row(assignments, 'A', 'S3'))
+    assert violated(report) == {'Duplicate Course Assignments'}
+    assert report['issues']['Duplicate Course Assignments'] == [['A', 'English']]
+
+
+def test_unknown_schedule_row():
+    schedule, _ = make_schedule()
+    report = verify(schedule=add_row(add_row(schedule, 'S9', 'R1'), 'S3', 'X9'))
+    assert violated(report) == {'Unknown Schedule Rows'}
+    assert report['issues']['Unknown Schedule Rows'] == [['S9', 'R1'], ['S3', 'X9']]
+
+
+def test_unknown_assignment_row():
+    _, assignments = make_schedule()
+    report = verify(assignments=add_row(assignments, 'Z', 'S1'))
+    assert violated(report) == {'Unknown Assignment Rows'}
+    assert report['issues']['Unknown Assignment Rows'] == [['Z', 'S1']]
+
+
+# Soft rules
+
+def test_section_over_capacity():
+    sections, _, _, _ = make_inputs()
+    sections.loc[sections['Section ID'] == 'S1', '# of Seats Available'] = 1
+    report = verify(sections=sections)
+    assert violated(report) == {'Sections Over Capacity'}
+    assert report['issues']['Sections Over Capacity'] == ['S1']
+    assert report['total_overages'] == 1
+
+
+def test_sped_limit_violation():
+    report = verify(max_sped_per_section=0)
+    assert violated(report) == {'SPED Limit Violations'}
+    assert report['issues']['SPED Limit Violations'] == ['S1', 'S2']
+
+
+def test_teacher_overload():
+    sections, _, _, _ = make_inputs()
+    sections.loc[sections['Section ID'] == 'S3', 'Teacher Assigned'] = 'T1'
+    report = verify(sections=sections, max_teacher_sections=1)
+    assert violated(report) == {'Teacher Overloads'}
+    assert report['issues']['Teacher Overloads'] == ['T1']
+
+
+def test_unrequested_assignment():
+    _, assignments = make_schedule()
+    report = verify(assignments=add_row(assignments, 'B', 'S4'))
+    assert violated(report) == {'Unrequested Assignments'}
+    assert report['issues']['Unrequested Assignments'] == [['B', 'S4']]
+
+
+@pytest.mark.parametrize('rule, status', [('Teacher Period Conflicts', 'Violated'), ('Teacher Overloads', 'Warning')])
+def test_violation_rows_status(rule, status):
+    sections, _, _, _ = make_inputs()
+    sections.loc[sections['Section ID'] == 'S3', 'Teacher Assigned'] = 'T1'
+    schedule, _ = make_schedule()
+    if rule == 'Teacher Period Conflicts':
+        schedule.loc[schedule['Section ID'] == 'S3', 'Period'] = 'R1'
+    rows = violation_rows(verify(sections=sections, schedule=schedule, max_teacher_sections=1)).set_index('Metric')
+    assert rows.loc[rule, 'Status'] == status
+    overall = 'Hard Rule Violations' if status == 'Violated' else 'Perfect'
+    assert rows.loc['Overall Satisfaction', 'Status'] == overall
+    assert rows.loc['Missed Requests', 'Satisfaction_Rate'] == '100.00%'
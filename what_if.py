@@ -0,0 +1,160 @@
+import time
+import multiprocessing
+import pandas as pd
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+
+class WhatIfEvaluator:
+    """Score candidate section removals and merges against the current schedule without a MILP re-run
+
+    For each candidate only the students of the affected sections are re-seated: each goes to
+    another section of the same course that meets in a period they still have free, preferring
+    the one with the most spare seats. The occupancy indexes are built once and each candidate
+    works on a small delta over them, so one evaluation costs about as much as the number of
+    displaced students.
+    """
+
+    def __init__(self, sections: pd.DataFrame, schedule: pd.DataFrame, assignments: pd.DataFrame):
+        self.course_of = dict(zip(sections['Section ID'], sections['Course ID']))
+        self.capacity = dict(zip(sections['Section ID'], sections['# of Seats Available']))
+        self.period_of = dict(zip(schedule['Section ID'], schedule['Period']))
+
+        self.course_sections = defaultdict(list)
+        for section_id, course_id in self.course_of.items():
+            if section_id in self.period_of:
+                self.course_sections[course_id].append(section_id)
+
+        assignments = assignments[assignments['Section ID'].isin(self.course_of.keys())]
+        self.enrollment = assignments['Section ID'].value_counts().to_dict()
+        self.roster = assignments.groupby('Section ID')['Student ID'].apply(list).to_dict()
+        # Student -> period -> number of their sections meeting then
+        self.busy = {}
+        for student_id, section_id in zip(assignments['Student ID'], assignments['Section ID']):
+            period = self.period_of.get(section_id)
+            if period is not None:
+                periods = self.busy.setdefault(student_id, {})
+                periods[period] = periods.get(period, 0) + 1
+
+    def _overage(self, section_id: str, enrolled: int, capacity: Optional[int] = None) -> int:
+        capacity = self.capacity[section_id] if capacity is None else capacity
+        return max(0, enrolled - capacity)
+
+    def evaluate(self, candidate: Dict) -> Dict:
+        """Re-seat the students displaced by one remove or merge and score the result"""
+        action = candidate.get('action')
+        primary = candidate.get('primary_section')
+        secondary = candidate.get('secondary_section')
+        result = {'candidate': candidate, 'moved': 0, 'unseated': 0, 'conflicts': 0,
+                  'added_overage': 0, 'freed_seats': 0}
+        if primary not in self.period_of or (action == 'merge' and secondary not in self.period_of):
+            result['error'] = 'section not scheduled'
+            return result
+
+        # Delta over the shared indexes: only sections touched by this candidate
+        enrollment = {}
+        capacity = {}
+        closed = set()
+
+        def enrolled(section_id):
+            return enrollment.get(section_id, self.enrollment.get(section_id, 0))
+
+        def seats(section_id):
+            return capacity.get(section_id, self.capacity[section_id])
+
+        if action == 'remove':
+            closed.add(primary)
+            displaced = self.roster.get(primary, [])
+            result['freed_seats'] = int(self.capacity[primary])
+            enrollment[primary] = 0
+            targets = [s for s in self.course_sections[self.course_of[primary]] if s != primary]
+
+            # Sections each student could join without a clash, fewest options seated first
+            vacated = self.period_of[primary]
+            free_options = {}
+            for student_id in displaced:
+                busy = self.busy.get(student_id, {})
+                free_options[student_id] = [
+                    s for s in targets
+                    if busy.get(self.period_of[s], 0) - (self.period_of[s] == vacated) == 0]
+            ordered = sorted(displaced, key=lambda student_id: len(free_options[student_id]))
+            for student_id in ordered:
+                free = free_options[student_id]
+                if not targets:
+                    result['unseated'] += 1
+                    continue
+                pool = free or targets
+                best = max(pool, key=lambda s: seats(s) - enrolled(s))
+                enrollment[best] = enrolled(best) + 1
+                result['moved'] += 1
+                if not free:
+                    result['conflicts'] += 1
+
+        elif action == 'merge':
+            # Secondary's students join the primary, which keeps its period and gains the seats
+            closed.add(secondary)
+            capacity[primary] = self.capacity[primary] + self.capacity[secondary]
+            enrollment[secondary] = 0
+            period = self.period_of[primary]
+            vacated = self.period_of[secondary]
+            for student_id in self.roster.get(secondary, []):
+                busy = self.busy.get(student_id, {})
+                if busy.get(period, 0) - (period == vacated) > 0:
+                    result['conflicts'] += 1
+            moved = len(self.roster.get(secondary, []))
+            enrollment[primary] = enrolled(primary) + moved
+            result['moved'] = moved
+        else:
+            result['error'] = f"unknown action {action}"
+            return result
+
+        before = sum(self._overage(s, self.enrollment.get(s, 0)) for s in enrollment)
+        after = sum(self._overage(s, enrollment[s], seats(s)) for s in enrollment if s not in closed)
+        result['added_overage'] = int(after - before)
+        return result
+
+    def evaluate_all(self, candidates: List[Dict], workers: Optional[int] = None) -> List[Dict]:
+        """Evaluate candidates (in parallel when worth it) and return them best first"""
+        started = time.time()
+        workers = workers or max(1, min(8, multiprocessing.cpu_count()))
+        if workers == 1 or len(candidates) < 50:
+            results = [self.evaluate(c) for c in candidates]
+        else:
+            chunk = max(1, len(candidates) // (workers * 4))
+            # Spawn rather than fork: the caller may have the advisor thread and Gurobi running, which
+            # a forked child would inherit mid-call. Each worker unpickles the indexes once.
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_worker, initargs=(self,)) as pool:
+                results = list(pool.map(_evaluate_in_worker, candidates, chunksize=chunk))
+        ranked = sorted(results, key=rank_key)
+        print(f"Evaluated {len(candidates)} what-if candidates in {time.time() - started:.2f}s")
+        return ranked
+
+
+def rank_key(result: Dict):
+    """Fewest unseated students, then conflicts, then added overage; most seats freed breaks ties"""
+    return ('error' in result, result['unseated'], result['conflicts'], result['added_overage'],
+            -result['freed_seats'])
+
+
+_worker_evaluator = None
+
+
+def _init_worker(evaluator: WhatIfEvaluator):
+    global _worker_evaluator
+    _worker_evaluator = evaluator
+
+
+def _evaluate_in_worker(candidate: Dict) -> Dict:
+    return _worker_evaluator.evaluate(candidate)
+
+
+def candidates_from_analysis(analysis: Dict) -> List[Dict]:
+    """Turn analyze_utilization's remove and merge opportunities into what-if candidates"""
+    candidates = [{'action': 'remove', 'primary_section': o['section']}
+                  for o in analysis['opportunities']['remove_candidates']]
+    candidates += [{'action': 'merge', 'primary_section': o['section1'], 'secondary_section': o['section2']}
+                   for o in analysis['opportunities']['merge_candidates']]
+    return candidates